@@ -1,45 +1,196 @@
-import pyaudio
 import threading
+from . import backends
 from . import util as audio_util
+from .ring_buffer import RingBuffer
 import time
 
 class AudioServer(threading.Thread):
-    def __init__(self, generator, sampling_rate):
+    """
+    Plays samples from a generator through a callback-driven output stream. This thread is only the producer: it
+    renders samples ahead of time into a ring buffer, and the stream's callback just copies them out, so playback
+    doesn't glitch when the generator (or whatever else holds the GIL, like the Qt UI) is briefly slow.
+
+    The samples rendered ahead are also how long a change to the generator takes to be heard, so the depth is a
+    trade-off between glitches and latency. The producer refills the ring buffer up to the depth once it has drained
+    to the low watermark. In adaptive mode the depth (and the low watermark with it) shrinks while playback is clean
+    and grows again when an underrun happens, never again shrinking as far as the depth that underran.
+    """
+    DEFAULT_BUFFER_TIME = 0.1           # Seconds of audio rendered ahead of playback
+    DEFAULT_CHUNK_TIME = 0.01           # Seconds of audio rendered per call to the generator
+    DEFAULT_FRAMES_PER_BUFFER = 256     # Frames handed to the audio device per callback
+    ERROR_BACKOFF = 0.01                # Seconds to wait after the generator fails, doubling on each failure...
+    MAX_ERROR_BACKOFF = 1.0             # ...up to this
+    ADAPT_PERIOD = 2.0                  # Seconds of clean playback before the adaptive depth shrinks a step
+    ADAPT_STEP = 0.8                    # Factor the adaptive depth shrinks by; it grows by two steps on an underrun
+
+    def __init__(self, generator, sampling_rate, buffer_time=DEFAULT_BUFFER_TIME, chunk_time=DEFAULT_CHUNK_TIME,
+                 frames_per_buffer=DEFAULT_FRAMES_PER_BUFFER, backend=None, low_water_time=None, adaptive=False,
+                 min_buffer_time=None):
         """
-        generator -- provides samples to be played -- must have 'nextN'
+        generator -- provides samples to be played -- must have 'nextN', or 'render_frames' returning the next N
+                     frames as bytes, which is used instead when it has both. If it has 'parameter_changed', that is
+                     called on each call to the server's.
         sampling_rate -- int -- The number of samples per second for playback
+        buffer_time -- float -- Seconds of audio to keep rendered ahead. More rides out longer stalls; less makes
+                                changes to the generator heard sooner. The most used in adaptive mode.
+        chunk_time -- float -- Seconds of audio to render at a time.
+        frames_per_buffer -- int -- Size of each output buffer passed to the callback.
+        backend -- audio backend (see audio.backends) -- Used to open the output stream. If None, a PyAudioBackend is
+                   opened when the server starts and terminated when it stops.
+        low_water_time -- float -- Refill once no more than this many seconds are rendered ahead. Defaults to one
+                                   chunk less than buffer_time, i.e. refill whenever a chunk fits.
+        adaptive -- bool -- Shrink the depth until underruns appear.
+        min_buffer_time -- float -- The least depth used in adaptive mode. Defaults to one chunk more than one output
+                                    buffer.
         """
         threading.Thread.__init__(self)
         self.running = False
         self.sampling_rate = sampling_rate
         self.generator = generator
+        self.backend = backend
+        self.stream = None
+        self.frames_per_buffer = frames_per_buffer
+        self.chunk_frames = max(int(sampling_rate * chunk_time), 1)
+        self.ring_buffer = RingBuffer(max(int(sampling_rate * buffer_time), self.chunk_frames))
+        self.depth_frames = self.ring_buffer.capacity
+        if low_water_time is None:
+            self.low_water_frames = self.depth_frames - self.chunk_frames
+        else:
+            self.low_water_frames = min(int(sampling_rate * low_water_time), self.depth_frames - self.chunk_frames)
+        self.adaptive = adaptive
+        if min_buffer_time is None:
+            self._min_depth_frames = self.chunk_frames + frames_per_buffer
+        else:
+            self._min_depth_frames = max(int(sampling_rate * min_buffer_time), self.chunk_frames)
+        self._min_depth_frames = min(self._min_depth_frames, self.depth_frames)
+        self._low_water_ratio = float(self.low_water_frames) / self.depth_frames
+        self.underruns = 0          # Callbacks that found the ring buffer short and played silence instead
+        self.late_fills = 0         # Times the producer got to the ring buffer with less than one output buffer left
+        self.generator_errors = 0
+        self.frames_played = 0      # Including any silence played for underruns
+        self.change_latency = None  # Seconds from the last parameter_changed call until the first sample it affected
+        self._space_available = threading.Event()
+        self._error_backoff = self.ERROR_BACKOFF
+        self._frames_rendered = 0
+        self._frames_read = 0
+        self._change_time = None
+        self._change_pending = False
+        self._change_frame = None
+        self._output_latency = 0.0
+        self._adapt_underruns = 0
+        self._adapt_start_frame = 0
+
+    @property
+    def buffered_time(self):
+        """Seconds of audio currently rendered ahead of playback."""
+        return float(self.ring_buffer.available) / self.sampling_rate
+
+    @property
+    def depth_time(self):
+        """Seconds of audio the producer renders ahead, when the ring buffer is topped up."""
+        return float(self.depth_frames) / self.sampling_rate
+
+    def parameter_changed(self):
+        """
+        Call after a change that affects the samples generated. The time from the call until the first sample
+        rendered after it reaches the speaker is measured and left in 'change_latency'.
+        """
+        generator_changed = getattr(self.generator, 'parameter_changed', None)
+        if generator_changed is not None:
+            generator_changed()
+        if self.stream is None:
+            return
+        self._change_time = self.stream.get_time()
+        self._change_pending = True
 
     def run(self):
         self.running = True
-        self.pa = pyaudio.PyAudio()
-        self.stream = self.pa.open(format=self.pa.get_format_from_width(2, unsigned=False),
-                 channels=2,
-                 rate=self.sampling_rate,
-                 output=True,
-                 frames_per_buffer=int(self.sampling_rate/8))
-        while self.running:
-            try:
-                num_next = self.stream.get_write_available()
-                if num_next > int(self.sampling_rate/16):
-                    values = self.generator.nextN(num_next)
-                    values = audio_util.clip_values(values)
-                    frames = audio_util.convert_values_to_frames(values)
-                    self.stream.write(frames)
-                else:
-                    time.sleep(0.01)
-            except Exception as ex:
-                print("An error occured: %s"  % ex)
-        self.stream.stop_stream()
-        self.stream.close()
-        self.pa.terminate()
+        self._fill()
+        backend = self.backend or backends.PyAudioBackend()
+        self.stream = backend.open_output(self.sampling_rate, 2, self.frames_per_buffer, callback=self._callback,
+                                          start=False)
+        self._output_latency = self.stream.get_output_latency()
+        self.stream.start_stream()
+        try:
+            while self.running:
+                self._space_available.wait(0.1)
+                self._space_available.clear()
+                if self.ring_buffer.available < self.frames_per_buffer:
+                    self.late_fills += 1
+                if self.adaptive:
+                    self._adapt()
+                if self.ring_buffer.available <= self.low_water_frames:
+                    self._fill()
+        finally:
+            self.stream.stop_stream()
+            self.stream.close()
+            if not self.backend:
+                backend.terminate()
 
     def stop(self):
         self.running = False
+        self._space_available.set()
         self.join(10.0)
         if self.is_alive():
             print('WARNING: AudioServer did not stop after 10 seconds')
+
+    def _fill(self):
+        """Renders chunks until the ring buffer is topped up. If the generator fails, backs off rather than retrying
+        straight away; the callback plays silence in the meantime."""
+        while self.running and self.ring_buffer.available + self.chunk_frames <= self.depth_frames:
+            if self._change_pending:
+                self._change_pending = False
+                self._change_frame = self._frames_rendered
+            try:
+                frames = self._render(self.chunk_frames)
+            except Exception as ex:
+                self.generator_errors += 1
+                print("An error occured: %s" % ex)
+                time.sleep(self._error_backoff)
+                self._error_backoff = min(self._error_backoff * 2, self.MAX_ERROR_BACKOFF)
+                return
+            self._frames_rendered += self.ring_buffer.write(frames)
+            self._error_backoff = self.ERROR_BACKOFF
+
+    def _render(self, n):
+        render_frames = getattr(self.generator, 'render_frames', None)
+        if render_frames is not None:
+            return render_frames(n)
+        values = self.generator.nextN(n)
+        values = audio_util.clip_values(values)
+        return audio_util.convert_values_to_frames(values)
+
+    def _adapt(self):
+        if self.underruns > self._adapt_underruns:
+            # Too shallow; back off, and from now on stay at least a step deeper than this
+            self._adapt_underruns = self.underruns
+            self._min_depth_frames = min(int(self.depth_frames / self.ADAPT_STEP), self.ring_buffer.capacity)
+            self._set_depth(self.depth_frames / (self.ADAPT_STEP * self.ADAPT_STEP))
+            self._adapt_start_frame = self.frames_played
+        elif self.frames_played - self._adapt_start_frame >= self.ADAPT_PERIOD * self.sampling_rate:
+            self._set_depth(self.depth_frames * self.ADAPT_STEP)
+            self._adapt_start_frame = self.frames_played
+
+    def _set_depth(self, depth_frames):
+        self.depth_frames = int(min(max(depth_frames, self._min_depth_frames), self.ring_buffer.capacity))
+        self.low_water_frames = min(int(self.depth_frames * self._low_water_ratio),
+                                    self.depth_frames - self.chunk_frames)
+
+    def _callback(self, in_data, frame_count, time_info, status_flags):
+        frames = self.ring_buffer.read(frame_count)
+        frames_read = len(frames) // self.ring_buffer.frame_size
+        if self._change_frame is not None and self._frames_read + frames_read > self._change_frame:
+            # Some host APIs don't report when the buffer will be heard
+            dac_time = time_info.get('output_buffer_dac_time') or time_info['current_time'] + self._output_latency
+            first_frame_time = dac_time + float(self._change_frame - self._frames_read) / self.sampling_rate
+            self.change_latency = first_frame_time - self._change_time
+            self._change_frame = None
+        self._frames_read += frames_read
+        self.frames_played += frame_count
+        missing_bytes = frame_count * self.ring_buffer.frame_size - len(frames)
+        if missing_bytes:
+            frames += b'\x00' * missing_bytes
+        if missing_bytes or status_flags & backends.paOutputUnderflow:
+            self.underruns += 1
+        self._space_available.set()
+        return (frames, backends.paContinue)
@@ -0,0 +1,425 @@
+"""
+Audio backends: what the real-time code opens its input and output streams through, so that it can run against
+either the sound card or a simulated device.
+
+Every backend has 'open_output', 'open_input' and 'terminate'. The streams they open provide the parts of PyAudio's
+stream interface the real-time code uses (start_stream, stop_stream, is_active, close, write, get_write_available,
+read, get_read_available, get_time and get_output_latency/get_input_latency) and call callbacks the same way PyAudio
+does. All streams are of 16-bit signed samples.
+"""
+import threading
+import time
+import wave
+
+# Callback return values and status flags. These have PortAudio's values, so callbacks work with every backend.
+paContinue = 0
+paComplete = 1
+paAbort = 2
+paInputOverflow = 2
+paOutputUnderflow = 4
+
+SAMPLE_WIDTH = 2
+
+
+class PyAudioBackend(object):
+    """Streams to and from the sound card through PyAudio. The streams returned are PyAudio's own."""
+    def __init__(self):
+        import pyaudio
+        self._pa = pyaudio.PyAudio()
+
+    def open_output(self, rate, channels, frames_per_buffer, callback=None, start=True):
+        """
+        rate -- int -- Sampling rate.
+        channels -- int -- Number of channels.
+        frames_per_buffer -- int -- Size of each buffer (and of each callback, if there is one).
+        callback -- function -- Called as PyAudio stream callbacks are, or None for a blocking stream.
+        start -- bool -- If False, the stream isn't started until 'start_stream' is called.
+        """
+        return self._open(rate, channels, frames_per_buffer, callback, start, output=True)
+
+    def open_input(self, rate, channels, frames_per_buffer, callback=None, start=True):
+        """Takes the same arguments as 'open_output'."""
+        return self._open(rate, channels, frames_per_buffer, callback, start, input=True)
+
+    def terminate(self):
+        self._pa.terminate()
+
+    def _open(self, rate, channels, frames_per_buffer, callback, start, **direction):
+        return self._pa.open(format=self._pa.get_format_from_width(SAMPLE_WIDTH, unsigned=False),
+                             channels=channels,
+                             rate=rate,
+                             frames_per_buffer=frames_per_buffer,
+                             stream_callback=callback,
+                             start=start,
+                             **direction)
+
+
+class NullBackend(object):
+    """
+    Simulates a sound card: output is thrown away and input is silence, but every stream moves through its frames
+    at its sampling rate against a shared stream clock, calling its callback once per buffer and making blocking
+    reads and writes wait for their frames, as a device would.
+
+    With realtime=False the clock is virtual, so runs are deterministic and go as fast as the code under test: time
+    only passes when 'advance' is called or when the code would otherwise have to wait for the device -- writing to
+    a full output buffer, polling a full output buffer or an empty input buffer, or reading input not yet captured.
+    With realtime=True the clock follows the wall clock and a thread drives the callbacks.
+    """
+    REALTIME_TICK = 0.002   # Seconds between runs of the callbacks when following the wall clock
+
+    def __init__(self, realtime=False, latency=0.0):
+        """
+        realtime -- bool -- Follow the wall clock rather than a virtual one.
+        latency -- float -- Seconds reported by the streams' get_output_latency and get_input_latency.
+        """
+        self.realtime = realtime
+        self.latency = latency
+        self._streams = []
+        self._time = 0.0
+        self._lock = threading.RLock()
+        self._start_time = time.time()
+        self._running = True
+        self._driver = None
+        if realtime:
+            self._driver = threading.Thread(target=self._drive)
+            self._driver.daemon = True
+            self._driver.start()
+
+    def open_output(self, rate, channels, frames_per_buffer, callback=None, start=True):
+        """Takes the same arguments as PyAudioBackend.open_output."""
+        return self._open(SimulatedOutputStream(self, rate, channels, frames_per_buffer, callback,
+                                                self._open_sink(rate, channels)), start)
+
+    def open_input(self, rate, channels, frames_per_buffer, callback=None, start=True):
+        """Takes the same arguments as PyAudioBackend.open_input."""
+        return self._open(SimulatedInputStream(self, rate, channels, frames_per_buffer, callback,
+                                               self._open_source(rate, channels)), start)
+
+    def terminate(self):
+        """Closes every stream still open and stops following the wall clock."""
+        self._running = False
+        if self._driver:
+            self._driver.join(10.0)
+        for stream in list(self._streams):
+            stream.close()
+
+    def get_time(self):
+        """Returns the current stream time, in seconds."""
+        if self.realtime:
+            self._advance_to(time.time() - self._start_time)
+        return self._time
+
+    def advance(self, seconds):
+        """Moves the virtual clock on, letting every started stream process the frames it would in that time."""
+        self._advance_to(self._time + seconds)
+
+    def _open(self, stream, start):
+        with self._lock:
+            self._streams.append(stream)
+        if start:
+            stream.start_stream()
+        return stream
+
+    def _open_sink(self, rate, channels):
+        return _NullSink()
+
+    def _open_source(self, rate, channels):
+        return _SilentSource(channels)
+
+    def _advance_to(self, stream_time):
+        with self._lock:
+            if stream_time <= self._time:
+                return
+            self._time = stream_time
+            for stream in list(self._streams):
+                stream._process_until(stream_time)
+
+    def _wait_until(self, stream_time):
+        """Blocks a read or write until the clock reaches the given time."""
+        if self.realtime:
+            while self.get_time() < stream_time:
+                time.sleep(self.REALTIME_TICK)
+        else:
+            self._advance_to(stream_time)
+
+    def _drive(self):
+        while self._running:
+            self.get_time()
+            time.sleep(self.REALTIME_TICK)
+
+
+class WaveFileBackend(NullBackend):
+    """
+    A NullBackend whose output is recorded to a wave file and whose input is played from one, so a run can be
+    checked afterwards or fed a recording. The output file holds what the device would have played, including the
+    silence of any underruns once playback started. Input streams stop at the end of the input file.
+    """
+    def __init__(self, output_filename=None, input_filename=None, realtime=False, latency=0.0):
+        """
+        output_filename -- str -- Wave file to record output to, or None to throw it away.
+        input_filename -- str -- Wave file to read input from, or None for silence. Must be 16-bit and of the rate
+                                 and number of channels the input is opened with.
+        """
+        NullBackend.__init__(self, realtime, latency)
+        self.output_filename = output_filename
+        self.input_filename = input_filename
+
+    def _open_sink(self, rate, channels):
+        if self.output_filename is None:
+            return _NullSink()
+        return _WaveSink(self.output_filename, rate, channels)
+
+    def _open_source(self, rate, channels):
+        if self.input_filename is None:
+            return _SilentSource(channels)
+        return _WaveSource(self.input_filename, rate, channels)
+
+
+class SimulatedStream(object):
+    """Base for the streams of NullBackend; the device position advances with the backend's clock."""
+    FRAME_EPSILON = 1e-6    # Allows for rounding when converting a stream time back into frames
+
+    def __init__(self, backend, rate, channels, frames_per_buffer, callback):
+        self.rate = rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.frame_size = channels * SAMPLE_WIDTH
+        self._backend = backend
+        self._callback = callback
+        self._active = False
+        self._closed = False
+        self._start_time = 0.0
+        self._frames_processed = 0  # Frames the device has played or captured
+
+    def start_stream(self):
+        with self._backend._lock:
+            if not self._active and not self._closed:
+                # Carry on from where the device stopped
+                self._start_time = self._backend.get_time() - float(self._frames_processed) / self.rate
+                self._active = True
+
+    def stop_stream(self):
+        with self._backend._lock:
+            self._active = False
+
+    def is_active(self):
+        return self._active
+
+    def is_stopped(self):
+        return not self._active
+
+    def close(self):
+        with self._backend._lock:
+            self._active = False
+            if self._closed:
+                return
+            self._closed = True
+            self._backend._streams.remove(self)
+            self._close()
+
+    def get_time(self):
+        return self._backend.get_time()
+
+    def get_output_latency(self):
+        return self._backend.latency
+
+    def get_input_latency(self):
+        return self._backend.latency
+
+    def _frame_time(self, frame_num):
+        return self._start_time + float(frame_num) / self.rate
+
+    def _process_until(self, stream_time):
+        if not self._active:
+            return
+        target_frames = int((stream_time - self._start_time) * self.rate + self.FRAME_EPSILON)
+        if self._callback:
+            while self._active and self._frames_processed + self.frames_per_buffer <= target_frames:
+                self._run_callback()
+        elif target_frames > self._frames_processed:
+            self._process_frames(target_frames - self._frames_processed)
+
+    def _check_active(self):
+        if not self._active:
+            raise IOError('Stream not active')
+
+
+class SimulatedOutputStream(SimulatedStream):
+    def __init__(self, backend, rate, channels, frames_per_buffer, callback, sink):
+        SimulatedStream.__init__(self, backend, rate, channels, frames_per_buffer, callback)
+        self._sink = sink
+        self._queue = bytearray()   # Frames written but not yet played
+        self._playing = False       # True from the first write until the queue runs dry
+        self.underflows = 0
+
+    def stop_stream(self):
+        """Like PortAudio, lets the frames already written finish playing first."""
+        with self._backend._lock:
+            drained_time = self._frame_time(self._frames_processed + len(self._queue) // self.frame_size)
+            drain = self._active and not self._callback and self._queue
+        if drain:
+            self._backend._wait_until(drained_time)
+        SimulatedStream.stop_stream(self)
+
+    def get_write_available(self):
+        with self._backend._lock:
+            self._backend.get_time()
+            free_frames = self._free_frames()
+            if free_frames or not self._active or self._backend.realtime:
+                return free_frames
+            # Polling a full buffer is waiting for it, as far as the virtual clock is concerned
+            self._backend._wait_until(self._frame_time(self._frames_processed + self.frames_per_buffer // 2))
+            return self._free_frames()
+
+    def write(self, frames):
+        self._check_active()
+        with self._backend._lock:
+            self._queue.extend(frames[:len(frames) - len(frames) % self.frame_size])
+            self._playing = True
+        while True:
+            with self._backend._lock:
+                self._check_active()
+                excess_frames = -self._free_frames()
+                if excess_frames <= 0:
+                    return
+                wait_time = self._frame_time(self._frames_processed + excess_frames)
+            self._backend._wait_until(wait_time)
+
+    def _free_frames(self):
+        return self.frames_per_buffer - len(self._queue) // self.frame_size
+
+    def _process_frames(self, num_frames):
+        played_bytes = min(num_frames * self.frame_size, len(self._queue))
+        if played_bytes:
+            self._sink.write(bytes(self._queue[:played_bytes]))
+            del self._queue[:played_bytes]
+        if self._playing and played_bytes < num_frames * self.frame_size:
+            self.underflows += 1
+            self._playing = False
+            self._sink.write(b'\x00' * (num_frames * self.frame_size - played_bytes))
+        elif not self._playing and self.underflows:
+            self._sink.write(b'\x00' * num_frames * self.frame_size)
+        self._frames_processed += num_frames
+
+    def _run_callback(self):
+        num_bytes = self.frames_per_buffer * self.frame_size
+        dac_time = self._frame_time(self._frames_processed)
+        time_info = {'current_time': dac_time, 'output_buffer_dac_time': dac_time + self._backend.latency}
+        frames, flag = self._callback(None, self.frames_per_buffer, time_info, 0)
+        frames = (frames or b'')[:num_bytes]
+        self._sink.write(frames + b'\x00' * (num_bytes - len(frames)))
+        self._frames_processed += self.frames_per_buffer
+        if flag != paContinue:
+            self._active = False
+
+    def _close(self):
+        self._sink.close()
+
+
+class SimulatedInputStream(SimulatedStream):
+    def __init__(self, backend, rate, channels, frames_per_buffer, callback, source):
+        SimulatedStream.__init__(self, backend, rate, channels, frames_per_buffer, callback)
+        self._source = source
+        self._captured = bytearray()    # Frames captured but not yet read
+        self.overflows = 0
+
+    def get_read_available(self):
+        with self._backend._lock:
+            self._backend.get_time()
+            if not self._captured and self._active and not self._backend.realtime:
+                # Polling an empty buffer is waiting for it, as far as the virtual clock is concerned
+                self._backend._wait_until(self._frame_time(self._frames_processed + self.frames_per_buffer))
+            return len(self._captured) // self.frame_size
+
+    def read(self, num_frames):
+        """Returns the next num_frames frames, waiting for them to be captured. Returns fewer only if the input
+        ends first."""
+        frames = bytearray()
+        while True:
+            with self._backend._lock:
+                num_bytes = min(num_frames * self.frame_size - len(frames), len(self._captured))
+                frames += self._captured[:num_bytes]
+                del self._captured[:num_bytes]
+                missing_frames = num_frames - len(frames) // self.frame_size
+                if not missing_frames or not self._active:
+                    return bytes(frames)
+                wait_time = self._frame_time(self._frames_processed + min(missing_frames, self.frames_per_buffer))
+            self._backend._wait_until(wait_time)
+
+    def _capture(self, num_frames):
+        """Returns the next frames from the source; stops the stream if it runs out."""
+        frames = self._source.read(num_frames)
+        if len(frames) < num_frames * self.frame_size:
+            self._active = False
+        return frames
+
+    def _process_frames(self, num_frames):
+        self._captured += self._capture(num_frames)
+        self._frames_processed += num_frames
+        excess_bytes = len(self._captured) - self.frames_per_buffer * self.frame_size
+        if excess_bytes > 0:
+            # Nobody read the buffer in time; the oldest frames are lost
+            self.overflows += 1
+            del self._captured[:excess_bytes]
+
+    def _run_callback(self):
+        adc_time = self._frame_time(self._frames_processed)
+        frames = self._capture(self.frames_per_buffer)
+        self._frames_processed += self.frames_per_buffer
+        if not frames:
+            return
+        time_info = {'current_time': self._frame_time(self._frames_processed), 'input_buffer_adc_time': adc_time}
+        flag = self._callback(frames, len(frames) // self.frame_size, time_info, 0)[1]
+        if flag != paContinue:
+            self._active = False
+
+    def _close(self):
+        self._source.close()
+
+
+class _NullSink(object):
+    def write(self, frames):
+        pass
+
+    def close(self):
+        pass
+
+
+class _SilentSource(object):
+    def __init__(self, channels):
+        self.frame_size = channels * SAMPLE_WIDTH
+
+    def read(self, num_frames):
+        return b'\x00' * (num_frames * self.frame_size)
+
+    def close(self):
+        pass
+
+
+class _WaveSink(object):
+    def __init__(self, filename, rate, channels):
+        self._wave_file = wave.open(filename, 'wb')
+        self._wave_file.setnchannels(channels)
+        self._wave_file.setsampwidth(SAMPLE_WIDTH)
+        self._wave_file.setframerate(rate)
+
+    def write(self, frames):
+        self._wave_file.writeframes(frames)
+
+    def close(self):
+        self._wave_file.close()
+
+
+class _WaveSource(object):
+    def __init__(self, filename, rate, channels):
+        self._wave_file = wave.open(filename, 'rb')
+        if (self._wave_file.getframerate(), self._wave_file.getnchannels(), self._wave_file.getsampwidth()) != \
+                (rate, channels, SAMPLE_WIDTH):
+            self._wave_file.close()
+            raise ValueError('%s must be 16-bit, %d channel(s) at %d Hz' % (filename, channels, rate))
+
+    def read(self, num_frames):
+        return self._wave_file.readframes(num_frames)
+
+    def close(self):
+        self._wave_file.close()
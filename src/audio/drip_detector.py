@@ -14,11 +14,19 @@ class DripDetector(object):
         self._current_time = 0.0
         self._time_step = 1.0/self.wave_rate
         self.num_drips = 0
+        self._frames_added = 0
+        self._onset_frame = 0   # Frame at which the current run of highs started
         if self.debug:
             self.drip_times = deque([], 10)
             self._last_drip_time = 0.0
 
     def add_frames(self, frames):
+        """Processes the given mono frames. Returns a list with the index of the frame at which each new drip started,
+        so callers can work out when the drips happened. A drip is only confirmed FILTER_ON_TIME after it starts, so
+        the index is negative if it started in frames given before."""
+        drip_frame_indices = []
+        first_frame = self._frames_added
+        self._frames_added += len(frames) // MONO_WAVE_STRUCT.size
         for offset in range(0, len(frames), MONO_WAVE_STRUCT.size):
             value = MONO_WAVE_STRUCT.unpack_from(frames, offset)[0]
             self._current_time += self._time_step
@@ -36,12 +44,15 @@ class DripDetector(object):
             else:
                 # Out of drip -- test on time
                 if value >= MAX_S16/8.0:
+                    if not self.hold_time:
+                        self._onset_frame = first_frame + offset // MONO_WAVE_STRUCT.size
                     self.hold_time += self._time_step
                     if self.hold_time >= self.FILTER_ON_TIME:
                         # Drip confirmed
                         self.state = True
                         self.hold_time = 0.0
                         self.num_drips += 1
+                        drip_frame_indices.append(self._onset_frame - first_frame)
                         if self.debug:
                             self.drip_times.append(self._current_time-self._last_drip_time)
                             self._last_drip_time = self._current_time
@@ -50,6 +61,7 @@ class DripDetector(object):
                 else:
                     # Another low while waiting for a drip
                     self.hold_time = 0.0
+        return drip_frame_indices
 
     def _calculate_drip_rate(self):
         if len(self.drip_times) < 5:
@@ -71,10 +83,14 @@ class VirtualDripDetector(object):
         self.num_drips = 0
 
     def add_frames(self, frames):
-        num_frames = len(frames) / MONO_WAVE_STRUCT.size
+        num_frames = len(frames) // MONO_WAVE_STRUCT.size
+        start_remainder = self._drip_remainder
         self._drip_remainder += num_frames * self._drip_per_frame
         num_drips = int(math.floor(self._drip_remainder))
         self.num_drips += num_drips
         self._drip_remainder -= float(num_drips)
         if num_drips:
             print('*** Virtual drip: num_drips=%d, drip_remainder=%f' % (self.num_drips, self._drip_remainder))
+        # Frame at which the remainder crossed each whole drip
+        return [min(int(math.ceil((drip - start_remainder) / self._drip_per_frame)) - 1, num_frames - 1)
+                for drip in range(1, num_drips + 1)]
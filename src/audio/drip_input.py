@@ -0,0 +1,70 @@
+import collections
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from audio import backends
+
+DripEvent = collections.namedtuple('DripEvent', ['num_drips', 'stream_time'])
+
+
+class DripInput(object):
+    """
+    Listens for drips on its own callback-driven input stream with small buffers, so drips are counted as soon as
+    they are heard rather than whenever the output loop gets around to reading the input. Every drip is stamped with
+    the stream time at which its onset was captured (not when the detector confirmed it) and published on the
+    drip_events queue as a DripEvent.
+    """
+    DEFAULT_FRAMES_PER_BUFFER = 256
+
+    def __init__(self, backend, drip_detector, sampling_rate, frames_per_buffer=DEFAULT_FRAMES_PER_BUFFER):
+        """
+        backend -- audio backend (see audio.backends) -- Used to open the input stream.
+        drip_detector -- Detector to feed the captured frames to -- must have 'add_frames' and 'num_drips'
+        sampling_rate -- int -- The sampling frequency for the input stream.
+        frames_per_buffer -- int -- Size of each input buffer. Smaller buffers give more timely drip events.
+        """
+        self.drip_detector = drip_detector
+        self.sampling_rate = sampling_rate
+        self.frames_per_buffer = frames_per_buffer
+        self.drip_events = queue.Queue()
+        self.overflows = 0
+        self._backend = backend
+        self._stream = None
+
+    def start(self):
+        self._stream = self._backend.open_input(self.sampling_rate, 1, self.frames_per_buffer, callback=self._callback)
+
+    def stop(self):
+        if self._stream:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+
+    def new_drip_events(self):
+        """Returns the DripEvents published since the last call, oldest first."""
+        drip_events = []
+        while True:
+            try:
+                drip_events.append(self.drip_events.get_nowait())
+            except queue.Empty:
+                return drip_events
+
+    def get_time(self):
+        """Returns the current stream time, in the same time base as the drip events."""
+        return self._stream.get_time()
+
+    def _callback(self, in_data, frame_count, time_info, status_flags):
+        if status_flags & backends.paInputOverflow:
+            self.overflows += 1
+        adc_time = time_info.get('input_buffer_adc_time')
+        if not adc_time:
+            # Not every host API reports capture times; assume the buffer was only just captured
+            adc_time = time_info['current_time'] - float(frame_count) / self.sampling_rate
+        drip_frame_indices = self.drip_detector.add_frames(in_data)
+        first_num_drips = self.drip_detector.num_drips - len(drip_frame_indices)
+        for i, frame_index in enumerate(drip_frame_indices):
+            stream_time = adc_time + float(frame_index) / self.sampling_rate
+            self.drip_events.put(DripEvent(first_num_drips + i + 1, stream_time))
+        return (None, backends.paContinue)
@@ -0,0 +1,113 @@
+import ctypes
+import multiprocessing
+import time
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from audio.drip_input import DripEvent
+
+
+class DripDetectorProcess(multiprocessing.Process):
+    """
+    Captures input and detects drips in a separate process, so that drip analysis never competes with the player's
+    output writes for the GIL. Results are published through shared memory: the number of drips, a ring of the stream
+    times of the most recent drips and the number of input overflows. The playback process only ever reads them.
+
+    Provides the same 'new_drip_events' and 'overflows' interface as DripInput. PortAudio stream times come from the
+    system clock, so times stamped here line up with the output stream of the playback process.
+    """
+    RING_SIZE = 256     # Number of drip times kept; far more than can happen between two reads
+    POLL_TIME = 0.1     # Seconds between checks for a stop request while no drips are arriving
+    START_TIMEOUT = 10.0    # Seconds to wait for the process to start listening
+
+    def __init__(self, sampling_rate, frames_per_buffer, virtual_drip_rate=None, debug=False, open_backend=None):
+        """
+        sampling_rate -- int -- The sampling frequency for the input stream.
+        frames_per_buffer -- int -- Size of each input buffer.
+        virtual_drip_rate -- float -- If given, input will be ignored and drips will be counted at this rate instead.
+        debug -- bool -- If True, the drip detector will print information about each drip.
+        open_backend -- callable -- Called in the child process to open the audio backend (see audio.backends) the
+                        input is opened with. If None, a PyAudioBackend is opened.
+        """
+        multiprocessing.Process.__init__(self)
+        self.daemon = True
+        self.sampling_rate = sampling_rate
+        self.frames_per_buffer = frames_per_buffer
+        self.virtual_drip_rate = virtual_drip_rate
+        self.debug = debug
+        self.open_backend = open_backend
+        self._num_drips = multiprocessing.Value(ctypes.c_long, 0, lock=False)
+        self._overflows = multiprocessing.Value(ctypes.c_long, 0, lock=False)
+        self._drip_times = multiprocessing.Array(ctypes.c_double, self.RING_SIZE, lock=False)
+        self._started = multiprocessing.Event()
+        self._stopping = multiprocessing.Event()
+        self._num_drips_read = 0
+
+    @property
+    def num_drips(self):
+        return self._num_drips.value
+
+    @property
+    def overflows(self):
+        return self._overflows.value
+
+    def start(self):
+        """Starts the process and waits until it is listening. Raises RuntimeError if it exits or doesn't start
+        listening within START_TIMEOUT seconds, e.g. because the input couldn't be opened."""
+        multiprocessing.Process.start(self)
+        give_up_time = time.time() + self.START_TIMEOUT
+        while not self._started.wait(self.POLL_TIME):
+            if not self.is_alive():
+                self.join()
+                raise RuntimeError('Drip detector process exited (code %s) before it started listening' % self.exitcode)
+            if time.time() > give_up_time:
+                self.terminate()
+                self.join()
+                raise RuntimeError('Drip detector process did not start listening within %0.1f seconds' %
+                                   self.START_TIMEOUT)
+
+    def stop(self):
+        self._stopping.set()
+        self.join(10.0)
+        if self.is_alive():
+            print('WARNING: DripDetectorProcess did not stop after 10 seconds')
+            self.terminate()
+
+    def new_drip_events(self):
+        """Returns the DripEvents published since the last call, oldest first."""
+        num_drips = self._num_drips.value
+        drip_events = []
+        while self._num_drips_read < num_drips:
+            self._num_drips_read += 1
+            stream_time = self._drip_times[(self._num_drips_read - 1) % self.RING_SIZE]
+            drip_events.append(DripEvent(self._num_drips_read, stream_time))
+        return drip_events
+
+    def run(self):
+        # Runs in the child process, so the audio modules are only loaded there
+        from audio.backends import PyAudioBackend
+        from audio.drip_detector import DripDetector, VirtualDripDetector
+        from audio.drip_input import DripInput
+        if self.virtual_drip_rate is not None:
+            drip_detector = VirtualDripDetector(self.sampling_rate, self.virtual_drip_rate)
+        else:
+            drip_detector = DripDetector(self.sampling_rate, debug=self.debug)
+        backend = (self.open_backend or PyAudioBackend)()
+        drip_input = DripInput(backend, drip_detector, self.sampling_rate, self.frames_per_buffer)
+        drip_input.start()
+        self._started.set()
+        try:
+            while not self._stopping.is_set():
+                self._overflows.value = drip_input.overflows
+                try:
+                    drip_event = drip_input.drip_events.get(timeout=self.POLL_TIME)
+                except queue.Empty:
+                    continue
+                # Publish the time before the count, so a reader never sees a drip without its time
+                self._drip_times[(drip_event.num_drips - 1) % self.RING_SIZE] = drip_event.stream_time
+                self._num_drips.value = drip_event.num_drips
+        finally:
+            drip_input.stop()
+            backend.terminate()
@@ -0,0 +1,32 @@
+class OutputFrameClock(object):
+    """
+    Maps stream times onto frame numbers of an output stream, so that events on other streams (such as drips heard
+    on the input) can be lined up with the frames that were being played when they happened.
+
+    Frame numbers count every frame written to the output since it was opened, so they keep increasing while a
+    section of audio is looped.
+    """
+    def __init__(self, sampling_rate, output_latency=0.0):
+        """
+        sampling_rate -- int -- The sampling frequency of the output stream.
+        output_latency -- float -- Seconds between a frame leaving the stream buffer and it reaching the speaker.
+        """
+        self.sampling_rate = float(sampling_rate)
+        self.output_latency = output_latency
+        self._anchor_time = None
+        self._anchor_frame = 0.0
+
+    def update(self, stream_time, frames_written, frames_queued):
+        """Anchors the clock to the state of the output stream at the given stream time.
+        stream_time -- float -- Current stream time, in seconds.
+        frames_written -- int -- The total number of frames written to the stream so far.
+        frames_queued -- int -- How many of those frames are still waiting in the stream buffer.
+        """
+        self._anchor_time = stream_time
+        self._anchor_frame = frames_written - frames_queued - self.output_latency * self.sampling_rate
+
+    def frame_at(self, stream_time):
+        """Returns the number of the output frame that was (or will be) played at the given stream time."""
+        if self._anchor_time is None:
+            return 0
+        return max(int(round(self._anchor_frame + (stream_time - self._anchor_time) * self.sampling_rate)), 0)
@@ -24,10 +24,17 @@ class Modulator(object):
         """
         raise NotImplementedError('abstract')
 
-    def modulate_values(self, values):
+    def modulate_values(self, values, out=None):
         """
         Modulates the given values according to the modulation technique used.
-        Takes and returns a Nx2 numpy array of left/right +/-1.0 audio values.
+        Takes and returns a Nx2 numpy array of left/right +/-1.0 audio values. If 'out' (an Nx2 array, which may be
+        'values' itself) is given, the modulated values are written into it instead of a new array.
+        """
+        raise NotImplementedError('abstract')
+
+    def skip(self, n):
+        """
+        Moves the modulation waveform on by n samples, as if n values had been modulated.
         """
         raise NotImplementedError('abstract')
 
@@ -53,6 +60,15 @@ class Modulator(object):
         """
         raise NotImplementedError('abstract')
 
+    @property
+    def loop_period(self):
+        """
+        The shortest number of samples that can be looped seamlessly in the current laser state. This is never longer
+        than waveform_period, and is used to keep looped sections (such as the dwell between layers) as short as
+        possible.
+        """
+        raise NotImplementedError('abstract')
+
 
 class AmplitudeModulator(Modulator):
     """Takes a stream of stereo values and modulates their amplitude on a fixed carrier frequency. This is used with the
@@ -88,28 +104,27 @@ class AmplitudeModulator(Modulator):
     def _modulated_value_in_limits(self, modulated_values):
         return numpy.all(modulated_values <= self.AM_MAXIMUM_AMPLITUDE) and numpy.all(modulated_values >= self.AM_MINIMUM_AMPLITUDE)
 
-    def modulate_values(self, values):
+    def modulate_values(self, values, out=None):
         num_values = values.shape[0]
         waveform_indices = numpy.remainder(numpy.arange(num_values)+self._current_cycle, self._modulation_waveform.shape[0])
         modulation_waveform = numpy.take(self._modulation_waveform, waveform_indices)
-        left = values[:,0]
-        right = values[:,1]
         # Shift from -/+ 1.0 to (0, 1.0)
-        left = (left + 1.0) / 2.0
-        right = (right + 1.0) / 2.0
+        new_values = numpy.add(values, 1.0, out=out)
+        new_values /= 2.0
         # Then shift to the min/max
-        left = self.AM_MINIMUM_AMPLITUDE + left * (self.AM_MAXIMUM_AMPLITUDE-self.AM_MINIMUM_AMPLITUDE)
-        right = self.AM_MINIMUM_AMPLITUDE + right * (self.AM_MAXIMUM_AMPLITUDE-self.AM_MINIMUM_AMPLITUDE)
-        
-        if ( not self._modulated_value_in_limits(left) or not self._modulated_value_in_limits(right)):
+        new_values *= self.AM_MAXIMUM_AMPLITUDE-self.AM_MINIMUM_AMPLITUDE
+        new_values += self.AM_MINIMUM_AMPLITUDE
+
+        if not self._modulated_value_in_limits(new_values):
             raise Exception("Model exceeds bounds, try a smaller model")
 
-        left = left * modulation_waveform
-        right = right * modulation_waveform
+        new_values *= modulation_waveform[:, numpy.newaxis]
         self._current_cycle = (self._current_cycle + num_values) % self._modulation_waveform.shape[0]
-        new_values = numpy.column_stack((left, right))
         return new_values
 
+    def skip(self, n):
+        self._current_cycle = (self._current_cycle + n) % self._modulation_waveform.shape[0]
+
     @property
     def sampling_rate(self):
         return self._sampling_rate
@@ -130,6 +145,14 @@ class AmplitudeModulator(Modulator):
     def waveform_period(self):
         return self._modulation_waveform.shape[0]
 
+    @property
+    def loop_period(self):
+        # When the carrier divides the sampling rate, each carrier cycle is an exact repeat of the last
+        carrier_period = self.sampling_rate / self._carrier_freq
+        if carrier_period == int(carrier_period):
+            return int(carrier_period)
+        return self.waveform_period
+
 
 class DirectConnectionModulator(Modulator):
     """Takes a stream of stereo audio values and plays them mostly as-is, except that it scales them to 75% of total
@@ -155,19 +178,19 @@ class DirectConnectionModulator(Modulator):
                                                             num=cycle_period, endpoint=False))
         self._current_cycle = 0
 
-    def modulate_values(self, values):
+    def modulate_values(self, values, out=None):
         num_values = values.shape[0]
         waveform_indices = numpy.remainder(numpy.arange(num_values)+self._current_cycle, self._side_tone_waveform.shape[0])
         modulation_waveform = numpy.take(self._side_tone_waveform, waveform_indices)
-        left = values[:,0] * self.DC_AUDIO_SCALE
-        right = values[:,1] * self.DC_AUDIO_SCALE
+        new_values = numpy.multiply(values, self.DC_AUDIO_SCALE, out=out)
         if self._laser_enabled:
-            left = left + modulation_waveform * self.DC_SIDE_TONE_AMPLITUDE
-            right = right + modulation_waveform * self.DC_SIDE_TONE_AMPLITUDE
+            new_values += (modulation_waveform * self.DC_SIDE_TONE_AMPLITUDE)[:, numpy.newaxis]
         self._current_cycle = (self._current_cycle + num_values) % self._side_tone_waveform.shape[0]
-        new_values = numpy.column_stack((left, right))
         return new_values
 
+    def skip(self, n):
+        self._current_cycle = (self._current_cycle + n) % self._side_tone_waveform.shape[0]
+
     @property
     def sampling_rate(self):
         return self._sampling_rate
@@ -186,3 +209,13 @@ class DirectConnectionModulator(Modulator):
     @property
     def waveform_period(self):
         return self._side_tone_waveform.shape[0]
+
+    @property
+    def loop_period(self):
+        if not self._laser_enabled:
+            # Without the side tone the values are played as-is, so a single sample loops seamlessly
+            return 1
+        side_tone_period = float(self.sampling_rate) / self.DC_SIDE_TONE_FREQ
+        if side_tone_period == int(side_tone_period):
+            return int(side_tone_period)
+        return self.waveform_period
@@ -0,0 +1,63 @@
+import threading
+
+
+class RingBuffer(object):
+    """
+    A fixed-size FIFO of audio frames, shared between a producer thread that renders frames ahead of time and an
+    audio callback that plays them. Neither side ever waits on the other for longer than it takes to copy the frames.
+    """
+    def __init__(self, capacity, frame_size=4):
+        """
+        capacity -- int -- The number of frames the buffer can hold.
+        frame_size -- int -- Bytes per frame (4 for 16-bit stereo).
+        """
+        if capacity < 1:
+            raise ValueError('Ring buffer must hold at least one frame')
+        self.capacity = capacity
+        self.frame_size = frame_size
+        self._data = bytearray(capacity * frame_size)
+        self._read_pos = 0      # In bytes
+        self._size = 0          # In bytes
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        """The number of frames waiting to be read."""
+        return self._size // self.frame_size
+
+    @property
+    def free(self):
+        """The number of frames that can be written without overwriting unread frames."""
+        return self.capacity - self.available
+
+    def write(self, frames):
+        """
+        Appends as many of the given frames as fit and returns the number of frames written.
+
+        frames -- bytes -- Whole frames to append.
+        """
+        num_bytes = len(frames) - len(frames) % self.frame_size
+        with self._lock:
+            num_bytes = min(num_bytes, len(self._data) - self._size)
+            write_pos = (self._read_pos + self._size) % len(self._data)
+            first = min(num_bytes, len(self._data) - write_pos)
+            self._data[write_pos:write_pos + first] = frames[:first]
+            self._data[:num_bytes - first] = frames[first:num_bytes]
+            self._size += num_bytes
+        return num_bytes // self.frame_size
+
+    def read(self, num_frames):
+        """Removes and returns up to num_frames frames, oldest first. Returns fewer if fewer are available."""
+        with self._lock:
+            num_bytes = min(num_frames * self.frame_size, self._size)
+            first = min(num_bytes, len(self._data) - self._read_pos)
+            frames = bytes(self._data[self._read_pos:self._read_pos + first] + self._data[:num_bytes - first])
+            self._read_pos = (self._read_pos + num_bytes) % len(self._data)
+            self._size -= num_bytes
+        return frames
+
+    def clear(self):
+        """Discards all unread frames."""
+        with self._lock:
+            self._read_pos = 0
+            self._size = 0
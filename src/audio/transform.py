@@ -13,15 +13,19 @@ class PositionToAudioTransformer(object):
         """
         self.tuning_parameter_collection = tuning_parameter_collection
 
-    def transform_points(self, points):
+    def transform_points(self, points, out=None):
         """Transform position coordinates into audio values based on the tuning parameters currently set.
         points -- list of (x, y, z) tuples
+        out -- Nx2 numpy array -- If given, the audio values are written into this instead of a new array
         return -- list of (left, right) audio values, which should be +/- 1.0 at the positional bounds
         """
         assert isinstance(points, numpy.ndarray)
         num_points = points.shape[0]
         assert points.shape[1] == 3
-        audio = numpy.empty((num_points, 2), dtype=numpy.float)
+        if out is None:
+            audio = numpy.empty((num_points, 2), dtype=float)
+        else:
+            audio = out
         x_min = self.tuning_parameter_collection.build_x_min
         x_max = self.tuning_parameter_collection.build_x_max
         y_min = self.tuning_parameter_collection.build_y_min
@@ -31,7 +35,8 @@ class PositionToAudioTransformer(object):
         # Edge case: fail gracefully if 0 size
         if x_size == 0 or y_size == 0:
             #return [(0.0, 0.0) for i in range(len(points))]
-            return numpy.zeros((num_points, 2))
+            audio[:] = 0.0
+            return audio
         # Optimization: assume Z stays relatively constant while X and Y changes. Split samples into chunks where
         # Z is constant in each chunk. Process each chunk at constant Z.
         chunk_breaks = [0] + ((points[1:,2] - points[:-1,2]).nonzero()[0]+1).tolist() + [num_points]
@@ -59,3 +64,45 @@ class PositionToAudioTransformer(object):
             audio[start_i:end_i,1] += mult * tp.y_trapezoid
         return audio
 
+
+    def segment_extents(self, starts, ends, z):
+        """Finds how far from centre the audio values get along straight moves, without rendering them. Each channel
+        is quadratic along a move (the trapezoid multiplies them together), so besides both ends this looks at where
+        a channel turns back part way along.
+        starts, ends -- Nx2 numpy arrays -- The (x, y) positions the moves go from and to
+        z -- float -- The height the moves are made at
+        return -- numpy array of N magnitudes, the most either channel reaches along each move; beyond 1.0 is clipped
+        """
+        x_min = self.tuning_parameter_collection.build_x_min
+        x_max = self.tuning_parameter_collection.build_x_max
+        y_min = self.tuning_parameter_collection.build_y_min
+        y_max = self.tuning_parameter_collection.build_y_max
+        x_size = x_max - x_min
+        y_size = y_max - y_min
+        if x_size == 0 or y_size == 0:
+            return numpy.zeros(len(starts))
+        tp = self.tuning_parameter_collection.get_tuning_parameters_for_height(z)
+        # The same steps as transform_points, up to the trapezoid
+        rotate_matrix = numpy.array([[math.cos(tp.rotation*math.pi/180.0), math.sin(tp.rotation*math.pi/180.0)],
+                                     [-math.sin(tp.rotation*math.pi/180.0), math.cos(tp.rotation*math.pi/180.0)]]).T
+        shear_matrix = numpy.array([[1, tp.x_shear],
+                                    [tp.y_shear, 1]]).T
+        ends_audio = []
+        for points in (starts, ends):
+            audio = numpy.empty((len(points), 2), dtype=float)
+            audio[:,0] = ((((points[:,0] - x_min) / x_size) * 2.0 - 1.0) + tp.x_offset) * tp.x_scale
+            audio[:,1] = ((((points[:,1] - y_min) / y_size) * 2.0 - 1.0) + tp.y_offset) * tp.y_scale
+            ends_audio.append(numpy.dot(numpy.dot(audio, rotate_matrix), shear_matrix))
+        u0, v0 = ends_audio[0][:,0], ends_audio[0][:,1]
+        du, dv = ends_audio[1][:,0] - u0, ends_audio[1][:,1] - v0
+        # Along the move, u and v are linear in t (0 to 1) and u*v is quadratic
+        uv = (u0 * v0, u0 * dv + v0 * du, du * dv)
+        extents = numpy.zeros(len(starts))
+        for linear, slope, trapezoid in ((u0, du, tp.x_trapezoid), (v0, dv, tp.y_trapezoid)):
+            a, b, c = linear + trapezoid * uv[0], slope + trapezoid * uv[1], trapezoid * uv[2]
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                turn = numpy.where(c != 0.0, -b / (2.0 * c), 0.0)
+            turn = numpy.clip(numpy.nan_to_num(turn), 0.0, 1.0)
+            for t in (0.0, 1.0, turn):
+                numpy.maximum(extents, numpy.abs(a + b * t + c * t * t), out=extents)
+        return extents
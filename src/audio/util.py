@@ -13,7 +13,7 @@ def convert_values_to_frames(values):
     return a string of bytes representing PCM frames for those values."""
     assert isinstance(values, numpy.ndarray) and values.shape[1] == 2
     values = numpy.rint(values*MAX_S16).astype(numpy.dtype('<i2'))
-    return values.tostring()
+    return values.tobytes()
 
 def clip_values(values):
     assert isinstance(values, numpy.ndarray) and values.shape[1] == 2
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 from PySide import QtGui
+import getopt
 import sys
 import traceback
 import os
@@ -13,11 +14,55 @@ from calibrate.mainwindow import MainWindow
 from calibrate.plane_2d_to_3d_adapter import Plane2dTo3dAdapter
 from calibrate.transformer_proxy import PositionToAudioTransformerProxy
 from calibrate.modulator_proxy import ModulatorProxy
+from calibrate.render_pipeline import RenderPipeline
+from calibrate.loop_cache import LoopCache
 
 os.environ['LOG_LEVEL'] = 'warning'
 SAMPLING_RATE = 48000
 
-app = QtGui.QApplication(sys.argv)
+
+def usage():
+    print("""Usage: %s [options]
+        --buffer-ms=<ms>            audio rendered ahead of playback (default %d). Less makes changes show sooner;
+                                    more rides out longer stalls.
+        --low-water-ms=<ms>         refill once no more than this is rendered ahead (default: whenever a chunk fits)
+        --chunk-ms=<ms>             audio rendered at a time (default %d)
+        --frames-per-buffer=<n>     frames handed to the sound card at a time (default %d)
+        --adaptive                  shrink the audio rendered ahead until the output runs dry, then back off;
+                                    --buffer-ms is the most used
+        --no-loop-cache             render every block, rather than repeating a recording of a pattern that's
+                                    holding still
+        """ % (sys.argv[0], AudioServer.DEFAULT_BUFFER_TIME * 1000, AudioServer.DEFAULT_CHUNK_TIME * 1000,
+                AudioServer.DEFAULT_FRAMES_PER_BUFFER))
+
+
+try:
+    opts, args = getopt.getopt(sys.argv[1:], 'h', ['help', 'buffer-ms=', 'low-water-ms=', 'chunk-ms=',
+                                                   'frames-per-buffer=', 'adaptive', 'no-loop-cache'])
+    audio_options = {}
+    loop_cache = True
+    for opt, arg in opts:
+        if opt == '--buffer-ms':
+            audio_options['buffer_time'] = float(arg) / 1000
+        elif opt == '--low-water-ms':
+            audio_options['low_water_time'] = float(arg) / 1000
+        elif opt == '--chunk-ms':
+            audio_options['chunk_time'] = float(arg) / 1000
+        elif opt == '--frames-per-buffer':
+            audio_options['frames_per_buffer'] = int(arg)
+        elif opt == '--adaptive':
+            audio_options['adaptive'] = True
+        elif opt == '--no-loop-cache':
+            loop_cache = False
+        else:
+            usage()
+            sys.exit(2)
+except (getopt.GetoptError, ValueError) as err:
+    print(err)
+    usage()
+    sys.exit(2)
+
+app = QtGui.QApplication(sys.argv[:1] + args)
 widget = QtGui.QMainWindow()
 generator = shape_generators.NullGenerator(SAMPLING_RATE, 1.0, 1.0, (0.0, 0.0))
 height_adapter = Plane2dTo3dAdapter(generator, 0.0)
@@ -27,7 +72,10 @@ transformer_proxy = PositionToAudioTransformerProxy(transformer, height_adapter)
 modulator = getModulator(ModulationTypes.AM, SAMPLING_RATE)
 modulator.laser_enabled = True
 modulator_proxy = ModulatorProxy(modulator, transformer_proxy)
-audio = AudioServer(modulator_proxy, SAMPLING_RATE)
+pipeline = RenderPipeline(modulator_proxy)
+if loop_cache:
+    pipeline = LoopCache(pipeline, SAMPLING_RATE)
+audio = AudioServer(pipeline, SAMPLING_RATE, **audio_options)
 audio.start()
 
 generators = {'Square': shape_generators.SquareGenerator,
@@ -40,7 +88,8 @@ generators = {'Square': shape_generators.SquareGenerator,
               }
 retcode = 777
 try:
-    mainwindow = MainWindow(tuning, modulator_proxy, generators, height_adapter, SAMPLING_RATE)
+    mainwindow = MainWindow(tuning, modulator_proxy, generators, height_adapter, SAMPLING_RATE, audio_server=audio,
+                            transformer_proxy=transformer_proxy)
     mainwindow.show()
     retcode = app.exec_()
 except Exception as ex:
@@ -50,4 +99,6 @@ except Exception as ex:
     raise ex 
 finally:
     audio.stop()
+    if audio.underruns or audio.late_fills:
+        print('Audio output ran dry %d times (%d late fills)' % (audio.underruns, audio.late_fills))
     sys.exit(retcode)
@@ -1,14 +1,19 @@
 import threading
-import pyaudio
 import math
 import struct
 import time
 
+from audio.backends import PyAudioBackend
+
 class DripDetector(threading.Thread):
     MONO_WAVE_STRUCT_FMT = "h"
     MONO_WAVE_STRUCT = struct.Struct(MONO_WAVE_STRUCT_FMT)
     MAX_S16 = math.pow(2, 15)-1
-    def __init__(self, drips_per_mm, initial_height = 0.0, sampling_frequency = 48000, threshold = 400, release_ms = 6, echo_drips = False):
+    def __init__(self, drips_per_mm, initial_height = 0.0, sampling_frequency = 48000, threshold = 400, release_ms = 6, echo_drips = False, backend = None):
+        """
+        backend -- audio backend (see audio.backends) -- Used to open the input stream. If None, a PyAudioBackend is
+                   opened when the detector starts.
+        """
         threading.Thread.__init__(self)
         self._drips_per_mm = drips_per_mm * 1.0
         self._sampling_frequency = sampling_frequency
@@ -21,6 +26,7 @@ class DripDetector(threading.Thread):
         self._hold_samples = 0
         self._indrip = False
         self.instream = None
+        self._backend = backend
 
         self.set_drips_per_mm(drips_per_mm)
 
@@ -33,14 +39,9 @@ class DripDetector(threading.Thread):
         return (self._num_drips * 1.0) / self._drips_per_mm
 
     def run(self):
-        pa = pyaudio.PyAudio()
-        self.instream = pa.open(
-                format=pa.get_format_from_width(2, unsigned=False),
-                 channels=1,
-                 rate=self._sampling_frequency,
-                 input=True,
-                 frames_per_buffer=int(self._sampling_frequency/8)
-                 )
+        if self._backend is None:
+            self._backend = PyAudioBackend()
+        self.instream = self._backend.open_input(self._sampling_frequency, 1, int(self._sampling_frequency/8))
         self.instream.start_stream()
         self._running = True
         while(self._running):
@@ -0,0 +1,85 @@
+class LoopCache(object):
+    """
+    Plays a calibration pattern from a recording of one period of it for as long as the pattern stays the same.
+
+    While a pattern is drawn with fixed parameters its audio repeats exactly, with a period that covers both the path
+    and the modulation waveform. Once the pipeline reports that its output repeats, the cache records one period of
+    frames as they are rendered, and from then on plays slices of the recording instead of rendering, so holding a
+    pattern on screen costs next to nothing.
+
+    A change (reported through parameter_changed, or seen as a change in the pipeline's loop period) drops the
+    recording. The pipeline is first moved on past the frames played from it, so drawing resumes where playback is,
+    and recording starts again once the changed pattern repeats. Only the audio thread may call render_frames.
+    """
+    MAX_LOOP_TIME = 10.0    # Seconds; patterns that take longer to repeat are always rendered
+    FRAME_SIZE = 4          # Bytes per 16-bit stereo frame
+
+    def __init__(self, pipeline, sampling_rate, max_loop_time=MAX_LOOP_TIME):
+        """
+        pipeline -- RenderPipeline -- Renders the frames, and reports their loop period.
+        sampling_rate -- int -- The number of samples per second for playback
+        max_loop_time -- float -- The longest period to record, in seconds.
+        """
+        self.pipeline = pipeline
+        self.max_loop_frames = int(sampling_rate * max_loop_time)
+        self._changes = 0           # Incremented by whichever thread reports a change...
+        self._changes_seen = 0      # ...and compared against this by the audio thread
+        self._period = None
+        self._recording = None
+        self._loop = None
+        self._loop_position = 0     # In frames
+        self._frames_looped = 0     # Played from the loop since the pipeline was last moved on
+
+    @property
+    def looping(self):
+        """Whether frames are being played from a recording rather than rendered."""
+        return self._loop is not None
+
+    def parameter_changed(self):
+        """Call after a change that affects the samples generated."""
+        self._changes += 1
+
+    def render_frames(self, n):
+        """Returns the next n frames as bytes of 16-bit stereo PCM."""
+        changes = self._changes
+        period = self.pipeline.loop_period
+        if changes != self._changes_seen or period != self._period:
+            self._changes_seen = changes
+            self._restart(period)
+        if self._loop is not None:
+            return self._play(n)
+        frames = self.pipeline.render_frames(n)
+        if self._recording is not None:
+            self._recording += frames
+            loop_size = self._period * self.FRAME_SIZE
+            if len(self._recording) >= loop_size:
+                self._loop = bytes(self._recording[:loop_size])
+                self._loop_position = (len(self._recording) // self.FRAME_SIZE) % self._period
+                self._recording = None
+        return frames
+
+    def _restart(self, period):
+        """Drops any recording, and starts a new one if the pipeline's output repeats soon enough."""
+        if self._loop is not None:
+            self.pipeline.skip(self._frames_looped)
+            self._frames_looped = 0
+            self._loop = None
+        self._period = period
+        if period is not None and period <= self.max_loop_frames:
+            self._recording = bytearray()
+        else:
+            self._recording = None
+
+    def _play(self, n):
+        loop = self._loop
+        position = self._loop_position * self.FRAME_SIZE
+        remaining = n * self.FRAME_SIZE
+        slices = []
+        while remaining:
+            size = min(remaining, len(loop) - position)
+            slices.append(loop[position:position + size])
+            remaining -= size
+            position = (position + size) % len(loop)
+        self._loop_position = position // self.FRAME_SIZE
+        self._frames_looped += n
+        return b''.join(slices)
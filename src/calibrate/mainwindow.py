@@ -1,6 +1,5 @@
 from PySide import QtCore, QtGui
 import os.path
-import threading
 
 from ui_mainwindow import Ui_MainWindow
 from audio.tuning_parameter_file import TuningParameterFileHandler
@@ -91,9 +90,12 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow, Logging):
     MODULATION_ID_BY_TYPE = dict((v, k) for (k, v) in MODULATION_TYPE_BY_ID.items())
     LASER_POWER_ON_ID = 1
     LASER_POWER_OFF_ID = 0
+    AUDIO_STATUS_INTERVAL_MS = 500
+    RAMP_DISPLAY_INTERVAL_MS = 100
+    MIN_RAMP_SECONDS_PER_UNIT = 0.001
 
     def __init__(self, tuning_parameter_collection, modulator_proxy, generators,
-                 height_adapter, sampling_rate, advanced = False):
+                 height_adapter, sampling_rate, advanced = False, audio_server = None, transformer_proxy = None):
         QtGui.QMainWindow.__init__(self)
         Logging.__init__(self)
 
@@ -104,10 +106,14 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow, Logging):
         self.generator = None
         self.height_adapter = height_adapter
         self.sampling_rate = sampling_rate
+        self.audio_server = audio_server
+        self.transformer_proxy = transformer_proxy
         self.test_height = 0.0
         self.calibrate_test_mode = self.CALIBRATE_MODE
         self.laser_enabled = True
         self.setupUi(self)
+        self.ramp_timer = QtCore.QTimer(self)
+        self.ramp_timer.timeout.connect(self.update_ramp_display)
 
         # NOTE: Have to manually add button group because pyside-uic fails to compile them
         self.modulation_buttonGroup = QtGui.QButtonGroup(self)
@@ -144,6 +150,11 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow, Logging):
         if (not advanced):
             self.hide_advanced_ui()
 
+        if self.audio_server:
+            self.audio_status_timer = QtCore.QTimer(self)
+            self.audio_status_timer.timeout.connect(self.update_audio_status)
+            self.audio_status_timer.start(self.AUDIO_STATUS_INTERVAL_MS)
+
     def set_initial_generator(self):
         self.pattern_changed(0)
 
@@ -192,6 +203,23 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow, Logging):
         #noinspection PyUnresolvedReferences
         self.laser_power_buttonGroup.buttonClicked[int].connect(self.laser_power_changed)
 
+        # Connected after the handlers above, so the change has been made by the time it is published
+        for signal in [self.x_offset_spin.valueChanged, self.y_offset_spin.valueChanged,
+                       self.x_scale_spin.valueChanged, self.y_scale_spin.valueChanged,
+                       self.rotation_spin.valueChanged, self.x_shear_spin.valueChanged,
+                       self.y_shear_spin.valueChanged, self.x_trapezoid_spin.valueChanged,
+                       self.y_trapezoid_spin.valueChanged, self.pattern_combobox.currentIndexChanged,
+                       self.speed_edit.valueChanged, self.size_edit.valueChanged,
+                       self.build_x_max_edit.editingFinished, self.build_y_max_edit.editingFinished,
+                       self.calibrations_list_model.dataChanged, self.calibrations_list_model.rowsInserted,
+                       self.calibrations_list_model.rowsRemoved, self.calibrations_list_model.modelReset,
+                       self.shape_center_x_edit.editingFinished, self.shape_center_y_edit.editingFinished,
+                       self.tuning_height_edit.editingFinished, self.test_height_edit.editingFinished,
+                       self.calibrations_listview.selectionModel().selectionChanged,
+                       self.calibrate_test_tab_widget.currentChanged,
+                       self.modulation_buttonGroup.buttonClicked[int], self.laser_power_buttonGroup.buttonClicked[int]]:
+            signal.connect(self.parameters_changed)
+
 
     def hide_advanced_ui(self):
         self.ramp_speed.setHidden(True)
@@ -273,6 +301,24 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow, Logging):
         self.size_changed()
 
 
+    # -------------------Audio---------------------------------
+
+    def parameters_changed(self, *args):
+        """Publishes the tuning parameters to the audio thread, and notes the change for the latency figure (and for
+        anything in the audio chain that reuses what it rendered before the change)."""
+        if self.transformer_proxy:
+            self.transformer_proxy.tuning_changed()
+        if self.audio_server:
+            self.audio_server.parameter_changed()
+
+    def update_audio_status(self):
+        if self.audio_server.change_latency is None:
+            latency = '-'
+        else:
+            latency = '%d ms' % round(self.audio_server.change_latency * 1000)
+        self.statusbar.showMessage('Change latency: %s    Rendered ahead: %d ms    Underruns: %d' % (
+            latency, round(self.audio_server.depth_time * 1000), self.audio_server.underruns))
+
     # -------------------Tunning by height----------------------
 
     def x_offset_changed(self, value):
@@ -314,34 +360,43 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow, Logging):
             self.get_shape_center()
         )
         self.height_adapter.generator = self.generator
+        if (self.ramp_speed.checkState()):
+            self._start_ramp()
 
     def speed_changed(self):
         self.generator.speed = int(self.get_speed())
 
-    _ramp_speed_interval = None
-    _ramp_timer = None
     _ramp_maximum = 100000.0
-    def _increase_size(self, amount = 1):
-        if (self.generator.speed < self._ramp_maximum and self.ramp_speed.checkState()):
-            speed = self.generator.speed + 1
-            self.speed_edit.setValue(speed)
-            self._ramp_timer = threading.Timer(self._ramp_speed_interval, self._increase_size)
-            self._ramp_timer.daemon=True
-            self._ramp_timer.start()
-        else:
+    def _start_ramp(self):
+        # The ramp is made by the generator, sample by sample; this only shows how far it has got
+        seconds_per_unit = max(self.ramp_speed_time.value(), self.MIN_RAMP_SECONDS_PER_UNIT)
+        self.generator.ramp_speed(self.generator.current_speed, self._ramp_maximum, 1.0 / seconds_per_unit)
+        self.ramp_timer.start(self.RAMP_DISPLAY_INTERVAL_MS)
+
+    def update_ramp_display(self):
+        # Signals are blocked so that showing the speed doesn't set it, which would end the ramp
+        self.speed_edit.blockSignals(True)
+        self.speed_edit.setValue(int(self.generator.current_speed))
+        self.speed_edit.blockSignals(False)
+        if not self.generator.ramping:
             self.ramp_speed.setCheckState(QtCore.Qt.Unchecked)
 
     def ramp_speed_checked(self):
         if (self.ramp_speed.checkState()):
-            self._ramp_speed_interval = self.ramp_speed_time.value()
-            self._increase_size()
+            self._start_ramp()
         else:
-            if (self._ramp_timer):
-                self._ramp_timer.cancel()
-            self._ramp_timer = None
+            self.ramp_timer.stop()
+            # Hold the speed the ramp got to. Signals are blocked so the speed is set (and published) just once, below,
+            # whether or not the value shown changes
+            self.speed_edit.blockSignals(True)
+            self.speed_edit.setValue(int(self.generator.current_speed))
+            self.speed_edit.blockSignals(False)
+            self.speed_changed()
+            self.parameters_changed()
 
     def ramp_speed_time_changed(self):
-        self._ramp_speed_interval = self.ramp_speed_time.value()
+        if (self.ramp_speed.checkState()):
+            self._start_ramp()
 
     def get_speed(self):
         try:
@@ -1,42 +1,71 @@
-from PySide.QtCore import QObject
-import threading
+import collections
+try:
+    from math import gcd
+except ImportError:
+    from fractions import gcd
 
-class ModulatorProxy(QObject):
+# What the audio thread modulates with; see ModulatorProxy
+ModulatorState = collections.namedtuple('ModulatorState', ['modulator', 'generator', 'laser_enabled'])
+
+
+class ModulatorProxy(object):
     """Provides a generator-like interface for the AudioServer. allowing requests for audio values to be proxied through
-    a modulator."""
+    a modulator.
+
+    The modulator, generator and laser state are published together as an immutable ModulatorState that the setters
+    (called from the UI thread only) replace as a whole. The audio thread reads the state once per block, so neither
+    thread ever waits on the other. A published modulator belongs to the audio thread: a change to the laser state is
+    applied to it by the audio thread, at the start of its next block."""
     def __init__(self, modulator, generator):
-        QObject.__init__(self)
-        self._modulator = modulator
-        self._generator = generator
-        self._lock = threading.Lock()
+        self._state = ModulatorState(modulator, generator, modulator.laser_enabled)
+
+    def nextN(self, n, out=None):
+        """Returns the next n modulated values. If 'out' (an Nx2 array) is given, the generator draws into it and it is
+        modulated in place."""
+        state = self._state
+        if state.modulator.laser_enabled != state.laser_enabled:
+            state.modulator.laser_enabled = state.laser_enabled
+        if out is None:
+            return state.modulator.modulate_values(state.generator.nextN(n))
+        return state.modulator.modulate_values(state.generator.nextN(n, out=out), out=out)
 
-    def nextN(self, n):
-        with self._lock:
-            values = self.generator.nextN(n)
-            values = self.modulator.modulate_values(values)
-        return values
+    @property
+    def loop_period(self):
+        """The number of samples after which the modulated values repeat from here on, or None if they won't repeat
+        yet (including while a laser change is still to be applied)."""
+        state = self._state
+        generator_period = state.generator.loop_period
+        if generator_period is None or state.modulator.laser_enabled != state.laser_enabled:
+            return None
+        modulator_period = state.modulator.loop_period
+        return generator_period * modulator_period // gcd(generator_period, modulator_period)
+
+    def skip(self, n):
+        """Moves on 'n' samples without generating or modulating them."""
+        state = self._state
+        state.generator.skip(n)
+        state.modulator.skip(n)
 
     @property
     def modulator(self):
-        return self._modulator
+        return self._state.modulator
 
     @modulator.setter
     def modulator(self, modulator):
-        with self._lock:
-            self._modulator = modulator
+        self._state = self._state._replace(modulator=modulator, laser_enabled=modulator.laser_enabled)
 
     @property
     def generator(self):
-        return self._generator
+        return self._state.generator
+
     @generator.setter
     def generator(self, generator):
-        with self._lock:
-            self._generator = generator
+        self._state = self._state._replace(generator=generator)
 
     @property
     def laser_enabled(self):
-        return self._modulator.laser_enabled
+        return self._state.laser_enabled
+
     @laser_enabled.setter
     def laser_enabled(self, enabled):
-        with self._lock:
-            self._modulator.laser_enabled = enabled
+        self._state = self._state._replace(laser_enabled=enabled)
@@ -12,9 +12,20 @@ class Plane2dTo3dAdapter(object):
         self.generator = generator
         self.height = height
 
-    def nextN(self, n):
-        points_2d = self.generator.nextN(n)
-        z_array = numpy.ones((n, 1)) * self.height
-        points_3d = numpy.column_stack((points_2d, z_array))
-        return points_3d
+    def nextN(self, n, out=None):
+        """Returns the next 'n' points. If 'out' (an Nx3 array) is given, the 2D points are drawn straight into its
+        first two columns and the Z column is filled in place, and it is returned."""
+        generator = self.generator
+        height = self.height
+        if out is None:
+            out = numpy.empty((n, 3))
+        generator.nextN(n, out=out[:, :2])
+        out[:, 2] = height
+        return out
 
+    @property
+    def loop_period(self):
+        return self.generator.loop_period
+
+    def skip(self, n):
+        self.generator.skip(n)
@@ -0,0 +1,48 @@
+import numpy
+
+from audio import util as audio_util
+
+
+class RenderPipeline(object):
+    """
+    Renders audio frames for the AudioServer by pulling each block through the calibrator's chain in a single pass:
+    the source (normally the ModulatorProxy) and every stage behind it write into buffers passed down with 'out',
+    rather than each returning a new array, and the values are then clipped and converted to 16-bit frames in place.
+    The buffers are allocated once and only reallocated when the block size changes, so a block costs no allocations
+    beyond the frames handed back.
+
+    Every stage of the source must take an 'out' argument to its nextN. Only the audio thread may call this.
+    """
+    def __init__(self, source):
+        """
+        source -- provides audio values -- must have 'nextN(n, out)' writing Nx2 +/- 1.0 values into 'out'
+        """
+        self.source = source
+        self._values = None
+        self._samples = None
+
+    @property
+    def loop_period(self):
+        """The number of frames after which the source's output repeats from here on, or None if it won't repeat yet."""
+        return self.source.loop_period
+
+    def skip(self, n):
+        """Moves the source on n frames without rendering them."""
+        self.source.skip(n)
+
+    def nextN(self, n):
+        """Returns the next n clipped values. The array returned is reused by the next call."""
+        if self._values is None or self._values.shape[0] != n:
+            self._values = numpy.empty((n, 2))
+            self._samples = numpy.empty((n, 2), dtype=numpy.dtype('<i2'))
+        values = self.source.nextN(n, out=self._values)
+        return numpy.clip(values, -1.0, 1.0, out=values)
+
+    def render_frames(self, n):
+        """Returns the next n frames as bytes of 16-bit stereo PCM, the same as audio.util.convert_values_to_frames
+        would for the next n values."""
+        values = self.nextN(n)
+        values *= audio_util.MAX_S16
+        numpy.rint(values, out=values)
+        self._samples[...] = values
+        return self._samples.tobytes()
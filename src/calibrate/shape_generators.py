@@ -1,7 +1,15 @@
-import threading
-import math
+import collections
+import os
 import numpy
 
+# The parameters a PathGenerator draws with; see PathGenerator
+PathParameters = collections.namedtuple('PathParameters', ['sampling_rate', 'speed', 'size', 'center'])
+# A PathGenerator's path laid out for one set of PathParameters; see PathGenerator._build_table
+PathTable = collections.namedtuple('PathTable', ['parameters', 'speed', 'sample_counts', 'x', 'y', 'vertex_indices',
+                                                 'lead_in_samples', 'loop_samples'])
+# A change of speed a PathGenerator makes sample by sample; see PathGenerator.ramp_speed
+SpeedRamp = collections.namedtuple('SpeedRamp', ['start', 'end', 'rate'])
+
 
 class NullGenerator(object):
     def __init__(self, sampling_rate, speed, size, center):
@@ -13,11 +21,33 @@ class NullGenerator(object):
         self.size = float(size)
         self.center = center
 
-    def nextN(self, n):
-        """Returns the next N points as a list of (x, y) tuples."""
-        x_array = numpy.ones((n, 1)) * self.center[0]
-        y_array = numpy.ones((n, 1)) * self.center[1]
-        return numpy.column_stack((x_array, y_array))
+    def nextN(self, n, out=None):
+        """Returns the next N points as a list of (x, y) tuples, in 'out' (an Nx2 array) if given."""
+        center = self.center
+        if out is None:
+            out = numpy.empty((n, 2))
+        out[:, 0] = center[0]
+        out[:, 1] = center[1]
+        return out
+
+    @property
+    def loop_period(self):
+        return 1
+
+    def skip(self, n):
+        pass
+
+    def ramp_speed(self, start, end, rate):
+        """Speed makes no difference to a point, so ramps are over as soon as they start."""
+        self.speed = float(end)
+
+    @property
+    def current_speed(self):
+        return self.speed
+
+    @property
+    def ramping(self):
+        return False
 
 
 class PathGenerator(object):
@@ -25,6 +55,16 @@ class PathGenerator(object):
     Superclass for generators that follow a defined path in normalized space.
     This class implements all the logic needed to follow the path. To use it, subclass it and override
     the class attribute PATH with a list of (x,y) vertices that define the closed path.
+
+    The parameters are kept in an immutable PathParameters snapshot that the setters replace as a whole, so the UI
+    can change them while the audio thread is drawing without either waiting on the other. Each call to nextN draws
+    with the snapshot that was current when it started.
+
+    The path is laid out as a table of the sample at which each vertex is reached, built only when the parameters
+    change, so drawing a block is a single interpolation over it and costs the same however many vertices it crosses.
+
+    The speed can also be ramped, changing it a little every sample. While it ramps, the path is followed through the
+    table built for the speed the ramp started from, at a rate scaled by the speed of each sample.
     """
     PATH = None
     def __init__(self, sampling_rate, speed, size, center):
@@ -34,94 +74,177 @@ class PathGenerator(object):
         size -- float -- The size in "units" to draw the shape. It will be this large on-side (+/- 0.5 size)
         center -- (x, y) -- The coordinates where the center of the shape should be drawn.
         """
-        self._sampling_rate = int(sampling_rate)
-        self._speed = speed
-        self._size = size
-        self.center = center
-        self._lock = threading.Lock()
-        self._update_cycles()
-        self._current_position = tuple(self.center)
-        self._next_vertex_index = 0
+        self._parameters = PathParameters(int(sampling_rate), speed, size, tuple(center))
+        self._ramp = None               # The SpeedRamp set by the UI thread, if any
+        self._ramp_seen = None          # The ramp the audio thread is following...
+        self._current_speed = speed     # ...and the speed it has got to
+        self._table = None      # The PathTable for the current parameters, built by the audio thread when needed
+        self._phase = 0         # Samples into the table
 
     @property
     def sampling_rate(self):
-        return self._sampling_rate
+        return self._parameters.sampling_rate
 
     @sampling_rate.setter
     def sampling_rate(self, rate):
-        with self._lock:
-            self.sampling_rate = rate
-            self._update_cycles()
+        self._parameters = self._parameters._replace(sampling_rate=int(rate))
 
     @property
     def speed(self):
-        return self._speed
+        return self._parameters.speed
 
     @speed.setter
     def speed(self, speed):
-        with self._lock:
-            self._speed = speed
-            self._update_cycles()
+        """Draws at the given speed from the next block on, ending any ramp."""
+        self._parameters = self._parameters._replace(speed=speed)
+        self._ramp = None
+
+    def ramp_speed(self, start, end, rate):
+        """
+        Changes the speed steadily, sample by sample, from the next block on. Once the end speed is reached it is held
+        until the speed is set.
+
+        start -- float -- The speed to start from, in units per second.
+        end -- float -- The speed to finish at, in units per second.
+        rate -- float -- How fast to change the speed, in units per second per second.
+        """
+        if start <= 0 or end <= 0 or rate <= 0:
+            raise ValueError('Speeds and rate of a ramp must be positive')
+        self._ramp = SpeedRamp(float(start), float(end), float(rate))
+
+    @property
+    def current_speed(self):
+        """The speed drawn at by the end of the last block."""
+        return self._current_speed
+
+    @property
+    def ramping(self):
+        """Whether a ramp is set that hasn't yet reached its end speed."""
+        ramp = self._ramp
+        return ramp is not None and self._current_speed != ramp.end
 
     @property
     def size(self):
-        with self._lock:
-            return self._size
+        return self._parameters.size
 
     @size.setter
     def size(self, size):
-        with self._lock:
-            self._size = size
-            self._update_cycles()
-
-    def _update_cycles(self):
-        self._cycle_step = self._speed/float(self._sampling_rate)
-
-    def nextN(self, n):
-        """Returns the next 'n' samples of the shape."""
-        samples = numpy.empty((n, 2))
-        n_left = n
-        while n_left:
-            # Figure out how far until the next vertex
-            cur_x, cur_y = self._current_position
-            next_x, next_y = self._get_vertex(self._next_vertex_index)
-            distance = math.sqrt(
-                math.pow(next_x - cur_x, 2.0)
-                + math.pow(next_y - cur_y, 2.0)
-            )
-            # Edge case: just in case we some how end "on" the next vertex; advance to the next vertex immediately
-            if distance == 0.0:
-                self._next_vertex_index = (self._next_vertex_index + 1) % len(self.PATH)
-                continue
-            num_samples_needed = distance / self._cycle_step
-            # Do we have enough samples left to hit the end?
-            if num_samples_needed > n_left:
-                # Not enough samples, so go as far as we can
-                num_samples = n_left
-                cosine_x = (next_x - self._current_position[0]) / distance
-                cosine_y = (next_y - self._current_position[1]) / distance
-                end_x = cur_x + cosine_x * self._cycle_step * num_samples
-                end_y = cur_y + cosine_y * self._cycle_step * num_samples
-            else:
-                # At least enough, so use as many as needed to get there and advance to next vertex
-                num_samples = int(math.ceil(num_samples_needed))
-                end_x = next_x
-                end_y = next_y
-                self._next_vertex_index = (self._next_vertex_index + 1) % len(self.PATH)
-            # NOTE: Have to manually compute positive indices because using negative indices can lead to 0 as an end
-            start_i = n-n_left
-            end_i = start_i+num_samples
-            samples[start_i:end_i,0] = numpy.linspace(cur_x, end_x, num=num_samples, endpoint=False)
-            samples[start_i:end_i,1] = numpy.linspace(cur_y, end_y, num=num_samples, endpoint=False)
-            n_left -= num_samples
-            self._current_position = (end_x, end_y)
+        self._parameters = self._parameters._replace(size=size)
+
+    @property
+    def center(self):
+        return self._parameters.center
+
+    @center.setter
+    def center(self, center):
+        self._parameters = self._parameters._replace(center=tuple(center))
+
+    def nextN(self, n, out=None):
+        """Returns the next 'n' samples of the shape, in 'out' (an Nx2 array) if given."""
+        parameters = self._parameters
+        ramp = self._ramp
+        if ramp is not self._ramp_seen:
+            self._ramp_seen = ramp
+            if ramp is not None:
+                self._current_speed = ramp.start
+        if ramp is None:
+            self._current_speed = parameters.speed
+        ramping = ramp is not None and self._current_speed != ramp.end
+        table = self._table
+        if table is None or table.parameters is not parameters or (not ramping and table.speed != self._current_speed):
+            table = self._table = self._build_table(parameters, self._current_speed)
+            self._phase = 0
+        samples = numpy.empty((n, 2)) if out is None else out
+        if ramping:
+            # Each sample moves along the table by its speed relative to the speed the table was built for
+            steps = self._ramp_speeds(n, ramp) / table.speed
+            phases = self._phase + numpy.cumsum(steps) - steps
+            end_phase = self._phase + numpy.sum(steps)
+        else:
+            phases = numpy.arange(self._phase, self._phase + n, dtype=float)
+            end_phase = self._phase + n
+        if not table.loop_samples:
+            # Nothing to follow (every vertex is in the same place), so stay put
+            samples[:, 0] = table.x[-1]
+            samples[:, 1] = table.y[-1]
+            return samples
+        looped = phases >= table.lead_in_samples
+        phases[looped] = table.lead_in_samples + (phases[looped] - table.lead_in_samples) % table.loop_samples
+        self._phase = self._wrap_phase(end_phase, table)
+        samples[:, 0] = numpy.interp(phases, table.sample_counts, table.x)
+        samples[:, 1] = numpy.interp(phases, table.sample_counts, table.y)
         return samples
 
-    def _get_vertex(self, index):
-        """Returns the vertex at the given index, scaled by the current size."""
-        norm_vert = self.PATH[index]
-        scaled_vert = ((self._size/2.0)*norm_vert[0]+self.center[0], (self._size/2.0)*norm_vert[1]+self.center[1])
-        return scaled_vert
+    @property
+    def loop_period(self):
+        """The number of samples after which the shape repeats from here on, or None if it won't repeat until more has
+        been drawn: the path is still to be laid out for the current parameters, or its lead-in still to be drawn."""
+        table = self._table
+        if table is None or table.parameters is not self._parameters or self.ramping:
+            return None
+        if not table.loop_samples:
+            return 1
+        if self._phase < table.lead_in_samples:
+            return None
+        return table.loop_samples
+
+    def skip(self, n):
+        """Moves on 'n' samples without drawing them."""
+        table = self._table
+        if self.ramping:
+            self.nextN(n)
+        elif table is not None and table.loop_samples:
+            self._phase = self._wrap_phase(self._phase + n, table)
+
+    def _ramp_speeds(self, n, ramp):
+        """Returns the speed of each of the next n samples of the ramp, and moves the current speed on past them."""
+        rate = ramp.rate if ramp.end > ramp.start else -ramp.rate
+        speeds = self._current_speed + numpy.arange(n + 1) * (rate / self._parameters.sampling_rate)
+        speeds = numpy.clip(speeds, min(ramp.start, ramp.end), max(ramp.start, ramp.end))
+        self._current_speed = float(speeds[-1])
+        return speeds[:-1]
+
+    def _wrap_phase(self, phase, table):
+        """Wraps a phase past the lead-in back into the loop."""
+        if phase < table.lead_in_samples:
+            return phase
+        return table.lead_in_samples + (phase - table.lead_in_samples) % table.loop_samples
+
+    def _locate(self):
+        """Returns the current position and the index in PATH of the vertex being drawn towards."""
+        table = self._table
+        if table is None:
+            return self._parameters.center, 0
+        if not table.loop_samples:
+            return (table.x[-1], table.y[-1]), table.vertex_indices[-1]
+        next_point = numpy.searchsorted(table.sample_counts, self._phase, side='right')
+        position = (numpy.interp(self._phase, table.sample_counts, table.x),
+                    numpy.interp(self._phase, table.sample_counts, table.y))
+        return position, table.vertex_indices[next_point]
+
+    def _build_table(self, parameters, speed):
+        """
+        Lays the path out for the given parameters and speed as a table of the sample at which each vertex is reached,
+        starting from where the last table left off: it leads in from the current position to the next vertex, then
+        goes once round the path back to that vertex. Each edge takes a whole number of samples, the fewest that don't
+        go faster than the speed, so every vertex is drawn exactly.
+        """
+        position, next_index = self._locate()
+        num_vertices = len(self.PATH)
+        order = [(next_index + i) % num_vertices for i in range(num_vertices + 1)]
+        path = numpy.array(self.PATH, dtype=float)[order]
+        center = parameters.center
+        x = numpy.concatenate(([position[0]], (parameters.size / 2.0) * path[:, 0] + center[0]))
+        y = numpy.concatenate(([position[1]], (parameters.size / 2.0) * path[:, 1] + center[1]))
+        cycle_step = speed / float(parameters.sampling_rate)
+        edge_samples = numpy.ceil(numpy.sqrt(numpy.diff(x) ** 2 + numpy.diff(y) ** 2) / cycle_step).astype(int)
+        # Drop points on top of the one before; they take no samples to reach
+        keep = numpy.concatenate(([True], edge_samples > 0))
+        sample_counts = numpy.concatenate(([0], numpy.cumsum(edge_samples[edge_samples > 0])))
+        lead_in_samples = int(edge_samples[0])
+        return PathTable(parameters, speed, sample_counts.astype(float), x[keep], y[keep],
+                         numpy.array([next_index] + order)[keep], lead_in_samples,
+                         int(sample_counts[-1]) - lead_in_samples)
 
 
 class StarGenerator(PathGenerator):
@@ -182,35 +305,49 @@ class GridGenerator(PathGenerator):
         PATH = PATH + [(current_x,-1.0)]
     PATH =  PATH + [(-1.0,-1.0)]
 
+# Paths already read by load_obj_path, by (filename, xcolumn, ycolumn); each entry is (mtime, path)
+_obj_path_cache = {}
+
+
+def load_obj_path(filename, xcolumn=1, ycolumn=3):
+    """
+    Reads the path an OBJ file outlines: the vertices its faces and lines visit, in reverse order, as a tuple of
+    (x, y) tuples. Paths are cached until the file changes.
+
+    filename -- string -- The OBJ file.
+    xcolumn, ycolumn -- int -- The fields of each vertex line ('v' being field 0) to use for x and y.
+    """
+    try:
+        mtime = os.path.getmtime(filename)
+        cached = _obj_path_cache.get((filename, xcolumn, ycolumn))
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(filename, 'r') as obj_file:
+            obj_data = obj_file.read().splitlines()
+    except (IOError, OSError):
+        raise Exception("obj file for path generation not found at: %s" % str(filename))
+
+    has_name = any(line.startswith('o') for line in obj_data)
+    vertex_fields = [line.split()[1:] for line in obj_data if line.startswith('v ')]
+    # Faces and lines list their vertices by 1-based index, optionally followed by '/' and texture/normal indices
+    order = [index.split('/')[0] for line in obj_data if line.startswith('f') or line.startswith('l')
+             for index in reversed(line.split()[1:])]
+    if not (has_name and vertex_fields and order):
+        raise Exception("obj provided is incomplete or wrong format")
+    try:
+        vertices = numpy.array([(fields[xcolumn - 1], fields[ycolumn - 1]) for fields in vertex_fields], dtype=float)
+        path = vertices[numpy.array(order, dtype=int) - 1]
+    except (ValueError, IndexError):
+        raise Exception("obj provided is incomplete or wrong format")
+    path = tuple(map(tuple, path.tolist()))
+    _obj_path_cache[(filename, xcolumn, ycolumn)] = (mtime, path)
+    return path
+
+
 class ObjFileGenerator(PathGenerator):
     """
     Reads and ObjectFile and creates a path
     """
-    PATH = []
-
     def __init__(self, sampling_rate, speed, size, center,filename = 'testdata.obj', xcolumn = 1, ycolumn = 3):
         super(ObjFileGenerator, self).__init__(sampling_rate, speed, size, center)
-        try:
-            obj_file = open(filename, 'r')
-            obj_data = obj_file.readlines()
-        except Exception as ex:
-            raise Exception("obj file for path generation not found at: %s" % str(filename))
-
-        obj_name = None
-        obj_raw_vectors = []
-        obj_order = []
-
-        for line in obj_data:
-            if line.startswith('o'):
-                obj_name = line[2:]
-            elif line.startswith('v'):
-                split_data = line.split(' ')
-                obj_raw_vectors = obj_raw_vectors + [(float(split_data[xcolumn]) , float(split_data[ycolumn]))]
-            elif line.startswith('f') or line.startswith('l'):
-                obj_order = obj_order + line.split(' ')[1:][::-1]
-        if (obj_name and obj_raw_vectors and obj_order):
-            for pos in obj_order:
-                self.PATH = self.PATH + [ obj_raw_vectors[int(pos) -1] ]
-        else:
-            raise Exception("obj provided is incomplete or wrong format")
-
+        self.PATH = list(load_obj_path(filename, xcolumn, ycolumn))
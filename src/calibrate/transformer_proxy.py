@@ -1,29 +1,76 @@
-import threading
-from PySide.QtCore import QObject
+import collections
+import copy
+import numpy
 
-class PositionToAudioTransformerProxy(QObject):
+from audio.transform import PositionToAudioTransformer
+
+# What the audio thread transforms with; see PositionToAudioTransformerProxy
+TransformerState = collections.namedtuple('TransformerState', ['transformer', 'generator'])
+
+
+class PositionToAudioTransformerProxy(object):
     """
     Provides a generator-like object for the AudioServer, allowing requests for audio samples to be proxied
     as requests for position samples, which are then transformed through the PositionToAudioTransformer.
+
+    The transformer and generator are published together as an immutable TransformerState that the setters (called
+    from the UI thread only) replace as a whole, and the audio thread reads once per block, so neither thread ever
+    waits on the other. The UI edits the tuning parameters in place, so the published transformer works from a copy
+    of them, taken whenever 'tuning_changed' is called.
     """
     def __init__(self, transformer, generator):
-        QObject.__init__(self)
-        self._generator = generator
-        self.transformer = transformer
-        self._lock = threading.Lock()
+        """
+        transformer -- PositionToAudioTransformer -- Its tuning parameter collection is the one the UI edits.
+        generator -- Generator of (x, y, z) positions -- must have 'nextN'
+        """
+        self._tuning_parameter_collection = transformer.tuning_parameter_collection
+        self._state = TransformerState(self._copy_transformer(), generator)
+        self._points_buffer = None      # Only used by the audio thread
+
+    def nextN(self, N, out=None):
+        """Returns the next N audio values. If 'out' (an Nx2 array) is given, the values are written into it, and the
+        positions are drawn into a buffer kept from block to block, so the generator must take an 'out' argument too."""
+        state = self._state
+        if out is None:
+            points = state.generator.nextN(N)
+        else:
+            points = self._points_buffer
+            if points is None or points.shape[0] != N:
+                points = self._points_buffer = numpy.empty((N, 3))
+            state.generator.nextN(N, out=points)
+        samples = state.transformer.transform_points(points, out=out)
+        return samples
+
+    @property
+    def loop_period(self):
+        """The number of samples after which the values repeat from here on, or None if they won't repeat yet."""
+        return self._state.generator.loop_period
+
+    def skip(self, n):
+        """Moves on 'n' samples without transforming them."""
+        self._state.generator.skip(n)
+
+    def tuning_changed(self):
+        """Publishes the tuning parameters as they are now. Until this is called, the audio thread keeps using the
+        ones last published."""
+        self._state = self._state._replace(transformer=self._copy_transformer())
 
-    def nextN(self, N):
-        with self._lock:
-            points = self._generator.nextN(N)
-            samples = self.transformer.transform_points(points)
-            return samples
+    @property
+    def transformer(self):
+        return self._state.transformer
+
+    @transformer.setter
+    def transformer(self, transformer):
+        self._tuning_parameter_collection = transformer.tuning_parameter_collection
+        self.tuning_changed()
 
     @property
     def generator(self):
-        with self._lock:
-            return self._generator
+        return self._state.generator
 
     @generator.setter
     def generator(self, generator):
-        with self._lock:
-            self._generator = generator
+        self._state = self._state._replace(generator=generator)
+
+    def _copy_transformer(self):
+        return PositionToAudioTransformer(copy.deepcopy(self._tuning_parameter_collection))
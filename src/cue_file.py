@@ -1,4 +1,8 @@
+import os
 import re
+import struct
+
+import numpy
 
 class CueFileWriter(object):
     FORMAT_VERSION = 2
@@ -45,19 +49,53 @@ class CueFileReader(object):
     FORMAT_VERSION = 2
 
     CUE_FILE_VERSION_RE = re.compile(r'''^VERSION (?P<version>[0-9.]+)$''')
-    CUE_FILE_PLAY_CUE_RE = re.compile(r'''^PLAY (?P<start>[0-9]+) (?P<end>[0-9]+)$''', re.IGNORECASE)
-    CUE_FILE_LOOP_UNTIL_HEIGHT_CUE_RE = re.compile(
-        r'''^LOOP (?P<start>[0-9]+) (?P<end>[0-9]+) UNTIL HEIGHT (?P<height>[0-9.]+)$''', re.IGNORECASE)
 
     def __init__(self, infile):
-        """Provides read access to the data inside a CUE file."""
+        """Provides read access to the data inside a CUE file.
+        @params
+            infile -- file-like object -- The CUE file, opened in text or binary mode. Binary is faster for
+                read_cue_table, which then needn't decode the text.
+        """
         self.infile = infile
 
     def read_cues(self):
         """Returns a list of Cue objects correspending to the CUEs within the file"""
+        return list(self.iter_cues())
+
+    def iter_cues(self):
+        """Yields the Cue objects in the file one at a time, only reading as far into the file as has been asked for."""
+        self.infile.seek(0)
+        self._read_headers()
+        while True:
+            line = _as_text(self.infile.readline())
+            if not line:
+                return
+            tokens = line.split()
+            if not tokens:
+                continue
+            cue = self._parse_cue(tokens, line)
+            if cue is None:
+                return
+            yield cue
+
+    def read_cue_table(self):
+        """Returns all the cues in the file as a CueTable. A well-formed cue list is converted as a whole with numpy,
+        which is much faster than building a Cue object per line."""
         self.infile.seek(0)
         self._read_headers()
-        return [cue for cue in self._get_next_cue_generator()]
+        text = self.infile.read()
+        try:
+            if not isinstance(text, bytes):
+                text = text.encode('ascii')
+        except UnicodeError:
+            records = None
+        else:
+            end = text.rfind(b'END_CUES')   # If there's an earlier one, the fast parse fails and the line parser stops there
+            records = _parse_cue_list(text, end if end >= 0 else len(text))
+        if records is None:
+            # Not in the form the converter writes (or not valid at all); parse it line by line
+            return CueTable.from_cues(self.read_cues())
+        return CueTable(records)
 
     def _read_headers(self):
         # First line is CUE_FILE identifier
@@ -90,58 +128,177 @@ class CueFileReader(object):
         if line != 'BEGIN_CUES':
             raise ValueError('Syntax error: expected "BEGIN_CUES", got "%s"', (line,))
 
-    def _get_next_cue_generator(self):
-        while True:
-            line = self._read_nonblank_line()
-            if not line:
-                raise StopIteration()
-            if line == 'END_CUES':
-                raise StopIteration()
-            match = CueFileReader.CUE_FILE_PLAY_CUE_RE.match(line)
-            if match:
-                yield self._parse_play_cue(match)
-                continue
-            match = CueFileReader.CUE_FILE_LOOP_UNTIL_HEIGHT_CUE_RE.match(line)
-            if match:
-                yield self._parse_loop_until_height_cue(match)
-                continue
-            raise ValueError('Syntax error: expected cue, got "%s"' % (line,))
+    def _parse_cue(self, tokens, line):
+        """Returns the cue on a line split into tokens, or None if the line ends the cue list."""
+        keyword = tokens[0].upper()
+        if keyword == 'PLAY' and len(tokens) == 3:
+            return PlayCue(self._parse_frame(tokens[1], 'PLAY', 'start_frame'),
+                           self._parse_frame(tokens[2], 'PLAY', 'end_frame'))
+        if (keyword == 'LOOP' and len(tokens) == 6
+                and tokens[3].upper() == 'UNTIL' and tokens[4].upper() == 'HEIGHT'):
+            return LoopUntilHeightCue(self._parse_frame(tokens[1], 'LOOP UNTIL HEIGHT', 'start_frame'),
+                                      self._parse_frame(tokens[2], 'LOOP UNTIL HEIGHT', 'end_frame'),
+                                      self._parse_height(tokens[5]))
+        if keyword == 'END_CUES' and len(tokens) == 1:
+            return None
+        raise ValueError('Syntax error: expected cue, got "%s"' % (line.strip().upper(),))
+
+    def _parse_frame(self, token, cue_name, field_name):
+        if not token.isdigit():
+            raise ValueError('Syntax error: %s cue <%s> should be int; got "%s"' % (cue_name, field_name, token))
+        return int(token)
+
+    def _parse_height(self, token):
+        try:
+            if not token.replace('.', '').isdigit():
+                raise ValueError()
+            return float(token)
+        except ValueError:
+            raise ValueError('Syntax error: LOOP UNTIL HEIGHT cue <height> should be float; got "%s"' % (token,))
 
     def _read_nonblank_line(self):
         """Returns a non-empty line, or None if the end of the file is reached."""
         line = None
         while not line:
-            line = self.infile.readline()
+            line = _as_text(self.infile.readline())
             if not line:
                 return None
             line = line.strip().upper()
         return line
 
-    def _parse_play_cue(self, match):
-        try:
-            start_frame = int(match.group('start'))
-        except ValueError:
-            raise ValueError('Syntax error: PLAY cue <start_frame> should be int; got "%s"' % (match.group('start'),))
-        try:
-            end_frame = int(match.group('end'))
-        except ValueError:
-            raise ValueError('Syntax error: PLAY cue <end_frame> should be int; got "%s"' % (match.group('end'),))
-        return PlayCue(start_frame, end_frame)
 
-    def _parse_loop_until_height_cue(self, match):
-        try:
-            start_frame = int(match.group('start'))
-        except ValueError:
-            raise ValueError('Syntax error: LOOP UNTIL HEIGHT cue <start_frame> should be int; got "%s"' % (match.group('start'),))
-        try:
-            end_frame = int(match.group('end'))
-        except ValueError:
-            raise ValueError('Syntax error: LOOP UNTIL HEIGHT cue <end_frame> should be int; got "%s"' % (match.group('end'),))
-        try:
-            until_height = float(match.group('height'))
-        except ValueError:
-            raise ValueError('Syntax error: LOOP UNTIL HEIGHT cue <height> should be float; got "%s"' % (match.group('height'),))
-        return LoopUntilHeightCue(start_frame, end_frame, until_height)
+def _as_text(line):
+    """Returns a line read from a file opened in either mode as text."""
+    return line.decode('latin-1') if isinstance(line, bytes) else line
+
+
+_PAD = b'0' * 16    # Digits around the cue list, so there are always 16 bytes to read before a number's end
+_WORD_MASK = numpy.uint64(0xFFFFFFFFFF)
+_PLAY_WORD = numpy.uint64(struct.unpack('<Q', b'PLAY 000')[0]) & _WORD_MASK
+_LOOP_WORD = numpy.uint64(struct.unpack('<Q', b'LOOP 000')[0]) & _WORD_MASK
+_UNTIL_WORD = numpy.uint64(struct.unpack('<Q', b' UNTIL H')[0])
+_HEIGHT_WORD = numpy.uint64(struct.unpack('<Q', b' HEIGHT ')[0])
+# Masks keeping the values of the last 0 to 8 digits of a word
+_DIGIT_MASKS = numpy.array([0x0F0F0F0F0F0F0F0F & ~((1 << (64 - 8 * num_digits)) - 1) for num_digits in range(9)],
+                           dtype=numpy.uint64)
+_INT_POWERS_OF_TEN = 10 ** numpy.arange(16, dtype=numpy.int64)
+_POWERS_OF_TEN = 10.0 ** numpy.arange(16)
+_PARSE_CHUNK_SIZE = 1 << 19   # Bytes of cue lines converted at once
+
+
+def _parse_cue_list(text, end):
+    """
+    Converts the cue lines of a cue file, text[:end] as bytes, into CueTable records with a few numpy passes over
+    each chunk of lines, or returns None unless every line is exactly "PLAY <start> <end>" or "LOOP <start> <end>
+    UNTIL HEIGHT <height>", upper case, with single spaces and a dot in every height -- as CueFileWriter writes them.
+    """
+    if end and text[end - 1:end] != b'\n':
+        return None
+    chunks = []
+    start = 0
+    while start < end:
+        # A chunk at a time, few enough lines for the working arrays to stay in cache
+        chunk_end = text.find(b'\n', start + _PARSE_CHUNK_SIZE, end) + 1 or end
+        columns = _parse_cue_lines(b''.join((_PAD, text[start:chunk_end], _PAD)))
+        if columns is None:
+            return None
+        chunks.append(columns)
+        start = chunk_end
+    if not chunks:
+        return numpy.zeros(0, dtype=CueTable.RECORD_DTYPE)
+    # Fill the (unaligned) records once, from whole columns
+    start_frames, end_frames, cue_is_loop, heights = [numpy.concatenate(column) for column in zip(*chunks)]
+    records = numpy.empty(len(start_frames), dtype=CueTable.RECORD_DTYPE)
+    records['start_frame'] = start_frames
+    records['end_frame'] = end_frames
+    records['cue_type'] = cue_is_loop
+    records['until_height'] = heights
+    return records
+
+
+def _parse_cue_lines(padded_lines):
+    """Converts whole cue lines, with _PAD either side, for _parse_cue_list, returning their start frames, end
+    frames, whether each is a LOOP cue and their heights, or None."""
+    chars = numpy.frombuffer(padded_lines, dtype=numpy.uint8)
+    # Every byte position as the start of a little-endian 8 byte word
+    words = numpy.ndarray(shape=(len(chars) - 7,), dtype='<u8', buffer=chars, strides=(1,))
+    start = len(_PAD)
+    lines = chars[start:len(chars) - len(_PAD)]
+    # Below the digits are the separators: spaces, the dots of the heights and the line ends. A PLAY line has 3, a
+    # LOOP line 7.
+    separators = numpy.flatnonzero(lines < ord('0'))
+    separators += start
+    kinds = chars[separators]
+    line_ends = numpy.flatnonzero(kinds == ord('\n'))
+    separators_per_line = numpy.diff(line_ends, prepend=-1)
+    cue_is_loop = separators_per_line == 7
+    if not numpy.all(cue_is_loop | (separators_per_line == 3)):
+        return None
+    line_starts = numpy.concatenate(([start], separators[line_ends[:-1]] + 1))
+    if not numpy.array_equal(words[line_starts] & _WORD_MASK, numpy.where(cue_is_loop, _LOOP_WORD, _PLAY_WORD)):
+        return None
+    firsts = line_ends - separators_per_line + 1    # Index of each line's first separator, after the keyword
+    loops = firsts[cue_is_loop]
+    # Every separator that isn't a line end or a height's dot is a space
+    num_cues = len(line_ends)
+    if (numpy.count_nonzero(kinds == ord(' ')) != len(kinds) - num_cues - len(loops)
+            or not numpy.all(kinds[loops + 5] == ord('.'))):
+        return None
+    until_starts = separators[loops + 2]
+    if not (numpy.all(words[until_starts] == _UNTIL_WORD) and numpy.all(words[until_starts + 6] == _HEIGHT_WORD)):
+        return None
+    # With every keyword in its place, any other letter would be in a number
+    if numpy.count_nonzero(lines > ord('9')) != 4 * num_cues + 11 * len(loops):
+        return None
+    # Each number runs up to the separator at the given offset from its line's first one:
+    # PLAY <start 1> <end 2> and LOOP <start 1> <end 2> UNTIL HEIGHT <integer part 5>.<fraction 6>
+    number_separators = numpy.concatenate((firsts + 1, firsts + 2, loops + 5, loops + 6))
+    number_ends = separators[number_separators]
+    number_lengths = number_ends - separators[number_separators - 1] - 1
+    numbers = _parse_numbers(words, number_ends, number_lengths)
+    if numbers is None:
+        return None
+    integer_parts, fractions = numbers[2 * num_cues:].reshape(2, -1)
+    integer_digits, decimals = number_lengths[2 * num_cues:].reshape(2, -1)
+    if len(loops) and (integer_digits + decimals).max() > 15:
+        return None
+    heights = numpy.full(num_cues, numpy.nan)
+    # An exact integer over an exact power of ten rounds just as float() does on the decimal
+    heights[cue_is_loop] = (integer_parts * _INT_POWERS_OF_TEN[decimals] + fractions) / _POWERS_OF_TEN[decimals]
+    return numbers[:num_cues], numbers[num_cues:2 * num_cues], cue_is_loop, heights
+
+
+def _parse_numbers(words, ends, lengths):
+    """Returns the values of the decimal numbers of 1 to 16 digits ending before the given byte positions, or None
+    if any is longer or empty."""
+    if not len(ends):
+        return numpy.zeros(0, dtype=numpy.int64)
+    if lengths.min() < 1 or lengths.max() > 16:
+        return None
+    values = _eight_digits(words[ends - 8], numpy.minimum(lengths, 8))
+    long_numbers = numpy.flatnonzero(lengths > 8)
+    if len(long_numbers):
+        high_digits = _eight_digits(words[ends[long_numbers] - 16], lengths[long_numbers] - 8)
+        high_digits *= numpy.uint64(10 ** 8)
+        values[long_numbers] += high_digits
+    return values.view(numpy.int64)
+
+
+def _eight_digits(words, num_digits):
+    """Converts the last num_digits (1 to 8) bytes of each word, ASCII digits, to their value, eight at a time.
+    Works in place."""
+    # Take the digits' values, clearing the bytes before them to leave leading zeros; the first is the lowest byte
+    words &= _DIGIT_MASKS[num_digits]
+    # Combine neighbouring digits, then neighbouring pairs, then neighbouring fours
+    words *= numpy.uint64(10 << 8 | 1)
+    words >>= numpy.uint64(8)
+    words &= numpy.uint64(0x00FF00FF00FF00FF)
+    words *= numpy.uint64(100 << 16 | 1)
+    words >>= numpy.uint64(16)
+    words &= numpy.uint64(0x0000FFFF0000FFFF)
+    words *= numpy.uint64(10000 << 32 | 1)
+    words >>= numpy.uint64(32)
+    return words
 
 
 class CueTypes:
@@ -165,3 +322,129 @@ class LoopUntilHeightCue(Cue):
         self.start_frame = start_frame
         self.end_frame = end_frame
         self.until_height = until_height
+
+
+class CueTable(object):
+    """
+    The cues of a print as a numpy structured array of fixed-width records, one per cue. Indexing and iterating give
+    Cue objects, so a CueTable can be used wherever a list of cues is; the columns themselves are in 'records'.
+    """
+    RECORD_DTYPE = numpy.dtype([
+        ('start_frame', '<i8'),
+        ('end_frame', '<i8'),
+        ('cue_type', 'u1'),
+        ('until_height', '<f8'),   # NaN for PLAY cues
+    ])
+    CUE_TYPE_CODES = {CueTypes.PLAY: 0, CueTypes.LOOP_UNTIL_HEIGHT: 1}
+
+    def __init__(self, records):
+        """
+        records -- numpy.ndarray of RECORD_DTYPE -- The cues, in order.
+        """
+        self.records = records
+        self._loop_cue_indices = None
+
+    @classmethod
+    def from_cues(cls, cues):
+        records = numpy.zeros(len(cues), dtype=cls.RECORD_DTYPE)
+        for index, cue in enumerate(cues):
+            try:
+                cue_type = cls.CUE_TYPE_CODES[cue.cue_type]
+            except KeyError:
+                raise TypeError('Unrecognized cue type "%s"' % cue.cue_type)
+            until_height = getattr(cue, 'until_height', float('nan'))
+            records[index] = (cue.start_frame, cue.end_frame, cue_type, until_height)
+        return cls(records)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) % cls.RECORD_DTYPE.itemsize:
+            raise ValueError('Cue table is %d bytes, which is not a whole number of %d byte records' % (
+                len(data), cls.RECORD_DTYPE.itemsize))
+        return cls(numpy.frombuffer(data, dtype=cls.RECORD_DTYPE))
+
+    def to_bytes(self):
+        return self.records.tobytes()
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        record = self.records[index]
+        if record['cue_type'] == self.CUE_TYPE_CODES[CueTypes.LOOP_UNTIL_HEIGHT]:
+            return LoopUntilHeightCue(int(record['start_frame']), int(record['end_frame']), float(record['until_height']))
+        return PlayCue(int(record['start_frame']), int(record['end_frame']))
+
+    def __iter__(self):
+        for index in range(len(self.records)):
+            yield self[index]
+
+    def find_cue_for_frame(self, frame_num):
+        """Returns the index of the cue that plays the given frame of the wave file, or None if no cue does. Cues are
+        expected in frame order, as the converter writes them."""
+        index = numpy.searchsorted(self.records['start_frame'], frame_num, side='right') - 1
+        if index < 0 or frame_num >= self.records['end_frame'][index]:
+            return None
+        return int(index)
+
+    def find_cue_for_height(self, height):
+        """Returns the index of the first LOOP_UNTIL_HEIGHT cue that would still be waiting at the given height (that
+        is, with a greater until_height), or None if the height is past the last one."""
+        loop_indices = self.loop_cue_indices()
+        position = numpy.searchsorted(self.records['until_height'][loop_indices], height, side='right')
+        if position == len(loop_indices):
+            return None
+        return int(loop_indices[position])
+
+    def loop_cue_indices(self):
+        """Returns the indices of the LOOP_UNTIL_HEIGHT cues, in order."""
+        if self._loop_cue_indices is None:
+            self._loop_cue_indices = numpy.flatnonzero(
+                self.records['cue_type'] == self.CUE_TYPE_CODES[CueTypes.LOOP_UNTIL_HEIGHT])
+        return self._loop_cue_indices
+
+
+# Cue tables can be embedded in the wave file itself, in a RIFF chunk following the audio. Players that don't know
+# about the chunk skip it.
+CUE_CHUNK_ID = b'pcue'
+CUE_CHUNK_VERSION = 1
+_RIFF_HEADER = struct.Struct('<4sI4s')
+_CHUNK_HEADER = struct.Struct('<4sI')
+_CUE_CHUNK_HEADER = struct.Struct('<I')
+
+
+def write_cue_chunk(wave_filename, cue_table):
+    """Appends the cue table to a (closed) wave file as a RIFF chunk."""
+    data = _CUE_CHUNK_HEADER.pack(CUE_CHUNK_VERSION) + cue_table.to_bytes()
+    with open(wave_filename, 'r+b') as wave_file:
+        riff_id, riff_size, wave_id = _RIFF_HEADER.unpack(wave_file.read(_RIFF_HEADER.size))
+        if riff_id != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError('%s is not a RIFF wave file' % wave_filename)
+        wave_file.seek(0, os.SEEK_END)
+        chunk = _CHUNK_HEADER.pack(CUE_CHUNK_ID, len(data)) + data
+        if len(data) % 2:
+            chunk += b'\x00'  # RIFF chunks are padded to an even length
+        wave_file.write(chunk)
+        wave_file.seek(4)   # RIFF size
+        wave_file.write(struct.pack('<I', riff_size + len(chunk)))
+
+
+def read_cue_chunk(wave_filename):
+    """Returns the CueTable embedded in a wave file, or None if it doesn't have one."""
+    with open(wave_filename, 'rb') as wave_file:
+        riff_id, riff_size, wave_id = _RIFF_HEADER.unpack(wave_file.read(_RIFF_HEADER.size))
+        if riff_id != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError('%s is not a RIFF wave file' % wave_filename)
+        while True:
+            header = wave_file.read(_CHUNK_HEADER.size)
+            if len(header) < _CHUNK_HEADER.size:
+                return None
+            chunk_id, chunk_size = _CHUNK_HEADER.unpack(header)
+            if chunk_id == CUE_CHUNK_ID:
+                data = wave_file.read(chunk_size)
+                version, = _CUE_CHUNK_HEADER.unpack_from(data)
+                if version != CUE_CHUNK_VERSION:
+                    raise ValueError('Version mismatch: cue chunk is version %d, but this program requires version %d.' %
+                                     (version, CUE_CHUNK_VERSION))
+                return CueTable.from_bytes(data[_CUE_CHUNK_HEADER.size:])
+            wave_file.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
@@ -1,23 +1,34 @@
 #!/usr/bin/env python3
-"""Reads a wav file with drips and displays the time of each drip"""
+"""Listens for drips on the microphone, or reads a wav file with drips, and displays the time of each drip.
+
+Usage: drip_test.py [drips.wav]
+"""
+import sys
 import wave
-import struct
-import math
-import pyaudio
+from audio.backends import PyAudioBackend, WaveFileBackend
 from audio.drip_detector import DripDetector
 
-pa = pyaudio.PyAudio()
-stream = pa.open(
-    rate=8000,
-    channels=1,
-    format=pyaudio.paInt16,
-    input=True,
-)
-detector = DripDetector(8000)
+SAMPLING_RATE = 8000
+READ_FRAMES = 1000
+
+if len(sys.argv) > 1:
+    # Run through the recording as fast as it can be read, on the backend's virtual clock
+    wave_file = wave.open(sys.argv[1], 'rb')
+    sampling_rate = wave_file.getframerate()
+    wave_file.close()
+    backend = WaveFileBackend(input_filename=sys.argv[1])
+else:
+    sampling_rate = SAMPLING_RATE
+    backend = PyAudioBackend()
+stream = backend.open_input(sampling_rate, 1, READ_FRAMES)
+detector = DripDetector(sampling_rate)
+frames_read = 0
 try:
-    while True:
-        frames = stream.read(1000)
-        detector.add_frames(frames)
+    while stream.is_active():
+        frames = stream.read(READ_FRAMES)
+        for index in detector.add_frames(frames):
+            print('Drip %d at %0.3f s' % (detector.num_drips, float(frames_read + index) / sampling_rate))
+        frames_read += len(frames) // 2
 finally:
     stream.close()
-    pa.terminate()
+    backend.terminate()
@@ -1,20 +1,22 @@
+"""
+Generates an exposure test: a base, then one layer per speed. The layers go to a g-code file, or straight to wave and
+cue files through the g-code converter when --wav is given (with the g-code as well only if --output_file is given).
+"""
 import sys
 import getopt
+from gcode_wav_converter import MoveList, convert_moves
 
 def to_mm_per_minute(mm_per_second):
     return int(mm_per_second * 60.0)
 
-def square(speed, rapid_speed, size):
-    data = ""
-    data = data + "G1 X%.2f Y%.2f F%.2f\n" % (-1.0 * size, -1.0 * size,rapid_speed)
-    data = data + "G1 X%.2f Y%.2f F%.2f E1\n" % (1.0 * size, -1.0 * size,speed)
-    data = data + "G1 X%.2f Y%.2f F%.2f E1\n" % (1.0 * size, 1.0 * size, speed)
+def square(moves, speed, rapid_speed, size):
+    moves.move(x=-1.0 * size, y=-1.0 * size, feed_rate=rapid_speed)
+    moves.move(x=1.0 * size, y=-1.0 * size, feed_rate=speed, extrude=True)
+    moves.move(x=1.0 * size, y=1.0 * size, feed_rate=speed, extrude=True)
 
-    return data
-
-def get_layer(z, speed, rapid_speed, size):
-    data = 'G1 Z%.2f F%.2f\n' % (z , speed)
-    return data + square(speed, rapid_speed, size)
+def add_layer(moves, z, speed, rapid_speed, size):
+    moves.move(z=z, feed_rate=speed)
+    square(moves, speed, rapid_speed, size)
 
 def usage():
     print("""Usage:\npython exposure_test.py [options]
@@ -24,12 +26,16 @@ def usage():
         --layers_per_unit=10 number of layers to write per increment
         --speed_increment=5 (mm per second) how much to change each layer
         --base_size=3 (mm) how much base to print before starting the test
-        --output_file=exposure_test.gcode file name for generated g-code
+        --output_file=exposure_test.gcode file name for generated g-code (only written with --wav if given)
+        --tuning=tuning.dat tuning data file to convert with (needed with --wav)
+        --wav=exposure_test.wav convert straight to this wave file
+        --cue=exposure_test.cue cue file written with --wav (defaults to the wave file name with .cue)
         """)
 
 def main():
     try:
-        opts, args = getopt.getopt(sys.argv[1:], 'h' , ['help', 'size=', 'start_speed=','max_speed=','layers_per_unit=','speed_increment=','output_file='])
+        opts, args = getopt.getopt(sys.argv[1:], 'h' , ['help', 'size=', 'start_speed=','max_speed=','layers_per_unit=','speed_increment=','output_file=',
+                                                         'tuning=', 'wav=', 'cue='])
     except getopt.GetoptError as err:
         # print help information and exit:
         print(err) # will print something like "option -a not recognized"
@@ -43,7 +49,10 @@ def main():
     layers_per_unit = 10
     speed_increment = to_mm_per_minute(5)
     base_z_size = 3
-    output_file = 'exposure_test.gcode'
+    output_file = None
+    tuning_file = None
+    wave_file = None
+    cue_file = None
 
     try:
         for opt, arg in opts:
@@ -61,6 +70,12 @@ def main():
                 base_z_size = to_mm_per_minute(int(arg))
             elif (opt == '--output_file'):
                 output_file = arg
+            elif (opt == '--tuning'):
+                tuning_file = arg
+            elif (opt == '--wav'):
+                wave_file = arg
+            elif (opt == '--cue'):
+                cue_file = arg
             else:
                 usage()
                 exit(2)
@@ -70,31 +85,41 @@ def main():
         usage()
         exit(2)
 
+    if wave_file is None:
+        output_file = output_file or 'exposure_test.gcode'
+    elif tuning_file is None:
+        print('--wav needs --tuning')
+        usage()
+        exit(2)
+    elif cue_file is None:
+        cue_file = wave_file.rsplit('.', 1)[0] + '.cue'
 
     base_z_size = 3 #units
     base_speed = start_speed + ((max_speed - start_speed) / 2)
     z_layer = 1.0 / layers_per_unit * 1.0
 
-    output = open(output_file,'w')
+    output = open(output_file,'w') if output_file else None
+    moves = MoveList(output)
     #build a base
     z = z_layer # gcode to wave can't handle 0.0 start point
 
     # build base
     while (z < base_z_size):
-        layer = get_layer(z, base_speed, max_speed, size)
-        output.write(layer)
+        add_layer(moves, z, base_speed, max_speed, size)
         z = z + z_layer
 
     # build layers
     for speed in range(start_speed, max_speed, speed_increment):
-        layer = get_layer(z, speed, max_speed, size)
-        output.write(layer)
+        add_layer(moves, z, speed, max_speed, size)
         z = z + z_layer
 
     print("Print height in mm = " + str(z))
-    output.close()
-
-    print("Complete: Gcode file is located at %s" % output_file)
+    if output:
+        output.close()
+        print("Complete: Gcode file is located at %s" % output_file)
+    if wave_file:
+        convert_moves(moves.moves, tuning_file, wave_file, cue_file)
+        print("Complete: Wave file is located at %s and cue file at %s" % (wave_file, cue_file))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -19,7 +19,11 @@ chunk of audio to be played such that the build area Z changes appropriately.
 In order for this script to produce audio appropriate for a printer, it must know several parameters of how audio
 maps to movement of the laser for this specific printer. This is provided by the tuning.dat file, which can be created
 using the laser calibration program.
+
+Programs that generate moves themselves (such as the test pattern generators) can skip the g-code text: they collect
+their moves in a MoveList and pass them to GcodeConverter.convertMoves, or to convert_moves.
 """
+import collections
 import math
 import sys
 import wave
@@ -30,12 +34,75 @@ from audio.transform import PositionToAudioTransformer
 from audio import modulation
 from audio.tuning_parameter_file import TuningParameterFileHandler
 from audio.util import convert_values_to_frames, clip_values
-from util.gcode_layer_mixer import GCodeLayerMixer
+from util.gcode_layer_mixer import GCodeLayerMixer, scramble_layer_seams
 
 
 WAVE_SAMPLING_RATE = 48000
 DEBUG = False   # Set to True for debugging messages
 
+# A single requested movement: x, y and z in millimetres (None where not given), the feed rate in millimetres/second
+# (None to keep the last one), and whether to extrude (i.e. draw with the laser on)
+Move = collections.namedtuple('Move', ['x', 'y', 'z', 'feed_rate', 'extrude'])
+
+
+def linspace_block(start, stop, num, first, count):
+    """
+    Returns count of the values numpy.linspace(start, stop, num) would, starting from the value at index first. Each
+    is worked out just as linspace does, so they're bit-identical, but without making the rest.
+    """
+    div = num - 1
+    delta = stop - start
+    values = numpy.arange(first, first + count, dtype=float)
+    if div > 0:
+        step = delta / div
+        if step == 0:
+            values /= div
+            values *= delta
+        else:
+            values *= step
+    else:
+        values = values * delta
+    values += start
+    if num > 1 and first + count == num:
+        values[-1] = stop
+    return values
+
+
+class MoveList(object):
+    """
+    Collects moves for GcodeConverter.convertMoves the way a program would write them as g-code, and optionally writes
+    the g-code too. Values are rounded just as they would be in the g-code, so converting the moves makes the same
+    audio as converting the g-code.
+    """
+    def __init__(self, gcode_file=None):
+        """
+        gcode_file -- file -- If given, the equivalent g-code is written to it as moves are added.
+        """
+        self.moves = []
+        self._gcode_file = gcode_file
+
+    def move(self, x=None, y=None, z=None, feed_rate=None, extrude=False):
+        """Adds a G1 move. Positions are in millimetres and the feed rate is in millimetres/minute, as in g-code."""
+        gcode = 'G1'
+        for code, value in (('X', x), ('Y', y), ('Z', z), ('F', feed_rate)):
+            if value is not None:
+                gcode += ' %s%.2f' % (code, value)
+        if extrude:
+            gcode += ' E1'
+        self.moves.append(Move(self._rounded(x), self._rounded(y), self._rounded(z),
+                               None if feed_rate is None else self._rounded(feed_rate) / 60.0, extrude))
+        self.write_gcode(gcode)
+
+    def write_gcode(self, line):
+        """Writes a line to the g-code only, for codes the converter ignores (such as M101)."""
+        if self._gcode_file:
+            self._gcode_file.write(line + '\n')
+
+    def _rounded(self, value):
+        if value is None:
+            return None
+        return float('%.2f' % value)
+
 
 class MachineState:
     """Represents the internal state of the machine, including position, velocity, and time."""
@@ -58,6 +125,7 @@ class MachineState:
 
 
 class GcodeConverter:
+    MOVE_BLOCK_SAMPLES = 65536  # Longer moves are made in blocks of this many samples, to bound the memory they use
     KNOWN_GCODES = {
                     'G0': 'gCommandMove',
                     'G1': 'gCommandMove',
@@ -77,16 +145,40 @@ class GcodeConverter:
 
     def convertGcode(self, gcode_filename, wave_filename, cue_filename, flags = []):
         self.flags = flags
+        gcode_data = self.loadGcode(gcode_filename)
+        self.convertInstructions(gcode_data, 'processGcodeInstruction', wave_filename, cue_filename)
+
+    def convertMoves(self, moves, wave_filename, cue_filename, flags = []):
+        """Converts a list of Move instances (such as MoveList.moves) as if they had been read from g-code. Only the
+        'e' and 'f' flags apply."""
+        self.flags = flags
+        self.convertInstructions(moves, 'applyMove', wave_filename, cue_filename)
+
+    def convertInstructions(self, instructions, process_name, wave_filename, cue_filename):
+        """Runs each instruction through the method named process_name, called as (instruction, wave_file, cue_file,
+        state), going back over a layer's instructions for each of its sublayers. Unless the 'f' flag is given, the
+        instructions are range checked first: moves that would be clipped are warned about, and a ValueError is raised
+        before anything is written if any instructions would fail."""
+        if 'f' not in self.flags:
+            checker = RangeChecker(self.tuning_collection, self.warned_once_codes, self.warnings)
+            report = checker.check(instructions, process_name)
+            print("Range check: clip margin %.3f" % report.clip_margin)
+            for clipped in report.clipped:
+                print("WARNING: %s" % clipped)
+            if report.problems:
+                for problem in report.problems:
+                    print(problem)
+                raise ValueError('Range check found %d problems that would stop the conversion' % len(report.problems))
+        process_instruction = getattr(self, process_name)
         self.transformer = self.createTransformer(self.tuning_collection)
         self.modulator = self.createModulator(self.tuning_collection)
         wave_file = self.createWaveFile(wave_filename)
         cue_file = self.createCueFile(cue_filename)
-        gcode_data = self.loadGcode(gcode_filename)
         state = self.createInitialMachineState()
-        num_lines = len(gcode_data)
+        num_lines = len(instructions)
         lines_per_notify = int(max(num_lines / 100.0, 1.0))
         while state.current_line_num < num_lines:
-            line = gcode_data[state.current_line_num]
+            line = instructions[state.current_line_num]
             if DEBUG:
                 print('%07d: %s' % (state.current_line_num, line))
             if not state.drawing_sublayer and (state.current_line_num+1) % lines_per_notify == 0:
@@ -94,11 +186,22 @@ class GcodeConverter:
                     state.current_line_num+1, num_lines, int(math.ceil(100.0*(state.current_line_num+1)/num_lines))))
             if line:
                 try:
-                    self.processGcodeInstruction(line, wave_file, cue_file, state)
+                    process_instruction(line, wave_file, cue_file, state)
                 except Exception:
                     print("Error processing line number %d" % state.current_line_num)
                     raise
             state.current_line_num += 1
+        wave_file.close()
+        cue_file.close()
+        cue_file.outfile.close()
+        if 'e' in self.flags:
+            self.embedCues(wave_filename, cue_filename)
+
+    def embedCues(self, wave_filename, cue_filename):
+        """Adds the cues to the wave file as a binary cue table, so the wave file can be played on its own."""
+        with open(cue_filename, 'rb') as infile:
+            cue_table = cue_file_mod.CueFileReader(infile).read_cue_table()
+        cue_file_mod.write_cue_chunk(wave_filename, cue_table)
 
     def createTransformer(self, tuning_collection):
         return PositionToAudioTransformer(tuning_collection)
@@ -119,13 +222,15 @@ class GcodeConverter:
 
     def loadGcode(self, gcode_filename):
         """Opens the given filename, reads the data in as ascii format, and strips all lines, returning
-        a list of lines."""
-        gcode_file = open(gcode_filename, 'rt')
-        if 'm' in self.flags:
-            return list(GCodeLayerMixer(gcode_file))
-        else:
-            gcode_data = [x.strip() for x in gcode_file.readlines()]
-            return gcode_data
+        a list of lines. The lines stream through the seam scrambler and layer mixer first if asked for."""
+        with open(gcode_filename, 'rt') as gcode_file:
+            lines = gcode_file
+            if 's' in self.flags:
+                lines = scramble_layer_seams(lines)
+            if 'm' in self.flags:
+                lines = GCodeLayerMixer(lines)
+            gcode_data = [x.strip() for x in lines]
+        return gcode_data
 
     def createInitialMachineState(self):
         return MachineState()
@@ -169,7 +274,7 @@ class GcodeConverter:
         # assumptions:
         # * Assumes that we are in absolute positioning mode (could be changed if necessary)
         
-        # 1. Parse the params to determine what's being requested
+        # 1. Parse the params to determine what's being requested, then make the move
         x_pos = None
         y_pos = None
         z_pos = None
@@ -191,7 +296,12 @@ class GcodeConverter:
                 extrude = True
             else:
                 print("WARNING: Move command received unrecognized parameter '%s'; ignoring" % param)
-        
+        self.applyMove(Move(x_pos, y_pos, z_pos, feed_rate, extrude), wave_file, cue_file, state)
+
+    def applyMove(self, move, wave_file, cue_file, state):
+        """Makes the given Move from the current state."""
+        x_pos, y_pos, z_pos, feed_rate, extrude = move
+
         # Update feed rate if given
         if feed_rate is not None:
             # Check for validity of feed rate
@@ -210,25 +320,36 @@ class GcodeConverter:
             state.feed_rate = feed_rate
 
         # 2. Determine what movement is being requested
+        moving_x = moving_y = False
         if x_pos is not None or y_pos is not None:
-            # Lateral movement
-            if x_pos > self.tuning_collection.build_x_max:
-                raise ValueError("Requested x position '%f' greater than machine maximum '%f'" % (x_pos, self.tuning_collection.build_x_max))
-            if x_pos < self.tuning_collection.build_x_min:
-                raise ValueError("Requested x position '%f' less than machine minimum '%f'" % (x_pos, self.tuning_collection.build_x_min))
-            if y_pos > self.tuning_collection.build_y_max:
-                raise ValueError("Requested y position '%f' greater than machine maximum '%f'" % (y_pos, self.tuning_collection.build_y_max)) 
-            if y_pos < self.tuning_collection.build_y_min:
-                raise ValueError("Requested y position '%f' less than machine minimum '%f'" % (y_pos, self.tuning_collection.build_y_min))
+            # Lateral movement; an axis not given stays where it is
+            moving_x = x_pos is not None
+            moving_y = y_pos is not None
+            if not moving_x:
+                x_pos = state.x_pos
+            if not moving_y:
+                y_pos = state.y_pos
+            self.checkBounds(x_pos, y_pos)
             self.moveLateral(x_pos, y_pos, state, wave_file, extrude, rapid=False)
         if z_pos is not None and z_pos != state.z_pos:
-            if x_pos is not None or y_pos is not None:
+            if moving_x or moving_y:
                 if not 'lateralwarning' in self.warnings:
                     self.warnings.append('lateralwarning')
                     print('WARNING: Simultaneous lateral and vertical movements are not supported. Movements will be separated.')
             # A new layer height has been requested. Move there last so that new layer "starts" at end of this command.
             self.moveToNewLayerHeight(z_pos, state, wave_file, cue_file)
 
+    def checkBounds(self, x_pos, y_pos):
+        """Raises a ValueError if the position is outside the build area."""
+        if x_pos > self.tuning_collection.build_x_max:
+            raise ValueError("Requested x position '%f' greater than machine maximum '%f'" % (x_pos, self.tuning_collection.build_x_max))
+        if x_pos < self.tuning_collection.build_x_min:
+            raise ValueError("Requested x position '%f' less than machine minimum '%f'" % (x_pos, self.tuning_collection.build_x_min))
+        if y_pos > self.tuning_collection.build_y_max:
+            raise ValueError("Requested y position '%f' greater than machine maximum '%f'" % (y_pos, self.tuning_collection.build_y_max))
+        if y_pos < self.tuning_collection.build_y_min:
+            raise ValueError("Requested y position '%f' less than machine minimum '%f'" % (y_pos, self.tuning_collection.build_y_min))
+
     def moveToNewLayerHeight(self, new_z_pos, state, wave_file, cue_file):
         if DEBUG:
             print('start new layer: time=%f, z_pos=%f' % (state.time, state.z_pos))
@@ -236,7 +357,7 @@ class GcodeConverter:
             raise ValueError("G-code requested us to move down Z axis, but we can't!")
         # Algorithm:
         #   Move to dwell position
-        #   Dwell for modulation period so we have something to loop over
+        #   Dwell for one loop period of the modulator so we have something to loop over
         #   Move up one sublayer height
         #   If we need more sublayers:
         #       Loop back to the beginning of this layer (both position and gcode line)
@@ -260,8 +381,12 @@ class GcodeConverter:
         cue_file.write_cue(cue_file_mod.PlayCue(state.current_cue_start_frame_num, state.current_frame_num))
         state.current_cue_start_frame_num = state.current_frame_num
 
-        # Write one modulation period of dwell and add cue to loop until we reach the next sublayer
-        num_samples = self.modulator.waveform_period
+        # Write the shortest seamlessly loopable dwell and add cue to loop until we reach the next sublayer. The player
+        # can only leave the loop at its end, so a short dwell lets each new sublayer start as soon as the drip arrives.
+        # The dwell is drawn with the laser off, so switch it off first to get the matching loop period.
+        if self.modulator.laser_enabled:
+            self.modulator.laser_enabled = False
+        num_samples = self.modulator.loop_period
         samples = numpy.ones((num_samples, 3))
         samples *= numpy.array([state.x_pos, state.y_pos, state.z_pos])
         self.saveSamples(samples, state, wave_file, False)
@@ -329,16 +454,21 @@ class GcodeConverter:
         else:
             # Use a constant speed with no acceleration and always move at requested feed rate
             feed_rate = state.feed_rate
-        # To ensure exact distance is covered, create each sample by multiplying by the portion of the move made
+        # To ensure exact distance is covered, create each sample by multiplying by the portion of the move made. A long
+        # move (or one with a silly feed rate) is made a block at a time, each the same as that part of the whole.
         num_samples = int(math.ceil(distance * WAVE_SAMPLING_RATE / feed_rate))
-        x_array = numpy.linspace(state.x_pos, state.x_pos+delta_x, num=num_samples)
-        y_array = numpy.linspace(state.y_pos, state.y_pos+delta_y, num=num_samples)
-        z_array = numpy.ones((num_samples,))*state.z_pos
-        samples = numpy.column_stack((x_array, y_array, z_array))
-        self.saveSamples(samples, state, wave_file, extrude)
+        first_sample = 0
+        while first_sample < num_samples:
+            block_samples = min(self.MOVE_BLOCK_SAMPLES, num_samples - first_sample)
+            x_array = linspace_block(state.x_pos, state.x_pos+delta_x, num_samples, first_sample, block_samples)
+            y_array = linspace_block(state.y_pos, state.y_pos+delta_y, num_samples, first_sample, block_samples)
+            z_array = numpy.ones((block_samples,))*state.z_pos
+            samples = numpy.column_stack((x_array, y_array, z_array))
+            self.saveSamples(samples, state, wave_file, extrude)
+            first_sample += block_samples
         state.x_pos = state.x_pos+delta_x
         state.y_pos = state.y_pos+delta_y
-        state.time += (len(samples) / WAVE_SAMPLING_RATE)
+        state.time += (num_samples / WAVE_SAMPLING_RATE)
 
     def saveSamples(self, samples, state, wave_file, laser_enable):
         values = self.transformer.transform_points(samples)
@@ -362,6 +492,104 @@ class GcodeConverter:
         self.moveLateral(0.0, 0.0, state, wave_file, False, rapid=True)
         
 
+# What RangeChecker.check found: a list of messages, each for something that would stop the conversion, another for
+# each move whose audio values would be clipped, and how far short of clipping the audio values stay at their largest
+# (negative if they would be clipped)
+RangeReport = collections.namedtuple('RangeReport', ['problems', 'clipped', 'clip_margin'])
+
+
+class RangeChecker(GcodeConverter):
+    """
+    Goes through instructions the way the converter does, but without rendering: it collects each layer's moves once,
+    with the heights of all its sublayers, and checks them in bulk. Reports every move outside the build area, every
+    move down, every instruction that fails, and every move whose audio values would be clipped at some sublayer.
+    """
+    def __init__(self, tuning_collection, warned_once_codes=None, warnings=None):
+        """
+        warned_once_codes, warnings -- Shared with a converter, so that what's been warned about here isn't again.
+        """
+        GcodeConverter.__init__(self, tuning_collection)
+        if warned_once_codes is not None:
+            self.warned_once_codes = warned_once_codes
+        if warnings is not None:
+            self.warnings = warnings
+
+    def check(self, instructions, process_name):
+        """Checks the instructions, each handled by the method named process_name, and returns a RangeReport."""
+        self.transformer = self.createTransformer(self.tuning_collection)
+        self.problems = []
+        self.clipped = []
+        self._extent = 0.0
+        self._layer_moves = []      # (line number, start x, start y, end x, end y) of each move in the current layer
+        process_instruction = getattr(self, process_name)
+        state = self.createInitialMachineState()
+        for line_num, instruction in enumerate(instructions):
+            state.current_line_num = line_num
+            if instruction:
+                try:
+                    process_instruction(instruction, None, None, state)
+                except Exception as ex:
+                    self.problems.append('Line %d: %s' % (line_num + 1, ex))
+        self._checkLayer([state.z_pos])
+        return RangeReport(self.problems, self.clipped, 1.0 - self._extent)
+
+    def checkBounds(self, x_pos, y_pos):
+        try:
+            GcodeConverter.checkBounds(self, x_pos, y_pos)
+        except ValueError as ex:
+            self.problems.append('Line %d: %s' % (self._line_num + 1, ex))
+
+    def applyMove(self, move, wave_file, cue_file, state):
+        self._line_num = state.current_line_num
+        GcodeConverter.applyMove(self, move, wave_file, cue_file, state)
+
+    def moveLateral(self, x_pos, y_pos, state, wave_file, extrude, rapid=False):
+        if x_pos != state.x_pos or y_pos != state.y_pos:
+            self._layer_moves.append((state.current_line_num, state.x_pos, state.y_pos, x_pos, y_pos))
+        state.x_pos = x_pos
+        state.y_pos = y_pos
+
+    def moveToNewLayerHeight(self, new_z_pos, state, wave_file, cue_file):
+        if new_z_pos < state.z_pos:
+            self.problems.append("Line %d: G-code requested us to move down Z axis, but we can't!" % (
+                state.current_line_num + 1))
+            return
+        # The layer is drawn at each sublayer height as moveToNewLayerHeight would, going to the dwell position and
+        # back in between
+        sublayer_height = self.tuning_collection.sublayer_height
+        current_sublayer = int(round(state.z_pos/sublayer_height))
+        end_sublayer = int(math.floor(new_z_pos/sublayer_height))
+        heights = [state.z_pos] + [sublayer_height * sublayer for sublayer in range(current_sublayer + 1, end_sublayer)]
+        dwell_x, dwell_y = self.tuning_collection.dwell_x, self.tuning_collection.dwell_y
+        self._layer_moves.append((state.current_line_num, state.x_pos, state.y_pos, dwell_x, dwell_y))
+        self._layer_moves.append((state.current_line_num, dwell_x, dwell_y, state.layer_start_x_pos,
+                                  state.layer_start_y_pos))
+        self._checkLayer(heights)
+        state.z_pos = sublayer_height * max(current_sublayer + 1, end_sublayer)
+        state.layer_start_x_pos = state.x_pos
+        state.layer_start_y_pos = state.y_pos
+
+    def _checkLayer(self, heights):
+        """Checks the current layer's moves at each of the heights, then starts a new layer."""
+        if not self._layer_moves:
+            return
+        moves = numpy.array(self._layer_moves)
+        self._layer_moves = []
+        worst = numpy.zeros(len(moves))
+        worst_heights = numpy.zeros(len(moves))
+        for height in heights:
+            extents = self.transformer.segment_extents(moves[:, 1:3], moves[:, 3:5], height)
+            worse = extents > worst
+            worst[worse] = extents[worse]
+            worst_heights[worse] = height
+        self._extent = max(self._extent, worst.max())
+        for index in numpy.nonzero(worst > 1.0)[0]:
+            line_num, start_x, start_y, end_x, end_y = moves[index]
+            self.clipped.append('Line %d: move from (%.2f, %.2f) to (%.2f, %.2f) reaches audio value %.3f at '
+                                 'height %.2f, and would be clipped' % (
+                                     line_num + 1, start_x, start_y, end_x, end_y, worst[index], worst_heights[index]))
+
+
 def read_args():
     arg_list = []
     flags = []
@@ -374,15 +602,25 @@ def read_args():
         return { 'tuning' : arg_list[0], 'gcode': arg_list[1], 'wav': arg_list[2], 'cue': arg_list[3], 'flags' : flags}
     else:
         print("Usage: %s <tuning.dat> <input.gcode> <output.wav> <output.cue>" % sys.argv[0])
-        print("Options:\n\t-m\tmix up gcode order")
+        print("Options:\n\t-m\tmix up gcode order\n\t-s\tstart each layer at a random point\n"
+              "\t-e\tembed the cues in the wave file as well\n"
+              "\t-f\tdon't range check the g-code before converting it")
         sys.exit(1)
 
-args = read_args()
+def convert_moves(moves, tuning_filename, wave_filename, cue_filename, flags=[]):
+    """Converts a list of Move instances straight to wave and cue files, using the tuning data file given."""
+    tuning_collection = TuningParameterFileHandler().read_from_file(tuning_filename)
+    GcodeConverter(tuning_collection).convertMoves(moves, wave_filename, cue_filename, flags)
+
+
+def main():
+    args = read_args()
+    print("Converting G-code file '%s' into wave file '%s' and cue file '%s', using tuning data file '%s'" % (args['gcode'], args['wav'], args['cue'], args['tuning']))
+    tuning_file_handler = TuningParameterFileHandler()
+    tuning_collection = tuning_file_handler.read_from_file(args['tuning'])
+    parser = GcodeConverter(tuning_collection)
+    parser.convertGcode(args['gcode'], args['wav'], args['cue'], args['flags'])
 
-print args
-print("Converting G-code file '%s' into wave file '%s' and cue file '%s', using tuning data file '%s'" % (args['gcode'], args['wav'], args['cue'], args['tuning']))
+if __name__ == '__main__':
+    main()
 
-tuning_file_handler = TuningParameterFileHandler()
-tuning_collection = tuning_file_handler.read_from_file(args['tuning'])
-parser = GcodeConverter(tuning_collection)
-parser.convertGcode(args['gcode'], args['wav'], args['cue'], args['flags'])
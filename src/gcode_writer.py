@@ -1,9 +1,14 @@
+import numpy
+
 class MoveModes:
     RAPID = 'rapid'
     FEED = 'feed'
 
 class GcodeWriter(object):
     """Takes layer information from the Blender slicer and saves it to a file in GCODE format."""
+    FORMAT_CHUNK_MOVES = 4096           # Moves formatted with one '%' by drawPaths
+    WRITE_BUFFER_SIZE = 1 << 20         # Characters drawPaths collects before writing them to the file
+
     def __init__(self, file, feed_rate, rapid_rate):
         self._file = file
         self._feed_rate = feed_rate
@@ -32,15 +37,87 @@ class GcodeWriter(object):
         for location in path[1:]:
             self._move_to_location(location)
 
+    def drawPaths(self, paths):
+        """
+        Draws each path in turn, writing exactly what drawPath would, but formatting the moves in chunks and writing
+        them to the file in large pieces. Empty paths are skipped.
+
+        paths -- list of arrays of shape (points, 2), or of lists of (x, y) -- The paths to draw.
+        """
+        paths = [path for path in (numpy.asarray(path, dtype=numpy.float64).reshape(-1, 2) for path in paths)
+                 if len(path)]
+        if not paths:
+            return
+        lengths = numpy.array([len(path) for path in paths])
+        points = numpy.concatenate(paths)
+        firsts = numpy.cumsum(lengths) - lengths
+        # A point the same as the one before it is already where we are; that includes the start of a path that
+        # carries on from where the path before ended, which is then drawn without a rapid move
+        moves = numpy.ones(len(points), dtype=bool)
+        moves[1:] = numpy.any(points[1:] != points[:-1], axis=1)
+        moves[0] = self._current_location is None or self._current_location != tuple(points[0].tolist())
+        rapids = moves[firsts].tolist()
+        moves[firsts] = False
+        feed_counts = numpy.add.reduceat(moves, firsts).tolist()
+        moves[firsts] = rapids
+        values = points[moves].ravel().tolist()
+
+        # The first path starts from whatever mode we're in; every one after starts from feeding
+        # The rates are written into the templates once, leaving just the positions to format
+        rapid_move = self._move_template(self._rapid_rate, extrude=False)
+        feed_move = self._move_template(self._feed_rate, extrude=True)
+        if rapids[0]:
+            first_template = self._mode_command(MoveModes.RAPID) + rapid_move
+        else:
+            first_template = ''
+        first_template += self._mode_command(MoveModes.FEED)
+        rapid_template = 'M103\n' + rapid_move + 'M101\n'
+        buffer = []
+        buffered = 0
+        templates = []
+        template_moves = 0
+        formatted_moves = 0
+        for index, (rapid, feed_count) in enumerate(zip(rapids, feed_counts)):
+            if index == 0:
+                templates.append(first_template)
+            elif rapid:
+                templates.append(rapid_template)
+            templates.append(feed_move * feed_count)
+            template_moves += rapid + feed_count
+            if template_moves >= self.FORMAT_CHUNK_MOVES or index == len(rapids) - 1:
+                end = formatted_moves + template_moves
+                buffer.append(''.join(templates) % tuple(values[formatted_moves * 2:end * 2]))
+                buffered += len(buffer[-1])
+                templates = []
+                template_moves = 0
+                formatted_moves = end
+                if buffered >= self.WRITE_BUFFER_SIZE or index == len(rapids) - 1:
+                    self._file.write(''.join(buffer))
+                    buffer = []
+                    buffered = 0
+        self._current_location = tuple(points[-1].tolist())
+
+    def _move_template(self, rate, extrude):
+        """The format of a move at the given rate, with just the x and y left to fill in."""
+        return 'G1 X%%.2f Y%%.2f F%.2f%s\n' % (rate, ' E1' if extrude else '')
+
     def _set_move_mode(self, mode):
-        if self._move_mode != mode:
-            if mode == MoveModes.RAPID:
-                self._file.write('M103\n')
-            elif mode == MoveModes.FEED:
-                self._file.write('M101\n')
-            else:
-                raise AssertionError('Unknown move mode "%s"' % mode)
-            self._move_mode = mode
+        command = self._mode_command(mode)
+        if command:
+            self._file.write(command)
+
+    def _mode_command(self, mode):
+        """Switches to the given mode, returning the command to write for it (if any)."""
+        if self._move_mode == mode:
+            return ''
+        if mode == MoveModes.RAPID:
+            command = 'M103\n'
+        elif mode == MoveModes.FEED:
+            command = 'M101\n'
+        else:
+            raise AssertionError('Unknown move mode "%s"' % mode)
+        self._move_mode = mode
+        return command
 
     def _move_to_location(self, location):
         if location == self._current_location:
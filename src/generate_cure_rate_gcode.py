@@ -1,24 +1,31 @@
+"""
+Generates a cure rate test: a base, then one layer per speed. The layers go to a g-code file, or straight to wave and
+cue files through the g-code converter when --wav is given (with the g-code as well only if --output_file is given).
+"""
 import sys
 import getopt
+from gcode_wav_converter import MoveList, convert_moves
 
-def square(speed, size):
-    data = "M101\n"
-    data = data + "G1 X%.2f Y%.2f F%.2f E1\n" % (size,size,speed)
-    data = data + "G1 X%.2f Y%.2f F%.2f E1\n" % (size,-1.0 * size,speed)
-    data = data + "G1 X%.2f Y%.2f F%.2f E1\n" % (-1.0 * size,-1.0 *size,speed)
-    data = data + "G1 X%.2f Y%.2f F%.2f E1\n" % (-1.0 * size,size,speed)
-    return data
+def square(moves, speed, size):
+    moves.write_gcode('M101')
+    moves.move(x=size, y=size, feed_rate=speed, extrude=True)
+    moves.move(x=size, y=-1.0 * size, feed_rate=speed, extrude=True)
+    moves.move(x=-1.0 * size, y=-1.0 * size, feed_rate=speed, extrude=True)
+    moves.move(x=-1.0 * size, y=size, feed_rate=speed, extrude=True)
 
-def get_layer(z, speed, size):
-    data = 'M103\nG1 Z%.2f F%.2f\n' % (z , speed)
-    return data + square(speed, size)
+def add_layer(moves, z, speed, size):
+    moves.write_gcode('M103')
+    moves.move(z=z, feed_rate=speed)
+    square(moves, speed, size)
 
 def usage():
     print("Usage:\npython exposure_test.py --size=(1/2 print area recommended)")
+    print("    [--tuning=tuning.dat --wav=out.wav [--cue=out.cue]] to convert straight to wave and cue files")
 
 def main():
     try:
-        opts, args = getopt.getopt(sys.argv[1:], 'h' , ['help', 'size=', 'start_speed=','max_speed=','layers_per_unit=','speed_increment=','output_file='])
+        opts, args = getopt.getopt(sys.argv[1:], 'h' , ['help', 'size=', 'start_speed=','max_speed=','layers_per_unit=','speed_increment=','output_file=',
+                                                         'tuning=', 'wav=', 'cue='])
     except getopt.GetoptError as err:
         # print help information and exit:
         print(err) # will print something like "option -a not recognized"
@@ -31,7 +38,10 @@ def main():
     max_speed = 500
     layers_per_unit = 100
     speed_increment = 50
-    output_file = 'exposure_test.gcode'
+    output_file = None
+    tuning_file = None
+    wave_file = None
+    cue_file = None
 
     try:
         for opt, arg in opts:
@@ -47,6 +57,12 @@ def main():
                 speed_increment = int(arg)
             elif (opt == '--output_file'):
                 output_file = arg
+            elif (opt == '--tuning'):
+                tuning_file = arg
+            elif (opt == '--wav'):
+                wave_file = arg
+            elif (opt == '--cue'):
+                cue_file = arg
             else:
                 usage()
                 exit(2)
@@ -56,28 +72,40 @@ def main():
         usage()
         exit(2)
 
+    if wave_file is None:
+        output_file = output_file or 'exposure_test.gcode'
+    elif tuning_file is None:
+        print('--wav needs --tuning')
+        usage()
+        exit(2)
+    elif cue_file is None:
+        cue_file = wave_file.rsplit('.', 1)[0] + '.cue'
 
     base_z_size = 2 #units
     base_speed = 200
     z_layer = 1.0 / layers_per_unit * 1.0
 
-    output = open(output_file,'w')
+    output = open(output_file,'w') if output_file else None
+    moves = MoveList(output)
     #build a base
     z = 0.0
 
     # build base
     while (z < base_z_size):
-        layer = get_layer(z, base_speed, size)
-        output.write(layer)
+        add_layer(moves, z, base_speed, size)
         z = z + z_layer
 
     # build layers
     for speed in range(start_speed, max_speed, speed_increment):
-        layer = get_layer(z, base_speed, size)
-        output.write(layer)
+        add_layer(moves, z, base_speed, size)
         z = z + z_layer
 
-    print("Complete: Gcode file is located at %s" % output_file)
+    if output:
+        output.close()
+        print("Complete: Gcode file is located at %s" % output_file)
+    if wave_file:
+        convert_moves(moves.moves, tuning_file, wave_file, cue_file)
+        print("Complete: Wave file is located at %s and cue file at %s" % (wave_file, cue_file))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,73 @@
+import json
+import os
+
+import numpy
+
+
+class Checkpoint(object):
+    """
+    Saves the player's progress to a small JSON file so that a print can be resumed if the player dies. Every save
+    writes a temporary file and renames it over the checkpoint, so the checkpoint is always either the old or the new
+    one, never a partial write. (The file isn't fsync'ed: this protects against the player dying, not the computer.)
+    """
+    def __init__(self, filename):
+        """
+        filename -- str -- Where to keep the checkpoint.
+        """
+        self.filename = filename
+        self._temp_filename = filename + '.tmp'
+
+    def save(self, cue_index, num_drips, height):
+        """
+        cue_index -- int -- The next cue to be played.
+        num_drips -- int -- Drips counted so far.
+        height -- float -- The height those drips correspond to.
+        """
+        with open(self._temp_filename, 'w') as outfile:
+            json.dump({'cue_index': cue_index, 'num_drips': num_drips, 'height': height}, outfile)
+        _replace(self._temp_filename, self.filename)
+
+    def load(self):
+        """Returns the saved state as a dict with 'cue_index', 'num_drips' and 'height', or None if there is no
+        checkpoint."""
+        try:
+            with open(self.filename, 'r') as infile:
+                return json.load(infile)
+        except IOError:
+            return None
+
+    def clear(self):
+        """Removes the checkpoint, once the print has finished."""
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+
+def _replace(src, dst):
+    try:
+        os.replace(src, dst)
+    except AttributeError:
+        # Python 2 has no os.replace; rename is atomic on POSIX but won't replace an existing file on Windows
+        if os.name == 'nt' and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+def find_resume_cue_index(cue_table, height, cue_index):
+    """
+    Returns the index of the cue to resume from: the first cue of the layer that was being drawn, so it is drawn
+    again from its start. That is the layer of the saved cue_index, unless the height shows an earlier layer's
+    LOOP_UNTIL_HEIGHT cue had not yet been reached. The height alone isn't enough: when the drips are ahead of the
+    drawing, it is already past layers that haven't been drawn.
+    cue_table -- cue_file.CueTable -- The cues of the print.
+    height -- float -- The height saved in the checkpoint.
+    cue_index -- int -- The cue index saved in the checkpoint.
+    """
+    loop_cue_indices = cue_table.loop_cue_indices()
+    waiting_cue_index = cue_table.find_cue_for_height(height)
+    if waiting_cue_index is None:
+        waiting_cue_index = len(cue_table)
+    # Resume from the start of whichever layer comes first
+    layer = numpy.searchsorted(loop_cue_indices, min(cue_index, waiting_cue_index), side='left')
+    if layer == 0:
+        return 0
+    return int(loop_cue_indices[layer - 1]) + 1
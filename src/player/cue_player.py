@@ -0,0 +1,268 @@
+import time
+
+import cue_file as cue_file_mod
+from audio.frame_clock import OutputFrameClock
+from player.drip_timeline import DripTimeline
+
+
+class CuePlayer(object):
+    """
+    Plays back the cues of a wave file, looping each LOOP_UNTIL_HEIGHT cue until the drips heard by the drip input
+    show that the liquid has reached the cue's height.
+    """
+    LOOP_WRITE_TIME = 0.001     # Seconds of looped audio queued between drip checks while waiting for a new height
+
+    def __init__(self, wave_file, cues, tuning_collection, outstream, drip_input, log, drip_governor=None,
+                 debug=False, trace=False, debug_outfile=None, telemetry=None, checkpoint=None,
+                 start_cue_index=0, start_num_drips=0, flow_controller=None):
+        """
+        wave_file -- wave.Wave_read -- 16-bit stereo audio the cues refer to.
+        cues -- list of Cue -- The cues to play, in order.
+        tuning_collection -- TuningParameterCollection -- Provides drips_per_height.
+        outstream -- Started, blocking output stream to play to.
+        drip_input -- Started drip input -- must have 'new_drip_events' and 'overflows'
+        log -- Logging -- Where to report progress.
+        drip_governor -- DripGovernor -- If given, used to start and stop the drips as needed.
+        debug -- bool -- If True, additional debugging information will be printed
+        trace -- bool -- If True, all cue and frame count information will be printed (VERY NOISY)
+        debug_outfile -- wave.Wave_write -- If given, all output is also saved here for review.
+        telemetry -- TelemetryWriter -- If given, a record is sent here at the end of every cue.
+        checkpoint -- Checkpoint -- If given, progress is saved here at the start of every cue.
+        start_cue_index -- int -- Cue to start playing from, when resuming a print.
+        start_num_drips -- int -- Drips already counted, when resuming a print.
+        flow_controller -- DripRateController -- If given with an AsyncDripGovernor, sets the drip governor's duty
+            cycle at the end of every layer instead of switching it on while waiting for drips and off at fixed
+            thresholds.
+        """
+        self.wave_file = wave_file
+        self.cues = cues
+        self.tuning_collection = tuning_collection
+        self.outstream = outstream
+        self.drip_input = drip_input
+        self.log = log
+        self.drip_governor = drip_governor
+        self.debug = debug
+        self.trace = trace
+        self.debug_outfile = debug_outfile
+        self.telemetry = telemetry
+        self.checkpoint = checkpoint
+        self.flow_controller = flow_controller
+
+        self.wave_rate = wave_file.getframerate()
+        self.frame_size = wave_file.getnchannels() * wave_file.getsampwidth()
+        self.max_loop_write_frames = int(self.wave_rate * self.LOOP_WRITE_TIME)
+        self.output_buffer_frames = outstream.get_write_available()
+        self.output_clock = OutputFrameClock(self.wave_rate, outstream.get_output_latency())
+        self.drip_timeline = DripTimeline(start_num_drips)
+        self.frames_written = 0     # Total frames written to the output, including every repeat of a loop
+        self.output_underruns = 0
+
+        # wave_file uses platform-dependent positions, so we can't seek directly to a position unless we first visit
+        # it and save our current position
+        self.frame_position_cache = {}  # frame_num : wave.tell() platform-dependent position value
+
+        # Initialize cue/frame state
+        self.current_cue_index = start_cue_index
+        self.current_cue = cues[self.current_cue_index]
+        self.current_frame_num = 0
+        self.frame_position_cache[self.current_frame_num] = wave_file.tell()
+        if self.current_cue.start_frame:
+            # Resuming; CPython's wave positions are frame numbers, so go straight to the cue rather than reading
+            # through the file
+            wave_file.setpos(self.current_cue.start_frame)
+            self.current_frame_num = self.current_cue.start_frame
+            self.frame_position_cache[self.current_frame_num] = wave_file.tell()
+        self.loop_frames = b''  # Frames of the current LOOP_UNTIL_HEIGHT cue, kept so it can be repeated without seeking
+        self.waiting_for_drips = False
+        self.cue_start_frames_written = 0   # frames_written when the current cue started
+        self.cue_loops = 1                  # Number of times the current cue has been played
+
+    def play(self):
+        """Plays every cue, returning once the last one has been written to the output stream."""
+        self.log.info('Playing %d cues...' % len(self.cues))
+        if self.checkpoint:
+            num_drips = self.drip_timeline.num_drips
+            self.checkpoint.save(self.current_cue_index, num_drips, float(num_drips) / self.tuning_collection.drips_per_height)
+        try:
+            while True:
+                self._process_drip_input()
+                # Determine output
+                buffer_frames_available = self.outstream.get_write_available()
+                if not buffer_frames_available:
+                    # If no room in buffer, check again later
+                    time.sleep(0.01)
+                    continue
+                self._fill_buffer(buffer_frames_available)
+        except StopIteration:
+            self.log.info('Finished playing final cue; waiting for playback to complete.')
+
+    def _process_drip_input(self):
+        # Line up any new drips with the output frames
+        for drip_event in self.drip_input.new_drip_events():
+            self.drip_timeline.add_drip(self.output_clock.frame_at(drip_event.stream_time))
+
+    def _play_frames(self, frames):
+        """Writes frames to the output and keeps the output frame clock up to date."""
+        if self.frames_written and self.outstream.get_write_available() >= self.output_buffer_frames:
+            # The buffer ran dry since the last write
+            self.output_underruns += 1
+        self.outstream.write(frames)
+        if self.debug_outfile:
+            self.debug_outfile.writeframes(frames)
+        self.frames_written += len(frames) // self.frame_size
+        # Read the time after the fill, since polling a full simulated stream (see audio.backends) moves its clock on
+        frames_queued = self.output_buffer_frames - self.outstream.get_write_available()
+        self.output_clock.update(self.outstream.get_time(), self.frames_written, frames_queued)
+
+    def _play_loops(self, num_loops):
+        """Writes the frames of the current LOOP_UNTIL_HEIGHT cue to the output num_loops times over."""
+        self._play_frames(self.loop_frames * num_loops)
+
+    def _fill_buffer(self, buffer_frames_available):
+        # Fill the buffer, using multiple cues if necessary
+        while buffer_frames_available:
+            # Use as many frames as possible from the current cue, up to the amount of room left
+            cue_frames_available = self.current_cue.end_frame - self.current_frame_num
+            num_frames_to_play = min(buffer_frames_available, cue_frames_available)
+            if self.trace:
+                print('cue_frames_available=%d, buffer_frames_available=%d, num_frames_to_play=%d' % (
+                    cue_frames_available, buffer_frames_available, num_frames_to_play
+                ))
+            if num_frames_to_play:
+                frames = self.wave_file.readframes(num_frames_to_play)
+                self.current_frame_num += num_frames_to_play
+                if self.trace:
+                    print('read %d frames (%d bytes); current_frame_num=%d' % (
+                        num_frames_to_play, len(frames), self.current_frame_num
+                    ))
+                self._play_frames(frames)
+                if self.current_cue.cue_type == cue_file_mod.CueTypes.LOOP_UNTIL_HEIGHT:
+                    self.loop_frames += frames
+            buffer_frames_available -= num_frames_to_play
+            # If we exhausted this cue, determine which one to use next
+            if self.current_frame_num == self.current_cue.end_frame:
+                if self.trace:
+                    print('reached end of current cue')
+                if not self._end_of_cue(buffer_frames_available):
+                    # Still looping; go back and process input before checking the height again
+                    return
+                # NOTE: Don't read and play frames yet; will be handled when loop continues
+
+    def _end_of_cue(self, buffer_frames_available):
+        """Decides what to do at the end of the current cue. Returns True if playback moved on to the next cue, or
+        False if the current cue was looped."""
+        # If we're in a LOOP_UNTIL_HEIGHT cue, see if we should loop or continue onward. Only drips heard before the
+        # next frame to be written count towards the height.
+        current_height = float(self.drip_timeline.drips_at(self.frames_written)) / self.tuning_collection.drips_per_height
+        if (self.flow_controller and self.drip_governor and self.cue_loops == 1
+                and self.current_cue.cue_type == cue_file_mod.CueTypes.LOOP_UNTIL_HEIGHT):
+            # The layer has just been drawn; adjust the flow so the next layer's drips keep pace
+            drips_behind = (self.current_cue.until_height - current_height) * self.tuning_collection.drips_per_height
+            duty_cycle = self.flow_controller.update(drips_behind)
+            self.drip_governor.set_duty_cycle(duty_cycle)
+            if self.debug:
+                print('%0.1f drips behind; drip duty cycle now %0.2f' % (drips_behind, duty_cycle))
+        if (self.current_cue.cue_type == cue_file_mod.CueTypes.LOOP_UNTIL_HEIGHT
+                and current_height < self.current_cue.until_height):
+            if not self.waiting_for_drips:
+                self.log.info("Waiting for drips")
+                self.waiting_for_drips = True
+            if self.drip_governor and not self.flow_controller:
+                # (The flow controller has already opened the flow up to make up for the layer being behind)
+                self.drip_governor.start_dripping()
+            # Repeat the loop from memory, but only queue about LOOP_WRITE_TIME worth of whole loops before going back
+            # to process input, so the height is re-checked at (nearly) every loop boundary instead of once per buffer.
+            loop_frame_count = max(len(self.loop_frames) // self.frame_size, 1)
+            num_loops = max(min(buffer_frames_available, self.max_loop_write_frames) // loop_frame_count, 1)
+            if self.trace:
+                print('relooping current cue %d times (%d frames each)' % (num_loops, loop_frame_count))
+            self._play_loops(num_loops)
+            self.cue_loops += num_loops
+            return False
+
+        loop_exit_delay_ms = None
+        if self.waiting_for_drips and self.drip_timeline.last_drip_frame is not None:
+            loop_exit_delay_ms = 1000.0 * (self.frames_written - self.drip_timeline.last_drip_frame) / self.wave_rate
+            if self.debug:
+                print('Left loop %0.1f ms after the drip' % loop_exit_delay_ms)
+        self.waiting_for_drips = False
+        if (self.current_cue.cue_type == cue_file_mod.CueTypes.LOOP_UNTIL_HEIGHT
+                and current_height > self.current_cue.until_height):
+            ahead_by_mm = current_height - self.current_cue.until_height
+            ahead_by_drips = int(ahead_by_mm * self.tuning_collection.drips_per_height)
+            self.log.warning('Too fast: '+'-' * ahead_by_drips + "> %d drips ahead" % ahead_by_drips)
+            if self.drip_governor and not self.flow_controller:
+                if ahead_by_drips > 10:
+                    self.drip_governor.stop_dripping()
+                    print('------Stop Dripping!-----')
+                elif ahead_by_drips < 5:
+                    self.drip_governor.start_dripping()
+                    print('+++++Start Dripping!+++++')
+        if self.telemetry:
+            self._record_cue(current_height, loop_exit_delay_ms)
+        # Advance to next cue
+        self.current_cue_index += 1
+        if self.current_cue_index >= len(self.cues):
+            # We've reached the end and can now exit
+            raise StopIteration('Reached end of cue list')
+        self.current_cue = self.cues[self.current_cue_index]
+        if self.checkpoint:
+            self.checkpoint.save(self.current_cue_index, self.drip_timeline.num_drips, current_height)
+        self.loop_frames = b''
+        self.cue_start_frames_written = self.frames_written
+        self.cue_loops = 1
+        self.log.info('Playing cue %d of %d (%2.1f%%)' % (
+            self.current_cue_index+1, len(self.cues), 100.0*float(self.current_cue_index+1)/float(len(self.cues))
+        ))
+        if self.debug:
+            print('Height = %0.3f' % current_height)
+        self._seek(self.current_cue.start_frame)
+        return True
+
+    def _record_cue(self, current_height, loop_exit_delay_ms):
+        until_height = None
+        height_error = None
+        if self.current_cue.cue_type == cue_file_mod.CueTypes.LOOP_UNTIL_HEIGHT:
+            until_height = self.current_cue.until_height
+            height_error = current_height - until_height
+        self.telemetry.record({
+            'time': float(self.frames_written) / self.wave_rate,
+            'rate': self.wave_rate,
+            'cue_index': self.current_cue_index,
+            'cue_type': self.current_cue.cue_type,
+            'until_height': until_height,
+            'frames': self.frames_written - self.cue_start_frames_written,
+            'loops': self.cue_loops,
+            'drips': self.drip_timeline.num_drips,
+            'height': current_height,
+            'height_error': height_error,
+            'buffer_fill': self.output_buffer_frames - self.outstream.get_write_available(),
+            'underruns': self.output_underruns,
+            'loop_exit_delay_ms': loop_exit_delay_ms,
+        })
+
+    def _seek(self, new_frame_num):
+        # How do we get to the new cue position?
+        if new_frame_num in self.frame_position_cache:
+            # Use cached position
+            wave_pos = self.frame_position_cache[new_frame_num]
+            if self.trace:
+                print('New position in cache; frame_num=%d, wave_pos=%d' % (new_frame_num, wave_pos))
+            self.wave_file.setpos(wave_pos)
+        elif new_frame_num >= self.current_frame_num:
+            # Advance by reading and discarding frames
+            num_frames_to_discard = new_frame_num - self.current_frame_num
+            if self.trace:
+                print('Need to fast-forward to find new position: num_frames_to_discard=%d (%d-%d)' % (
+                    num_frames_to_discard, new_frame_num, self.current_frame_num
+                ))
+            if num_frames_to_discard:
+                self.wave_file.readframes(num_frames_to_discard)
+        else:
+            if self.debug:
+                print('WARNING: Was forced to rewind to seek to frame_num=%d' % new_frame_num)
+            self.wave_file.rewind()
+            self.wave_file.readframes(new_frame_num)
+        self.current_frame_num = new_frame_num
+        # Save the new start position to the cache (since we're likely to loop back to it)
+        self.frame_position_cache[self.current_frame_num] = self.wave_file.tell()
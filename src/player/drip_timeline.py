@@ -0,0 +1,27 @@
+import collections
+
+
+class DripTimeline(object):
+    """
+    Drips lined up against the output frame timeline (see audio.frame_clock.OutputFrameClock). Cue decisions made for
+    a given output frame only count the drips that had happened by that frame, no matter when the drips were
+    reported.
+    """
+    def __init__(self, num_drips=0):
+        """
+        num_drips -- int -- Drips that had already happened before the first output frame.
+        """
+        self._pending_frames = collections.deque()
+        self.num_drips = num_drips
+        self.last_drip_frame = None
+
+    def add_drip(self, frame_num):
+        """Records a drip that happened while the given output frame was playing. Drips must be added in order."""
+        self._pending_frames.append(frame_num)
+
+    def drips_at(self, frame_num):
+        """Returns the number of drips that had happened by the given output frame."""
+        while self._pending_frames and self._pending_frames[0] <= frame_num:
+            self.last_drip_frame = self._pending_frames.popleft()
+            self.num_drips += 1
+        return self.num_drips
@@ -0,0 +1,400 @@
+import math
+import sys
+import wave
+
+import cue_file as cue_file_mod
+from audio.drip_input import DripEvent
+from player.cue_player import CuePlayer
+from util.logging import Logging
+
+
+class SimulationError(Exception):
+    pass
+
+
+class VirtualDripSource(object):
+    """
+    Drips at a fixed rate from the start of playback, like audio.drip_detector.VirtualDripDetector. The rate can be
+    scaled by a duty cycle, as the drip governor scales the flow.
+    """
+    def __init__(self, drip_rate):
+        """
+        drip_rate -- float -- Drips per second, while dripping fully.
+        """
+        self.drip_rate = float(drip_rate)
+        self.duty_cycle = 1.0
+        self._past_drip_times = []  # Times of the drips before the duty cycle last changed
+        self._change_time = 0.0     # When the duty cycle last changed
+        self._change_drips = 0.0    # Drips by then, including the part of the next drip
+
+    def set_duty_cycle(self, duty_cycle, time):
+        """Scales the drip rate by duty_cycle, from 0.0 (off) to 1.0, from the given time on. Times must not go
+        backwards."""
+        while True:
+            drip_time = self.drip_time(len(self._past_drip_times) + 1)
+            if drip_time is None or drip_time > time:
+                break
+            self._past_drip_times.append(drip_time)
+        self._change_drips += (time - self._change_time) * self.drip_rate * self.duty_cycle
+        self._change_time = time
+        self.duty_cycle = min(max(duty_cycle, 0.0), 1.0)
+
+    def drip_time(self, drip_num):
+        """Returns the time in seconds at which the given drip (counting from 1) happens, or None if it doesn't at
+        the current duty cycle."""
+        if drip_num <= len(self._past_drip_times):
+            return self._past_drip_times[drip_num - 1]
+        if not self.duty_cycle:
+            return None
+        return max(self._change_time + (drip_num - self._change_drips) / (self.drip_rate * self.duty_cycle),
+                   self._change_time)
+
+
+class RecordedDripSource(object):
+    """Replays the drips heard in a recording of the drip microphone. The recording is taken to start along with
+    playback; once its drips run out, no more drips happen."""
+    READ_FRAMES = 48000
+
+    def __init__(self, drip_times):
+        """
+        drip_times -- list of float -- Time in seconds of each drip, in order.
+        """
+        self.drip_times = drip_times
+
+    @classmethod
+    def from_wave_file(cls, filename):
+        """Runs the drip detector over a 16-bit mono wave file and returns a source replaying the drips it heard."""
+        from audio.drip_detector import DripDetector
+        wave_file = wave.open(filename, 'rb')
+        try:
+            if wave_file.getnchannels() != 1 or wave_file.getsampwidth() != 2:
+                raise SimulationError('Drip recording must be 16-bit mono')
+            wave_rate = wave_file.getframerate()
+            drip_detector = DripDetector(wave_rate)
+            drip_times = []
+            frame_offset = 0
+            while True:
+                frames = wave_file.readframes(cls.READ_FRAMES)
+                if not frames:
+                    break
+                drip_times.extend(float(frame_offset + index) / wave_rate
+                                  for index in drip_detector.add_frames(frames))
+                frame_offset += len(frames) // 2
+        finally:
+            wave_file.close()
+        return cls(drip_times)
+
+    def drip_time(self, drip_num):
+        if drip_num > len(self.drip_times):
+            return None
+        return self.drip_times[drip_num - 1]
+
+
+class SimulationReport(object):
+    def __init__(self, wave_rate, drips_per_height):
+        self.wave_rate = wave_rate
+        self.drips_per_height = drips_per_height
+        self.total_frames = 0
+        self.loop_counts = []       # (cue index, number of times the loop was played) for each LOOP_UNTIL_HEIGHT cue
+        self.too_fast_frames = 0    # Frames played while the liquid was already past the height being waited for
+        self.too_fast_cues = 0
+        self.num_drips = 0
+        self.completed = True       # False if the drips ran out before the last cue
+
+    @property
+    def total_time(self):
+        return float(self.total_frames) / self.wave_rate
+
+    @property
+    def too_fast_time(self):
+        return float(self.too_fast_frames) / self.wave_rate
+
+    @property
+    def final_height(self):
+        return float(self.num_drips) / self.drips_per_height
+
+    def summary(self):
+        lines = []
+        if not self.completed:
+            lines.append('INCOMPLETE: ran out of drips after %d of the loop cues' % len(self.loop_counts))
+        lines.append('Total print time: %s (%0.1f s)' % (_format_duration(self.total_time), self.total_time))
+        lines.append('Final height: %0.3f mm (%d drips)' % (self.final_height, self.num_drips))
+        lines.append('Too fast: %d cues, %0.1f s' % (self.too_fast_cues, self.too_fast_time))
+        lines.append('Loop counts per cue:')
+        for cue_index, num_loops in self.loop_counts:
+            lines.append('  cue %d: %d' % (cue_index + 1, num_loops))
+        return '\n'.join(lines)
+
+
+def _format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '%d:%02d:%02d' % (hours, minutes, seconds)
+
+
+class SimulatedDripInput(object):
+    """Reports the drips of a drip source to the player as the clock of the simulated output stream passes them."""
+    def __init__(self, drip_source, outstream):
+        """
+        drip_source -- VirtualDripSource or RecordedDripSource -- When the drips happen.
+        outstream -- Simulated output stream, such as SimulatedOutputStream -- Whose clock the drips are timed by.
+        """
+        self.drip_source = drip_source
+        self.outstream = outstream
+        self.num_drips = 0
+        self.overflows = 0
+
+    @property
+    def next_drip_time(self):
+        """Time in seconds of the next drip to be reported, or None if no more drips are coming."""
+        return self.drip_source.drip_time(self.num_drips + 1)
+
+    @property
+    def out_of_drips(self):
+        """True if no more drips are coming."""
+        return self.next_drip_time is None
+
+    def new_drip_events(self):
+        stream_time = self.outstream.get_time()
+        drip_events = []
+        while True:
+            drip_time = self.drip_source.drip_time(self.num_drips + 1)
+            if drip_time is None or drip_time > stream_time:
+                return drip_events
+            self.num_drips += 1
+            drip_events.append(DripEvent(self.num_drips, drip_time))
+
+
+class SimulatedDripGovernor(object):
+    """Passes the flow the player asks the drip governor for on to a VirtualDripSource, at the time of the simulated
+    output stream."""
+    def __init__(self, drip_source, outstream):
+        """
+        drip_source -- VirtualDripSource -- Whose drip rate is governed.
+        outstream -- Simulated output stream, such as SimulatedOutputStream -- Whose clock changes to the flow are
+            timed by.
+        """
+        self.drip_source = drip_source
+        self.outstream = outstream
+
+    def start_dripping(self):
+        self.set_duty_cycle(1.0)
+
+    def stop_dripping(self):
+        self.set_duty_cycle(0.0)
+
+    def set_duty_cycle(self, duty_cycle):
+        self.drip_source.set_duty_cycle(duty_cycle, self.outstream.get_time())
+
+    def close(self):
+        pass
+
+
+class SimulatedOutputStream(object):
+    """
+    Stands in for the player's output stream. Frames written are counted rather than queued, and the stream clock
+    runs a full output buffer behind them, as it does while the player keeps the buffer topped up; so the clock moves
+    on with every write, by as much as was written, instead of waiting for the frames to play.
+    """
+    def __init__(self, rate, frame_size, buffer_frames, write_frames):
+        """
+        rate -- int -- Sampling rate.
+        frame_size -- int -- Bytes per frame.
+        buffer_frames -- int -- Frames queued ahead of playback.
+        write_frames -- int -- Room offered for each write.
+        """
+        self.rate = rate
+        self.frame_size = frame_size
+        self.buffer_frames = buffer_frames
+        self.write_frames = write_frames
+        self.frames_written = 0
+
+    def write(self, frames):
+        self.pass_frames(len(frames) // self.frame_size)
+
+    def pass_frames(self, num_frames):
+        """Writes num_frames frames without needing their audio."""
+        self.frames_written += num_frames
+
+    def get_frames_queued(self):
+        return min(self.frames_written, self.buffer_frames)
+
+    def get_write_available(self):
+        return self.write_frames
+
+    def get_time(self):
+        return float(self.frames_written - self.get_frames_queued()) / self.rate
+
+    def get_output_latency(self):
+        return 0.0
+
+    def close(self):
+        pass
+
+
+class _SilentWave(object):
+    """Stands in for the wave file the cues refer to, so that nothing is read from it: the simulation only needs to
+    know how many frames are played, not what they sound like."""
+    def __init__(self, wave_file):
+        self._rate = wave_file.getframerate()
+        self._channels = wave_file.getnchannels()
+        self._sample_width = wave_file.getsampwidth()
+        self._position = 0
+
+    def getframerate(self):
+        return self._rate
+
+    def getnchannels(self):
+        return self._channels
+
+    def getsampwidth(self):
+        return self._sample_width
+
+    def tell(self):
+        return self._position
+
+    def setpos(self, position):
+        self._position = position
+
+    def rewind(self):
+        self._position = 0
+
+    def readframes(self, num_frames):
+        self._position += num_frames
+        return b'\x00' * (num_frames * self._channels * self._sample_width)
+
+
+class _OutOfDrips(Exception):
+    pass
+
+
+class _SimulatedCuePlayer(CuePlayer):
+    """
+    A CuePlayer for a SimulatedOutputStream. Rather than checking the height every LOOP_WRITE_TIME, it catches up
+    with the drips at the end of every cue and, while waiting for drips, queues as many whole loops at once as fit
+    before the next drip is heard; the loop is still left at the first loop boundary after that drip. It gives up,
+    rather than looping forever, when it is waiting for drips and none are coming.
+    """
+    def __init__(self, *args, **kwargs):
+        CuePlayer.__init__(self, *args, **kwargs)
+        self.max_loop_write_frames = sys.maxsize
+
+    def _process_drip_input(self):
+        num_drips = self.drip_input.num_drips
+        CuePlayer._process_drip_input(self)
+        if self.waiting_for_drips and self.drip_input.num_drips == num_drips and self.drip_input.out_of_drips:
+            raise _OutOfDrips()
+
+    def _play_frames(self, frames):
+        self._pass_frames(len(frames) // self.frame_size)
+
+    def _play_loops(self, num_loops):
+        self._pass_frames(num_loops * (len(self.loop_frames) // self.frame_size))
+
+    def _pass_frames(self, num_frames):
+        self.outstream.pass_frames(num_frames)
+        self.frames_written += num_frames
+        self.output_clock.update(self.outstream.get_time(), self.frames_written, self.outstream.get_frames_queued())
+
+    def _end_of_cue(self, buffer_frames_available):
+        CuePlayer._process_drip_input(self)
+        return CuePlayer._end_of_cue(self, min(buffer_frames_available, self._frames_before_next_drip()))
+
+    def _frames_before_next_drip(self):
+        """Returns how many more frames can be written before the stream clock reaches the next drip (at least, if
+        rounding leaves it in doubt), or 0 if no more drips are coming."""
+        drip_time = self.drip_input.next_drip_time
+        if drip_time is None:
+            return 0
+        heard_frames = int(math.floor(drip_time * self.wave_rate)) + self.outstream.buffer_frames
+        return max(heard_frames - self.frames_written, 0)
+
+
+class _TelemetryRecords(object):
+    def __init__(self):
+        self.records = []
+
+    def record(self, record):
+        self.records.append(record)
+
+
+class PrintSimulator(object):
+    """
+    Plays the cues with player.cue_player.CuePlayer on the simulated clock of a SimulatedOutputStream, so nothing
+    reaches the sound card and the clock jumps ahead in steps of up to MAX_WRITE_TIME, or up to the next drip while
+    a loop waits for one. Drips come from a drip source, reported as the simulated clock passes them, and the report
+    is made from the telemetry the player records for each cue. With a flow controller, the drip governor is
+    simulated by scaling the rate of virtual drips.
+    """
+    DEFAULT_OUTPUT_BUFFER_TIME = 0.005  # Seconds of output queued ahead of playback, as wav_player does
+    MAX_WRITE_TIME = 1.0                # Most seconds of audio the simulated player writes at once
+
+    def __init__(self, wave_file, cues, tuning_collection, drip_source, output_buffer_time=DEFAULT_OUTPUT_BUFFER_TIME,
+                 flow_controller=None):
+        """
+        wave_file -- wave.Wave_read -- 16-bit stereo audio the cues refer to.
+        cues -- list of Cue -- The cues to play, in order.
+        tuning_collection -- TuningParameterCollection -- Provides drips_per_height.
+        drip_source -- VirtualDripSource or RecordedDripSource -- When the drips happen.
+        output_buffer_time -- float -- Seconds of output the player queues ahead of playback.
+        flow_controller -- DripRateController -- If given, the player regulates the drips with it. Needs a
+            VirtualDripSource.
+        """
+        if flow_controller and not isinstance(drip_source, VirtualDripSource):
+            raise SimulationError('Flow control can only be simulated with virtual drips')
+        self.wave_file = wave_file
+        self.cues = cues
+        self.tuning_collection = tuning_collection
+        self.drip_source = drip_source
+        self.output_buffer_time = output_buffer_time
+        self.flow_controller = flow_controller
+        self.wave_rate = wave_file.getframerate()
+        self.drips_per_height = float(tuning_collection.drips_per_height)
+
+    def run(self):
+        """Simulates playing every cue and returns a SimulationReport."""
+        report = SimulationReport(self.wave_rate, self.drips_per_height)
+        outstream = SimulatedOutputStream(self.wave_rate, self.wave_file.getnchannels() * self.wave_file.getsampwidth(),
+                                          int(self.wave_rate * self.output_buffer_time),
+                                          int(self.wave_rate * self.MAX_WRITE_TIME))
+        drip_input = SimulatedDripInput(self.drip_source, outstream)
+        drip_governor = None
+        if self.flow_controller:
+            drip_governor = SimulatedDripGovernor(self.drip_source, outstream)
+        telemetry = _TelemetryRecords()
+        player = _SimulatedCuePlayer(_SilentWave(self.wave_file), self.cues, self.tuning_collection, outstream, drip_input,
+                                     Logging('error'), drip_governor=drip_governor, telemetry=telemetry,
+                                     flow_controller=self.flow_controller)
+        try:
+            player.play()
+        except _OutOfDrips:
+            report.completed = False
+        finally:
+            outstream.close()
+        report.total_frames = player.frames_written
+        report.num_drips = player.drip_timeline.num_drips
+        self._add_cue_records(report, telemetry.records)
+        return report
+
+    def _add_cue_records(self, report, records):
+        frame_num = 0
+        layer_start_frame = 0   # Where the previous LOOP_UNTIL_HEIGHT cue was left
+        for record in records:
+            frame_num += record['frames']
+            if record['cue_type'] != cue_file_mod.CueTypes.LOOP_UNTIL_HEIGHT:
+                continue
+            report.loop_counts.append((record['cue_index'], record['loops']))
+            if record['height_error'] > 0:
+                report.too_fast_cues += 1
+                # Ahead since the drip that took the liquid past this height, or since this layer started
+                passed_time = self.drip_source.drip_time(self._drips_past_height(record['until_height']))
+                report.too_fast_frames += frame_num - max(passed_time * self.wave_rate, layer_start_frame)
+            layer_start_frame = frame_num
+
+    def _drips_past_height(self, height):
+        """Returns the fewest drips whose height is more than the given height, using the same float comparison as
+        the player."""
+        num_drips = max(int(math.floor(height * self.drips_per_height)) - 1, 0)
+        while num_drips / self.drips_per_height <= height:
+            num_drips += 1
+        return num_drips
@@ -0,0 +1,115 @@
+import json
+import math
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class TelemetryWriter(threading.Thread):
+    """
+    Writes telemetry records to a JSONL file (one JSON object per line) from a background thread. Records are handed
+    over through a bounded queue; if the writer falls behind, new records are dropped and counted rather than ever
+    making playback wait.
+    """
+    DEFAULT_QUEUE_SIZE = 1000
+
+    def __init__(self, outfile, queue_size=DEFAULT_QUEUE_SIZE):
+        """
+        outfile -- file -- Open text file to write the records to. Closed by 'stop'.
+        queue_size -- int -- Number of records that can be waiting to be written.
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.outfile = outfile
+        self.dropped = 0
+        self._records = queue.Queue(queue_size)
+
+    def record(self, record):
+        """Queues a record (a dict of JSON-serializable values) to be written. Never blocks."""
+        try:
+            self._records.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        while True:
+            record = self._records.get()
+            if record is None:
+                break
+            self.outfile.write(json.dumps(record, sort_keys=True) + '\n')
+        self.outfile.close()
+
+    def stop(self):
+        """Writes the remaining records and closes the file."""
+        self._records.put(None)
+        self.join(10.0)
+        if self.is_alive():
+            print('WARNING: TelemetryWriter did not stop after 10 seconds')
+
+
+def read_telemetry(infile):
+    """Returns the records in a telemetry file, in order."""
+    return [json.loads(line) for line in infile if line.strip()]
+
+
+def summarize_layers(records):
+    """
+    Groups cue records into layers, each ending with a LOOP_UNTIL_HEIGHT cue, and returns a dict per layer with:
+    layer (from 1), height, start_time, play_time (seconds spent in PLAY cues), wait_time (seconds spent in the loop
+    cue), total_time, loops, height_error (mm above the layer's height when it was left), underruns (during the
+    layer) and loop_exit_delay_ms (from the drip that reached the height until the loop was left).
+    """
+    layers = []
+    layer = None
+    last_underruns = 0
+    for record in records:
+        if layer is None:
+            layer = {'layer': len(layers) + 1, 'start_time': record['time'] - record['frames'] / float(record['rate']),
+                     'play_time': 0.0}
+        seconds = record['frames'] / float(record['rate'])
+        if record['cue_type'] == 'loop_until_height':
+            layer['height'] = record['until_height']
+            layer['wait_time'] = seconds
+            layer['total_time'] = record['time'] - layer['start_time']
+            layer['loops'] = record['loops']
+            layer['height_error'] = record['height_error']
+            layer['underruns'] = record['underruns'] - last_underruns
+            layer['loop_exit_delay_ms'] = record['loop_exit_delay_ms']
+            last_underruns = record['underruns']
+            layers.append(layer)
+            layer = None
+        else:
+            layer['play_time'] += seconds
+    return layers
+
+
+def format_layer_table(layers):
+    """Returns the layer summaries as a text table, followed by totals."""
+    lines = ['%5s %8s %10s %9s %9s %9s %6s %9s %5s %9s' % (
+        'layer', 'height', 'start', 'total', 'play', 'wait', 'loops', 'error', 'undr', 'exit_ms')]
+    for layer in layers:
+        lines.append('%5d %8.3f %10.2f %9.3f %9.3f %9.3f %6d %9.3f %5d %9s' % (
+            layer['layer'], layer['height'], layer['start_time'], layer['total_time'], layer['play_time'],
+            layer['wait_time'], layer['loops'], layer['height_error'], layer['underruns'],
+            _format_optional(layer['loop_exit_delay_ms'])))
+    if layers:
+        total_time = sum(layer['total_time'] for layer in layers)
+        wait_time = sum(layer['wait_time'] for layer in layers)
+        lines.append('Total: %d layers in %0.1f s, %0.1f s (%0.1f%%) waiting for drips, %d underruns' % (
+            len(layers), total_time, wait_time, 100.0 * wait_time / total_time if total_time else 0.0,
+            sum(layer['underruns'] for layer in layers)))
+        exit_delays = [layer['loop_exit_delay_ms'] for layer in layers if layer['loop_exit_delay_ms'] is not None]
+        if exit_delays:
+            mean = sum(exit_delays) / len(exit_delays)
+            jitter = math.sqrt(sum((delay - mean) ** 2 for delay in exit_delays) / len(exit_delays))
+            lines.append('Loop exit delay: mean %0.1f ms, min %0.1f ms, max %0.1f ms, jitter %0.1f ms' % (
+                mean, min(exit_delays), max(exit_delays), jitter))
+    return '\n'.join(lines)
+
+
+def _format_optional(value):
+    if value is None:
+        return '-'
+    return '%0.1f' % value
@@ -0,0 +1,118 @@
+"""
+Slices an STL model into layers and writes them as g-code, or converts them straight to wave and cue files when --wav
+is given (with the g-code as well only if --output_file is given).
+"""
+import sys
+import getopt
+from gcode_writer import GcodeWriter
+from gcode_wav_converter import MoveList, convert_moves
+from slicer.stl_slicer import Slicer, load_stl
+from slicer.hatch import hatch_layers
+
+def to_mm_per_minute(mm_per_second):
+    return mm_per_second * 60.0
+
+def write_layers(layers, writer):
+    """Draws each layer's contours with a GcodeWriter."""
+    for layer in layers:
+        writer.moveToHeight(layer.height)
+        writer.drawPaths(layer.contours)
+
+def add_layers(moves, layers, feed_rate, rapid_rate):
+    """Adds the moves drawing each layer's contours to a MoveList, the way GcodeWriter would write them."""
+    for layer in layers:
+        moves.move(z=layer.height, feed_rate=rapid_rate)
+        for contour in layer.contours:
+            moves.move(x=contour[0][0], y=contour[0][1], feed_rate=rapid_rate)
+            for x, y in contour[1:]:
+                moves.move(x=x, y=y, feed_rate=feed_rate, extrude=True)
+
+def usage():
+    print("""Usage:\npython slice_stl.py [options] model.stl
+        --layer_height=0.01 (mm) height of each layer
+        --hatch_spacing=0.1 (mm) fill the inside of each layer with hatch lines this far apart (not filled by default)
+        --feed_rate=100 (mm per second) speed to draw at
+        --rapid_rate=500 (mm per second) speed to move between contours at
+        --output_file=model.gcode file name for generated g-code (only written with --wav if given)
+        --tuning=tuning.dat tuning data file to convert with (needed with --wav)
+        --wav=model.wav convert straight to this wave file
+        --cue=model.cue cue file written with --wav (defaults to the wave file name with .cue)
+        """)
+
+def main():
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'h', ['help', 'layer_height=', 'hatch_spacing=', 'feed_rate=',
+                                                       'rapid_rate=', 'output_file=', 'tuning=', 'wav=', 'cue='])
+    except getopt.GetoptError as err:
+        print(err)
+        usage()
+        sys.exit(2)
+
+    #Defaults
+    layer_height = 0.01
+    hatch_spacing = None
+    feed_rate = to_mm_per_minute(100)
+    rapid_rate = to_mm_per_minute(500)
+    output_file = None
+    tuning_file = None
+    wave_file = None
+    cue_file = None
+
+    try:
+        for opt, arg in opts:
+            if (opt == '--layer_height'):
+                layer_height = float(arg)
+            elif (opt == '--hatch_spacing'):
+                hatch_spacing = float(arg)
+            elif (opt == '--feed_rate'):
+                feed_rate = to_mm_per_minute(float(arg))
+            elif (opt == '--rapid_rate'):
+                rapid_rate = to_mm_per_minute(float(arg))
+            elif (opt == '--output_file'):
+                output_file = arg
+            elif (opt == '--tuning'):
+                tuning_file = arg
+            elif (opt == '--wav'):
+                wave_file = arg
+            elif (opt == '--cue'):
+                cue_file = arg
+            else:
+                usage()
+                sys.exit(2)
+    except ValueError as ex:
+        print(ex)
+        usage()
+        sys.exit(2)
+
+    if len(args) != 1 or layer_height <= 0 or (hatch_spacing is not None and hatch_spacing <= 0):
+        usage()
+        sys.exit(2)
+    model_file = args[0]
+    if wave_file is None:
+        output_file = output_file or model_file.rsplit('.', 1)[0] + '.gcode'
+    elif tuning_file is None:
+        print('--wav needs --tuning')
+        usage()
+        sys.exit(2)
+    elif cue_file is None:
+        cue_file = wave_file.rsplit('.', 1)[0] + '.cue'
+
+    layers = Slicer(load_stl(model_file)).layers(layer_height)
+    if hatch_spacing:
+        layers = hatch_layers(layers, hatch_spacing)
+    if wave_file is None:
+        with open(output_file, 'w') as output:
+            write_layers(layers, GcodeWriter(output, feed_rate, rapid_rate))
+        print("Complete: Gcode file is located at %s" % output_file)
+    else:
+        output = open(output_file, 'w') if output_file else None
+        moves = MoveList(output)
+        add_layers(moves, layers, feed_rate, rapid_rate)
+        if output:
+            output.close()
+            print("Complete: Gcode file is located at %s" % output_file)
+        convert_moves(moves.moves, tuning_file, wave_file, cue_file)
+        print("Complete: Wave file is located at %s and cue file at %s" % (wave_file, cue_file))
+
+if __name__ == "__main__":
+    main()
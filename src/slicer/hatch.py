@@ -0,0 +1,165 @@
+import math
+import numpy
+from .stl_slicer import Layer
+
+DEFAULT_ANGLES = (45.0, 135.0)
+INWARD_TOLERANCE = 1e-3     # Sine of the sharpest turn the wrong way still treated as straight
+
+
+def hatch(contours, spacing, angle=0.0, start=None):
+    """
+    Fills the inside of the contours (by the even-odd rule) with hatch lines spacing apart at the given angle (in
+    degrees), and returns them as paths for GcodeWriter.drawPath: lists of (x, y) tuples, each drawn with the laser on.
+
+    Neighbouring lines are joined end to end in a serpentine, so the laser stays on between them, wherever the contour
+    runs from one line to the next without an inward corner; this relies on the contours being wound like the slicer
+    winds them, with the inside on the left. Each path starts from whichever unused line end is nearest the end of the
+    path before (or start, if given), to keep the moves with the laser off short.
+    """
+    cos_angle, sin_angle = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+    edges = _Edges(contours)
+    if not len(edges.starts):
+        return []
+    # Turn so the hatch lines run along x
+    rotation = numpy.array([[cos_angle, -sin_angle], [sin_angle, cos_angle]])
+    edges.starts = edges.starts.dot(rotation)
+    edges.ends = edges.ends.dot(rotation)
+    segments = _segments(edges, spacing)
+    paths = _order(edges, segments, spacing, None if start is None else numpy.dot(start, rotation))
+    return [[(x * cos_angle - y * sin_angle, x * sin_angle + y * cos_angle) for x, y in path] for path in paths]
+
+
+def hatch_layers(layers, spacing, angles=DEFAULT_ANGLES):
+    """Adds hatching after the contours of each Layer, turning to the next of the angles for each layer."""
+    for index, layer in enumerate(layers):
+        start = layer.contours[-1][-1] if layer.contours else None
+        paths = hatch(layer.contours, spacing, angles[index % len(angles)], start)
+        yield Layer(layer.height, layer.contours + paths)
+
+
+class _Edges(object):
+    """The edges of the contours, closing any that are open, and how they link up."""
+    def __init__(self, contours):
+        starts = []
+        following = []
+        inward = []
+        for contour in contours:
+            points = numpy.array(contour, dtype=numpy.float64).reshape(-1, 2)
+            if len(points) > 1 and numpy.array_equal(points[0], points[-1]):
+                points = points[:-1]
+            if not len(points):
+                continue
+            directions = numpy.roll(points, -1, axis=0) - points
+            before = numpy.roll(directions, 1, axis=0)
+            # The turn into each edge from the one before; turning right is an inward corner
+            turns = before[:, 0] * directions[:, 1] - before[:, 1] * directions[:, 0]
+            lengths = numpy.hypot(directions[:, 0], directions[:, 1])
+            inward.append(turns < -INWARD_TOLERANCE * lengths * numpy.roll(lengths, 1))
+            indices = numpy.arange(len(points)) + sum(len(part) for part in starts)
+            following.append(numpy.roll(indices, -1))
+            starts.append(points)
+        if not starts:
+            self.starts = self.ends = numpy.empty((0, 2))
+            return
+        self.starts = numpy.concatenate(starts)
+        self.following = numpy.concatenate(following)
+        self.ends = self.starts[self.following]
+        self.preceding = numpy.empty_like(self.following)
+        self.preceding[self.following] = numpy.arange(len(self.following))
+        self.inward = numpy.concatenate(inward)
+
+
+def _segments(edges, spacing):
+    """
+    Finds where the hatch lines y = (line + 0.5) * spacing cross the edges, and pairs the crossings along each line
+    into the segments inside the contours. Returns each segment's line, its left and right x, the edges it ends on,
+    and the first line each edge crosses along with how many it crosses.
+    """
+    starts, ends = edges.starts, edges.ends
+    low_y = numpy.minimum(starts[:, 1], ends[:, 1])
+    high_y = numpy.maximum(starts[:, 1], ends[:, 1])
+    # An edge crosses the lines from its lower end up to but not including its upper end, so a line through a vertex
+    # crosses just one of its edges (or both, where the contour turns back)
+    first_lines = numpy.ceil(low_y / spacing - 0.5).astype(numpy.int64)
+    counts = numpy.maximum(numpy.ceil(high_y / spacing - 0.5).astype(numpy.int64) - first_lines, 0)
+    crossed = numpy.repeat(numpy.arange(len(starts)), counts)
+    lines = numpy.repeat(first_lines, counts) + numpy.arange(counts.sum()) - numpy.repeat(
+        numpy.cumsum(counts) - counts, counts)
+    y = (lines + 0.5) * spacing
+    start_points, end_points = starts[crossed], ends[crossed]
+    x = start_points[:, 0] + (y - start_points[:, 1]) * (
+        (end_points[:, 0] - start_points[:, 0]) / (end_points[:, 1] - start_points[:, 1]))
+    order = numpy.lexsort((x, lines))
+    lines, x, crossed = lines[order], x[order], crossed[order]
+    return lines[0::2], x[0::2], x[1::2], crossed[0::2], crossed[1::2], first_lines, counts
+
+
+def _order(edges, segments, spacing, start):
+    """Strings the segments into serpentine paths, returned in drawing order in the turned coordinates."""
+    lines, left, right, left_edges, right_edges, first_lines, counts = segments
+    num_segments = len(lines)
+    if not num_segments:
+        return []
+    going_up = (edges.ends[:, 1] > edges.starts[:, 1]).tolist()
+    first_lines, last_lines = first_lines.tolist(), (first_lines + counts - 1).tolist()
+    following_edges, preceding_edges = edges.following.tolist(), edges.preceding.tolist()
+    inward = edges.inward.tolist()
+    crossings = {}
+    end_edges = []
+    segment_lines = lines.tolist()
+    for segment, (line, left_edge, right_edge) in enumerate(zip(segment_lines, left_edges.tolist(),
+                                                                right_edges.tolist())):
+        crossings[(line, left_edge)] = (segment, 0)
+        crossings[(line, right_edge)] = (segment, 1)
+        end_edges.append((left_edge, right_edge))
+
+    def along_contour(line, edge, forwards):
+        """Follows the contour from where edge crosses line to where it next crosses a line, and returns the segment
+        end there if that's the neighbouring line and there's no inward corner on the way."""
+        target = line + 1 if going_up[edge] == forwards else line - 1
+        for _ in range(len(going_up)):
+            if first_lines[edge] <= target <= last_lines[edge]:
+                return crossings.get((target, edge))
+            if forwards:
+                edge = following_edges[edge]
+                corner_inward = inward[edge]
+            else:
+                corner_inward = inward[edge]
+                edge = preceding_edges[edge]
+            if corner_inward or first_lines[edge] <= line <= last_lines[edge]:
+                return None
+        return None
+
+    end_points = numpy.stack((numpy.column_stack((left, (lines + 0.5) * spacing)),
+                              numpy.column_stack((right, (lines + 0.5) * spacing))), axis=1)
+    points = [[tuple(point) for point in ends] for ends in end_points.tolist()]
+    end_x = end_points[:, :, 0].ravel()
+    end_y = end_points[:, :, 1].ravel()
+    used = numpy.zeros(num_segments, dtype=bool)
+    remaining = numpy.arange(2 * num_segments)     # Segment ends not yet drawn, as segment * 2 + end
+    position = points[0][0] if start is None else tuple(start)
+    paths = []
+    while True:
+        remaining = remaining[~used[remaining // 2]]
+        if not len(remaining):
+            break
+        nearest = remaining[numpy.argmin((end_x[remaining] - position[0]) ** 2 +
+                                         (end_y[remaining] - position[1]) ** 2)]
+        segment, end = divmod(int(nearest), 2)
+        path = []
+        while True:
+            used[segment] = True
+            path.append(points[segment][end])
+            path.append(points[segment][1 - end])
+            exit_edge = end_edges[segment][1 - end]
+            line = segment_lines[segment]
+            for forwards in (True, False):
+                following = along_contour(line, exit_edge, forwards)
+                if following is not None and not used[following[0]]:
+                    segment, end = following
+                    break
+            else:
+                break
+        position = path[-1]
+        paths.append(path)
+    return paths
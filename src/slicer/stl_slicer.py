@@ -0,0 +1,160 @@
+import collections
+import re
+import numpy
+
+# One slice of a model: the height above the bottom of the model, and the closed contours at that height (each a list
+# of (x, y) tuples whose last point is its first)
+Layer = collections.namedtuple('Layer', ['height', 'contours'])
+
+BINARY_STL_DTYPE = numpy.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attributes', '<u2')])
+BINARY_STL_HEADER_SIZE = 84
+ASCII_STL_VERTEX = re.compile(br'vertex\s+(\S+)\s+(\S+)\s+(\S+)')
+EDGES = ((0, 1), (1, 2), (2, 0))
+
+
+def load_stl(filename):
+    """
+    Loads the triangles from a binary or ASCII STL file, returning an array of shape (triangles, 3 vertices, xyz).
+    """
+    with open(filename, 'rb') as stl_file:
+        data = stl_file.read()
+    if len(data) >= BINARY_STL_HEADER_SIZE:
+        # Some binary files start with 'solid' too, so go by whether the size fits the triangle count
+        count = int(numpy.frombuffer(data, '<u4', 1, BINARY_STL_HEADER_SIZE - 4)[0])
+        if len(data) == BINARY_STL_HEADER_SIZE + count * BINARY_STL_DTYPE.itemsize:
+            triangles = numpy.frombuffer(data, BINARY_STL_DTYPE, count, BINARY_STL_HEADER_SIZE)['vertices']
+            return triangles.astype(numpy.float64)
+    if not data.lstrip().startswith(b'solid'):
+        raise ValueError("'%s' is not an STL file" % filename)
+    vertices = numpy.array(ASCII_STL_VERTEX.findall(data), dtype=numpy.float64)
+    if len(vertices) % 3:
+        raise ValueError("'%s' has a facet without three vertices" % filename)
+    return vertices.reshape(-1, 3, 3)
+
+
+class Slicer(object):
+    """
+    Slices a triangle mesh into layers of contours. Each triangle is indexed by the range of layers it spans, so a
+    layer only intersects the triangles that straddle it, and the intersections for many layers are found at once.
+
+    Outer contours run anticlockwise seen from above and holes clockwise, as long as the triangles are wound
+    anticlockwise seen from outside (as STL requires). Contours are only left open where the mesh has a hole.
+    """
+    MAX_INTERSECTIONS_PER_BATCH = 1 << 20
+
+    def __init__(self, triangles):
+        """
+        triangles -- array -- Shape (triangles, 3 vertices, xyz), as from load_stl.
+        """
+        triangles = numpy.asarray(triangles, dtype=numpy.float64).reshape(-1, 3, 3)
+        # Shared vertices get one index, so the two triangles on an edge find the same point on it
+        self.vertices, faces = numpy.unique(triangles.reshape(-1, 3), axis=0, return_inverse=True)
+        self.faces = faces.reshape(-1, 3)
+        triangles = self.vertices[self.faces]
+        normals = numpy.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+        # Walking along a contour in this direction keeps the outside of the model on the right
+        self._directions = numpy.column_stack((-normals[:, 1], normals[:, 0]))
+        self._z_min = triangles[:, :, 2].min(axis=1)
+        self._z_max = triangles[:, :, 2].max(axis=1)
+        if len(triangles):
+            self.bottom, self.top = self._z_min.min(), self._z_max.max()
+        else:
+            self.bottom = self.top = 0.0
+
+    def layers(self, layer_height):
+        """
+        Yields a Layer for each layer_height of the model, bottom first. Each layer is sliced through its middle and
+        its height is the top of the layer, measured from the bottom of the model.
+        """
+        num_layers = int(numpy.ceil((self.top - self.bottom) / layer_height))
+        planes = self.bottom + (numpy.arange(num_layers) + 0.5) * layer_height
+        heights = (numpy.arange(num_layers) + 1) * layer_height
+        for index, contours in self._slice(planes):
+            yield Layer(float(heights[index]), contours)
+
+    def contours_at(self, z):
+        """Returns the contours where the plane at height z (in model coordinates) cuts the model."""
+        for _, contours in self._slice(numpy.array([float(z)])):
+            return contours
+
+    def _slice(self, planes):
+        """Yields (plane index, contours) for every plane, in order."""
+        # A triangle straddles a plane when it has a vertex below it and one on or above it
+        first_planes = numpy.searchsorted(planes, self._z_min, 'right')
+        last_planes = numpy.searchsorted(planes, self._z_max, 'right')
+        batch_start = 0
+        while batch_start < len(planes):
+            # Roughly bound the intersections worked on at once by the densest layers
+            per_plane = max(numpy.count_nonzero((first_planes <= batch_start) & (last_planes > batch_start)), 1)
+            batch_end = min(batch_start + max(self.MAX_INTERSECTIONS_PER_BATCH // per_plane, 1), len(planes))
+            firsts = numpy.maximum(first_planes, batch_start)
+            counts = numpy.maximum(numpy.minimum(last_planes, batch_end) - firsts, 0)
+            plane_indices, triangle_indices = self._pairs(firsts, counts)
+            segments = self._intersect(planes, plane_indices, triangle_indices)
+            bounds = numpy.searchsorted(plane_indices, numpy.arange(batch_start, batch_end + 1))
+            for index in range(batch_start, batch_end):
+                start, end = bounds[index - batch_start], bounds[index - batch_start + 1]
+                yield index, self._chain(*[part[start:end] for part in segments])
+            batch_start = batch_end
+
+    def _pairs(self, firsts, counts):
+        """Lists every (plane, triangle) straddling pair, sorted by plane."""
+        triangle_indices = numpy.repeat(numpy.arange(len(counts)), counts)
+        offsets = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+        plane_indices = numpy.repeat(firsts, counts) + offsets
+        order = numpy.argsort(plane_indices, kind='mergesort')
+        return plane_indices[order], triangle_indices[order]
+
+    def _intersect(self, planes, plane_indices, triangle_indices):
+        """Returns the segment of each pair as (start keys, end keys, start points, end points), where a key
+        identifies the edge the point is on."""
+        z = planes[plane_indices]
+        faces = self.faces[triangle_indices]
+        num_vertices = len(self.vertices)
+        lows = numpy.empty((len(faces), 3), dtype=numpy.int64)
+        highs = numpy.empty((len(faces), 3), dtype=numpy.int64)
+        for edge, (a, b) in enumerate(EDGES):
+            a_below = self.vertices[faces[:, a], 2] < z
+            lows[:, edge] = numpy.where(a_below, faces[:, a], faces[:, b])
+            highs[:, edge] = numpy.where(a_below, faces[:, b], faces[:, a])
+        # Exactly two edges of a straddling triangle cross the plane
+        crossing = (self.vertices[lows, 2] < z[:, None]) & (self.vertices[highs, 2] >= z[:, None])
+        lows = lows[crossing].reshape(-1, 2)
+        highs = highs[crossing].reshape(-1, 2)
+        # Always interpolate from the lower end, so both triangles on an edge get exactly the same point
+        low_points = self.vertices[lows]
+        high_points = self.vertices[highs]
+        t = (z[:, None] - low_points[:, :, 2]) / (high_points[:, :, 2] - low_points[:, :, 2])
+        points = low_points[:, :, :2] + t[:, :, None] * (high_points[:, :, :2] - low_points[:, :, :2])
+        keys = lows * num_vertices + highs
+        backwards = numpy.einsum('ij,ij->i', points[:, 1] - points[:, 0], self._directions[triangle_indices]) < 0
+        keys[backwards] = keys[backwards, ::-1]
+        points[backwards] = points[backwards, ::-1]
+        return keys[:, 0], keys[:, 1], points[:, 0], points[:, 1]
+
+    def _chain(self, start_keys, end_keys, start_points, end_points):
+        """Joins segments end to start into contours."""
+        num_segments = len(start_keys)
+        if not num_segments:
+            return []
+        order = numpy.argsort(start_keys, kind='mergesort')
+        found = numpy.minimum(numpy.searchsorted(start_keys[order], end_keys), num_segments - 1)
+        following = numpy.where(start_keys[order][found] == end_keys, order[found], -1)
+        has_previous = numpy.zeros(num_segments, dtype=bool)
+        has_previous[following[following >= 0]] = True
+        following = following.tolist()
+        start_points = [tuple(point) for point in start_points.tolist()]
+        end_points = [tuple(point) for point in end_points.tolist()]
+        visited = [False] * num_segments
+        contours = []
+        # Open chains have to be followed from their first segment; everything else is a loop
+        for segment in numpy.argsort(has_previous, kind='mergesort').tolist():
+            if visited[segment]:
+                continue
+            contour = [start_points[segment]]
+            while segment >= 0 and not visited[segment]:
+                visited[segment] = True
+                contour.append(end_points[segment])
+                segment = following[segment]
+            contours.append(contour)
+        return contours
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Summarizes a wav_player telemetry log (wav_player --telemetry=<file>) as a table of per-layer timings, to find
+where prints lose time.
+"""
+import sys
+
+from player.telemetry import read_telemetry, summarize_layers, format_layer_table
+
+
+def usage():
+    print("Usage: %s <telemetry.jsonl>" % sys.argv[0])
+
+
+def main():
+    if len(sys.argv) != 2:
+        usage()
+        sys.exit(1)
+    with open(sys.argv[1], 'r') as infile:
+        records = read_telemetry(infile)
+    print(format_layer_table(summarize_layers(records)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import serial
+import threading
 import time
 
 class DripGovernor(object):
@@ -35,3 +36,122 @@ class DripGovernor(object):
 
     def __del__(self):
         self.close()
+
+
+class AsyncDripGovernor(threading.Thread):
+    """
+    Drip governor that never blocks the caller. Commands only record the wanted flow; a worker thread does the serial
+    writes, so redundant or superseded commands are coalesced into at most one write. Besides plain on and off, the
+    flow can be set to a duty cycle, which the worker applies by switching the valve on for that fraction of every
+    'period' seconds.
+    """
+    def __init__(self, port, repeat_delay_ms=2000, period=2.0):
+        """
+        port -- str -- Serial port of the drip governor.
+        repeat_delay_ms -- int -- The current state is sent again after this long, in case a command was missed.
+        period -- float -- Seconds over which a duty cycle is applied.
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.period = period
+        self.writes = 0
+        self._repeat_delay = repeat_delay_ms / 1000.0
+        self._duty_cycle = 0.0
+        self._running = True
+        self._condition = threading.Condition()
+        self._connection = serial.Serial(port, 9600)
+        self.start()
+
+    def start_dripping(self):
+        self.set_duty_cycle(1.0)
+
+    def stop_dripping(self):
+        self.set_duty_cycle(0.0)
+
+    def set_duty_cycle(self, duty_cycle):
+        """Sets the fraction of the time the drips should flow, from 0.0 (off) to 1.0 (on)."""
+        duty_cycle = min(max(duty_cycle, 0.0), 1.0)
+        with self._condition:
+            if duty_cycle != self._duty_cycle:
+                self._duty_cycle = duty_cycle
+                self._condition.notify()
+
+    @property
+    def duty_cycle(self):
+        return self._duty_cycle
+
+    def run(self):
+        flow_on = False
+        last_write = time.time()
+        cycle_start = last_write
+        while True:
+            with self._condition:
+                if not self._running:
+                    break
+                duty_cycle = self._duty_cycle
+            now = time.time()
+            # Work out whether the valve should be on now, and when that next changes
+            next_change = None
+            if duty_cycle >= 1.0 or duty_cycle <= 0.0:
+                want_on = duty_cycle >= 1.0
+            else:
+                on_time = duty_cycle * self.period
+                phase = (now - cycle_start) % self.period
+                want_on = phase < on_time
+                if want_on:
+                    next_change = now + on_time - phase
+                else:
+                    next_change = now + self.period - phase
+            # The write happens outside the lock, so callers never wait on the serial port
+            if want_on != flow_on or now - last_write >= self._repeat_delay:
+                self._connection.write(b'1' if want_on else b'0')
+                self.writes += 1
+                flow_on = want_on
+                last_write = now
+            wake_time = last_write + self._repeat_delay
+            if next_change is not None:
+                wake_time = min(wake_time, next_change)
+            with self._condition:
+                if self._running and self._duty_cycle == duty_cycle:
+                    self._condition.wait(max(wake_time - time.time(), 0.001))
+
+    def close(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self.join(10.0)
+        if self.is_alive():
+            print('WARNING: AsyncDripGovernor did not stop after 10 seconds')
+        self._connection.close()
+
+
+class DripRateController(object):
+    """
+    PI controller for the drip flow. It is updated once per layer, when the layer has been drawn, with how many drips
+    the liquid is behind the layer's height, and returns the duty cycle to drip at for the next layer. Regulating
+    towards being 'target_drips_ahead' drips ahead makes the drips keep pace with the layer timing in the WAV file, so
+    layers neither wait for drips nor race ahead of them.
+    """
+    def __init__(self, kp=0.05, ki=0.02, target_drips_ahead=1.0, initial_duty_cycle=0.5):
+        """
+        kp -- float -- Proportional gain, in duty cycle per drip.
+        ki -- float -- Integral gain, in duty cycle per drip per layer.
+        target_drips_ahead -- float -- How far ahead of each layer's height the liquid should be.
+        initial_duty_cycle -- float -- The duty cycle to start from.
+        """
+        self.kp = kp
+        self.ki = ki
+        self.target_drips_ahead = target_drips_ahead
+        self.duty_cycle = initial_duty_cycle
+        self._integral = initial_duty_cycle / ki if ki else 0.0
+
+    def update(self, drips_behind):
+        """Returns the new duty cycle, given how many drips behind the layer's height the liquid is."""
+        error = drips_behind + self.target_drips_ahead
+        integral = self._integral + error
+        duty_cycle = self.kp * error + self.ki * integral
+        # Only integrate while that doesn't push the output further past its limits (anti-windup)
+        if 0.0 <= duty_cycle <= 1.0 or (duty_cycle > 1.0 and error < 0) or (duty_cycle < 0.0 and error > 0):
+            self._integral = integral
+        self.duty_cycle = min(max(duty_cycle, 0.0), 1.0)
+        return self.duty_cycle
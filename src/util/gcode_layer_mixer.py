@@ -1,62 +1,139 @@
+import itertools
+import random
+import re
+
+
+def rotate_layers(lines, is_layer_break, choose_start, seam_marker=None):
+    """
+    Streams lines through, rotating each layer (the lines between two layer breaks) to start part way through. The
+    layer breaks stay where they are. Only one layer is held at a time, and each line is handled once.
+
+    lines -- iterable of strings
+    is_layer_break -- function(line) -> bool -- Whether a line separates two layers.
+    choose_start -- function(num_lines) -> int -- The index of the line a layer of num_lines lines should start from.
+    seam_marker -- string -- If given, put before what was the first line of each layer that is rotated.
+    """
+    layer = []
+    for line in lines:
+        if is_layer_break(line):
+            for rotated_line in _rotate_layer(layer, choose_start, seam_marker):
+                yield rotated_line
+            layer = []
+            yield line
+        else:
+            layer.append(line)
+    for rotated_line in _rotate_layer(layer, choose_start, seam_marker):
+        yield rotated_line
+
+
+def _rotate_layer(layer, choose_start, seam_marker):
+    if not layer:
+        return
+    start = choose_start(len(layer))
+    for line in itertools.islice(layer, start, None):
+        yield line
+    if start and seam_marker is not None:
+        yield seam_marker
+    for line in itertools.islice(layer, 0, start):
+        yield line
+
+
+def scramble_layer_seams(lines, rng=random):
+    """
+    Streams Slic3r g-code with the seam of each layer (where its outline starts and ends) moved to a random move, so
+    that seams don't line up into a ridge up the side of the print.
+
+    Only the G1 moves of each layer are kept, under ';LAYER:n' comments numbered from 1; anything before the first
+    ';LAYER' comment is dropped. Each Z change (made by a G0) is carried on a G1 a random number of moves on. The first
+    move of a layer doesn't extrude, and ';original start of layer: ' marks where a rotated layer used to start.
+
+    lines -- iterable of strings -- The g-code.
+    rng -- random.Random or the random module -- Chooses the seams.
+    """
+    layer_moves = _layer_moves((line.rstrip() for line in lines), rng)
+    rotated = rotate_layers(layer_moves, _is_layer_comment, lambda num_lines: rng.randrange(0, num_lines),
+                            seam_marker=';original start of layer: ')
+    layer_num = 0
+    first_move = False
+    for line in rotated:
+        if _is_layer_comment(line):
+            layer_num += 1
+            first_move = True
+            yield ';LAYER:%d' % layer_num
+        else:
+            if first_move:
+                line = _without_extrusion(line)
+            first_move = False
+            yield line
+
+
+_EXTRUSION_RE = re.compile(r'\s*(?<!\S)E[-+.0-9]*(?=\s|$)')
+
+
+def _without_extrusion(line):
+    """The line with the E parameter taken out of its code, leaving everything else (and any comment) as it was."""
+    comment_start = line.find(';')
+    if comment_start < 0:
+        comment_start = len(line)
+    return _EXTRUSION_RE.sub('', line[:comment_start]) + line[comment_start:]
+
+
+def _is_layer_comment(line):
+    return line.startswith(';LAYER')
+
+
+def _layer_moves(lines, rng):
+    """The ';LAYER' comments and G1 moves, with each G0's Z change carried on a later G1."""
+    new_z = None
+    countdown = -1      # G1 moves left until the new Z is carried on one
+    moves_in_layer = 0
+    moves_in_last_layer = 2
+    in_layers = False
+    for line in lines:
+        if _is_layer_comment(line):
+            if moves_in_layer > 1:
+                moves_in_last_layer = moves_in_layer
+            moves_in_layer = 0
+            in_layers = True
+            yield line
+        elif line.startswith('G1'):
+            moves_in_layer += 1
+            if new_z is None or countdown != 0:
+                countdown -= 1
+            else:
+                line = line + ' ' + new_z
+                new_z = None
+            if in_layers:
+                yield line
+        elif line.startswith('G0') and line.find('Z') > 0:
+            new_z = line[line.index('Z'):]
+            countdown = rng.randrange(1, moves_in_last_layer)
+
+
 class GCodeLayerMixer(object):
+    """
+    Streams g-code lines, stripped, with each layer (the lines between Z moves) rotated to start one line further in
+    than the layer before, so the layers' seams don't line up.
+    """
     def __init__(self, source):
-         self.lines = self._generate(source)
-         self.buffer = [ ]
+        """source -- iterable of g-code lines, such as a file"""
+        self._last_mix_up_index = 1
+        self.lines = rotate_layers((line.rstrip() for line in source), self._is_z_movement, self._next_start)
 
     def __iter__(self):
         return self
 
     def __next__(self):
-        return self.next()
- 
-    def next(self):
-        if len(self.buffer) == 0:
-            self._populate_buffer()
-        head, tail  = self.buffer[0], self.buffer[1:]
-        self.buffer = tail
-
-        return head
-
-    def _generate(self,source):
-        for line in source:
-            yield line
+        return next(self.lines)
 
-    def _populate_buffer(self):
-        layer_data = [ ]
-        complete = False
-
-        try:
-            current = self.lines.next().rstrip()
-        except StopIteration:
-            raise StopIteration
-
-        while not complete and not self._is_z_movement(current):
-            layer_data.append(current)
-            try:
-                current = self.lines.next().rstrip()
-            except StopIteration:
-                complete = True
-
-        mixed_layer = self._mixup(layer_data)
-        if not complete:
-            mixed_layer.append(current)
-        self.buffer = mixed_layer
-
-    _last_mix_up_index = 1
-    def _mixup(self, items):
-        if len(items) < 1:
-            return items
-        if len(items) < self. _last_mix_up_index:
+    next = __next__
+
+    def _next_start(self, num_lines):
+        if num_lines < self._last_mix_up_index:
             self._last_mix_up_index = 0
-        head = items[:self._last_mix_up_index]
-        tail = items[self._last_mix_up_index:]
-        [ tail.append(element) for element in head ]
+        start = self._last_mix_up_index
         self._last_mix_up_index += 1
-        return tail
+        return start
 
-            
     def _is_z_movement(self, gcodeline):
-        return gcodeline.startswith('G') and 'Z' in gcodeline 
-
-
-             
\ No newline at end of file
+        return gcodeline.startswith('G') and 'Z' in gcodeline
@@ -18,210 +18,257 @@ DEBUG_STREAM = False        # If True, will save all wave output to a file for r
 
 # Internal constants
 INPUT_WAVE_RATE = 48000
+INPUT_FRAMES_PER_BUFFER = 256   # Small input buffers so drips are heard (and timestamped) promptly
+OUTPUT_BUFFER_TIME = 0.005      # Seconds of output queued ahead of playback, so loops are left this soon after a drip
 
-import pyaudio
-import time
-try:
-    import queue
-except:
-    import Queue as queue
+import getopt
 import sys
 import wave
 
 import cue_file as cue_file_mod
-from audio.drip_detector import DripDetector, VirtualDripDetector
 from audio.tuning_parameter_file import TuningParameterFileHandler
+from player.checkpoint import Checkpoint, find_resume_cue_index
+from player.cue_player import CuePlayer
 from util.logging import Logging
 
-drip_governor = None
-
-if TRACE:
-    log_level = 'TRACE'
-else:
-    log_level = 'INFO'
-
-log = Logging(level=log_level)
-
-# Parse command line arguments
-if len(sys.argv) == 4:
-    tuning_filename, wave_file_name, cue_file_name = sys.argv[1:]
-elif len(sys.argv) == 5:
-    from util.drip_governor import DripGovernor
-    tuning_filename, wave_file_name, cue_file_name, port = sys.argv[1:]
-    drip_governor = DripGovernor(port)
-    print('importing drip gov')
-else:
-    print("Usage: %s <tuning.dat> <output.wav> <output.cue>" % sys.argv[0])
-    sys.exit(1)
-
-# Loading tuning parameters
-tuning_collection = TuningParameterFileHandler.read_from_file(tuning_filename)
-
-# Open the wave file
-wave_file = wave.open(wave_file_name, 'rb')
-if not wave_file.getnchannels() == 2:
-    log.error("Error: wave file must be in stereo (2 channels)")
-    sys.exit(1)
-if not wave_file.getsampwidth() == 2:
-    log.error("Error: wave file must be 16-bit")
-    sys.exit(1)
-wave_rate = wave_file.getframerate()
-
-# Read the cues from the cue file
-cue_file = cue_file_mod.CueFileReader(open(cue_file_name, 'rt'))
-cues = cue_file.read_cues()
-del cue_file
-
-# Setup the audio interface
-pa = pyaudio.PyAudio()
-outstream = pa.open(format=pa.get_format_from_width(2, unsigned=False),
-                 channels=2,
-                 rate=wave_rate,
-                 output=True,
-                 frames_per_buffer=int(wave_rate/8))
-instream = pa.open(format=pa.get_format_from_width(2, unsigned=False),
-                 channels=1,
-                 rate=INPUT_WAVE_RATE,
-                 input=True,
-                 frames_per_buffer=int(INPUT_WAVE_RATE/8))
-outstream.start_stream()
-instream.start_stream()
-
-# wave_file uses platform-dependent positions, so we can't seek directly to a position unless we first visit it
-# and save our current position
-frame_position_cache = {} # frame_num : wave.tell() platform-dependent position value
-
-if USE_VIRTUAL_DRIP:
-    drip_detector = VirtualDripDetector(INPUT_WAVE_RATE, VIRTUAL_DRIP_RATE)
-else:
-    drip_detector = DripDetector(INPUT_WAVE_RATE, debug=DEBUG)
-
-# Initialize cue/frame state
-current_cue_index = 0
-current_cue = cues[current_cue_index]
-current_frame_num = 0
-frame_position_cache[current_frame_num] = wave_file.tell()
-
-if DEBUG_STREAM:
-    debug_outfile = wave.open('./debug.wav', 'wb')
-    debug_outfile.setnchannels(2)
-    debug_outfile.setframerate(wave_rate)
-    debug_outfile.setsampwidth(2)
-
-## Main loop for recording/playback
-log.info('Playing %d cues...' % len(cues))
-try:
-    while True:
-        # Process audio input
-        buffer_frames_available = instream.get_read_available()
-        if buffer_frames_available:
-            frames = instream.read(buffer_frames_available)
-            drip_detector.add_frames(frames)
-        # Determine output
-        buffer_frames_available = outstream.get_write_available()
-        if not buffer_frames_available:
-            # If no room in buffer, check again later
-            time.sleep(0.01)
-            continue
-        # Fill the buffer, using multiple cues if necessary
-        while buffer_frames_available:
-            # Use as many frames as possible from the current cue, up to the amount of room left
-            cue_frames_available = current_cue.end_frame - current_frame_num
-            num_frames_to_play = min(buffer_frames_available, cue_frames_available)
-            if TRACE:
-                print('cue_frames_available=%d, buffer_frames_available=%d, num_frames_to_play=%d' % (
-                    cue_frames_available, buffer_frames_available, num_frames_to_play
-                ))
-            if num_frames_to_play:
-                frames = wave_file.readframes(num_frames_to_play)
-                current_frame_num += num_frames_to_play
-                if TRACE:
-                    print('read %d frames (%d bytes); current_frame_num=%d' % (
-                        num_frames_to_play, len(frames), current_frame_num
-                    ))
-                outstream.write(frames)
-                if DEBUG_STREAM:
-                    debug_outfile.writeframes(frames)
-            buffer_frames_available -=  num_frames_to_play
-            # If we exhausted this cue, determine which one to use next
-            if current_frame_num == current_cue.end_frame:
-                if TRACE:
-                    print('reached end of current cue')
-                # If we're in a LOOP_UNTIL_HEIGHT cue, see if we should loop or continue onward
-                current_height = float(drip_detector.num_drips) / tuning_collection.drips_per_height
-                if (current_cue.cue_type == cue_file_mod.CueTypes.LOOP_UNTIL_HEIGHT
-                        and current_height < current_cue.until_height):
-                    if TRACE:
-                        print('relooping current cue back to frame %d' % (current_cue.start_frame,))
-                    # Loop back to the start of this cue
-                    current_frame_num = current_cue.start_frame
-                    wave_pos = frame_position_cache[current_frame_num]
-                    wave_file.setpos(wave_pos)
-                    log.info("Waiting for drips")
-                    if drip_governor:
-                        drip_governor.start_dripping()
-                else:
-                    if (current_cue.cue_type == cue_file_mod.CueTypes.LOOP_UNTIL_HEIGHT and current_height > current_cue.until_height):
-                        # log.warning("Dripping Too Fast Current: %s Cue: %s ahead by:  %.2f" % (current_height, current_cue.until_height, (current_height - current_cue.until_height)))
-                        ahead_by_mm = current_height - current_cue.until_height
-                        ahead_by_drips = int(ahead_by_mm * tuning_collection.drips_per_height)
-                        log.warning('Too fast: '+'-' * ahead_by_drips + "> %d drips ahead" % ahead_by_drips)
-                        if drip_governor:
-                            if ahead_by_drips > 10:
-                                drip_governor.stop_dripping()
-                                print('------Stop Dripping!-----')
-                            elif ahead_by_drips < 5:
-                                drip_governor.start_dripping()
-                                print('+++++Start Dripping!+++++')
-                    # Advance to next cue
-                    current_cue_index += 1
-                    if current_cue_index >= len(cues):
-                        # We've reached the end and can now exit
-                        raise StopIteration('Reached end of cue list')
-                    current_cue = cues[current_cue_index]
-                    log.info('Playing cue %d of %d (%2.1f%%)' % (
-                        current_cue_index+1, len(cues), 100.0*float(current_cue_index+1)/float(len(cues))
-                    ))
-                    if DEBUG:
-                        print('Height = %0.3f' % current_height)
-                    # How do we get to the new cue position?
-                    new_frame_num = current_cue.start_frame
-                    if new_frame_num in frame_position_cache:
-                        # Use cached position
-                        wave_pos = frame_position_cache[new_frame_num]
-                        if TRACE:
-                            print('New position in cache; frame_num=%d, wave_pos=%d' % (new_frame_num, wave_pos))
-                        wave_file.setpos(wave_pos)
-                    elif new_frame_num >= current_frame_num:
-                        # Advance by reading and discarding frames
-                        num_frames_to_discard = new_frame_num - current_frame_num
-                        if TRACE:
-                            print('Need to fast-forward to find new position: num_frames_to_discard=%d (%d-%d)' % (
-                                num_frames_to_discard, new_frame_num, current_frame_num
-                            ))
-                        if num_frames_to_discard:
-                            wave_file.readframes(num_frames_to_discard)
-                    else:
-                        if DEBUG:
-                            print('WARNING: Was forced to rewind to seek to frame_num=%d' % new_frame_num)
-                        wave_file.rewind()
-                        wave_file.readframes(new_frame_num)
-                    current_frame_num = new_frame_num
-                    # Save the new start position to the cache (since we're likely to loop back to it)
-                    frame_position_cache[current_frame_num] = wave_file.tell()
-                # NOTE: Don't read and play frames yet; will be handled when loop continues
-except StopIteration:
-    log.info('Finished playing final cue; waiting for playback to complete.')
-finally:
-    # Stop audio interface
-    outstream.stop_stream()
-    instream.stop_stream()
-    outstream.close()
-    instream.close()
-    pa.terminate()
-    if drip_governor:
-        drip_governor.stop_dripping()
-        print('------Stop Dripping!-----')
-        drip_governor.close()
+
+def usage():
+    print("""Usage: %s [options] <tuning.dat> <output.wav> <output.cue> [drip_governor_port]
+       %s [options] --embedded-cues <tuning.dat> <output.wav> [drip_governor_port]
+        --embedded-cues use the cue table embedded in the wave file (gcode_wav_converter -e) instead of a cue file
+        --drip-process  detect drips in a separate process, so drip detection and playback each get their own core
+        --simulate      don't play anything; play the print on a simulated clock as fast as possible and report on
+                        it. Drips are virtual (at VIRTUAL_DRIP_RATE) unless replayed from a recording with
+                        --drip-recording.
+        --drip-recording=<drips.wav>    16-bit mono recording of the drip microphone to replay when simulating
+        --telemetry=<telemetry.jsonl>   write a record for every cue played (see telemetry_summary.py)
+        --flow-control  regulate the drip rate with a PI controller so drips keep pace with the layers; needs
+                        drip_governor_port, unless simulating (with virtual drips)
+        --resume        resume an interrupted print from its checkpoint (<output.cue or output.wav>.checkpoint), starting again
+                        at the beginning of the layer that was being drawn
+        --output-wav=<played.wav>   don't use the sound card; record what would have been played to a wave file,
+                                    as fast as possible on a simulated clock
+        --input-wav=<drips.wav>     don't use the sound card; hear drips from a 16-bit mono recording of the drip
+                                    microphone (at %d Hz) instead, on a simulated clock
+        """ % (sys.argv[0], sys.argv[0], INPUT_WAVE_RATE))
+
+
+def open_drip_input(backend, use_drip_process):
+    """Returns a started drip input, either in this process or in a separate one."""
+    if use_drip_process:
+        from audio.drip_process import DripDetectorProcess
+        drip_input = DripDetectorProcess(INPUT_WAVE_RATE, INPUT_FRAMES_PER_BUFFER,
+                                         virtual_drip_rate=VIRTUAL_DRIP_RATE if USE_VIRTUAL_DRIP else None,
+                                         debug=DEBUG)
+    else:
+        from audio.drip_detector import DripDetector, VirtualDripDetector
+        from audio.drip_input import DripInput
+        if USE_VIRTUAL_DRIP:
+            drip_detector = VirtualDripDetector(INPUT_WAVE_RATE, VIRTUAL_DRIP_RATE)
+        else:
+            drip_detector = DripDetector(INPUT_WAVE_RATE, debug=DEBUG)
+        drip_input = DripInput(backend, drip_detector, INPUT_WAVE_RATE, INPUT_FRAMES_PER_BUFFER)
+    drip_input.start()
+    return drip_input
+
+
+def simulate(wave_file, cues, tuning_collection, drip_recording, use_flow_control):
+    """Simulates the print without any audio and prints a report."""
+    from player.simulator import PrintSimulator, RecordedDripSource, VirtualDripSource
+    if drip_recording:
+        drip_source = RecordedDripSource.from_wave_file(drip_recording)
+        print('Replaying %d drips from %s' % (len(drip_source.drip_times), drip_recording))
+    else:
+        drip_source = VirtualDripSource(VIRTUAL_DRIP_RATE)
+        print('Using virtual drips at %f drips/second' % VIRTUAL_DRIP_RATE)
+    flow_controller = None
+    if use_flow_control:
+        from util.drip_governor import DripRateController
+        flow_controller = DripRateController()
+    simulator = PrintSimulator(wave_file, cues, tuning_collection, drip_source, output_buffer_time=OUTPUT_BUFFER_TIME,
+                               flow_controller=flow_controller)
+    report = simulator.run()
+    print(report.summary())
+
+
+def main():
+    if TRACE:
+        log_level = 'TRACE'
+    else:
+        log_level = 'INFO'
+
+    log = Logging(level=log_level)
+
+    # Parse command line arguments
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'h', ['help', 'drip-process', 'simulate', 'drip-recording=', 'telemetry=', 'resume', 'flow-control', 'embedded-cues', 'output-wav=', 'input-wav='])
+    except getopt.GetoptError as err:
+        print(err)
+        usage()
+        sys.exit(2)
+    use_drip_process = False
+    use_simulation = False
+    drip_recording = None
+    telemetry_filename = None
+    resume = False
+    use_flow_control = False
+    use_embedded_cues = False
+    output_wav = None
+    input_wav = None
+    for opt, arg in opts:
+        if opt == '--drip-process':
+            use_drip_process = True
+        elif opt == '--simulate':
+            use_simulation = True
+        elif opt == '--drip-recording':
+            drip_recording = arg
+        elif opt == '--telemetry':
+            telemetry_filename = arg
+        elif opt == '--resume':
+            resume = True
+        elif opt == '--flow-control':
+            use_flow_control = True
+        elif opt == '--embedded-cues':
+            use_embedded_cues = True
+        elif opt == '--output-wav':
+            output_wav = arg
+        elif opt == '--input-wav':
+            input_wav = arg
+        else:
+            usage()
+            sys.exit(2)
+
+    use_simulated_audio = bool(output_wav or input_wav)
+    if use_simulated_audio and use_drip_process:
+        print('--drip-process needs the sound card; it can\'t be used with --output-wav or --input-wav')
+        usage()
+        sys.exit(2)
+
+    if use_simulation and use_flow_control and drip_recording:
+        print('--flow-control can\'t govern recorded drips; simulate it with virtual drips instead')
+        usage()
+        sys.exit(2)
+
+    drip_governor = None
+    flow_controller = None
+    num_file_args = 2 if use_embedded_cues else 3
+    if len(args) == num_file_args and (use_simulation or not use_flow_control):
+        file_args = args
+    elif len(args) == num_file_args + 1 and not use_simulation:
+        file_args = args[:-1]
+        port = args[-1]
+        if use_flow_control:
+            from util.drip_governor import AsyncDripGovernor, DripRateController
+            drip_governor = AsyncDripGovernor(port)
+            flow_controller = DripRateController()
+        else:
+            from util.drip_governor import DripGovernor
+            drip_governor = DripGovernor(port)
+        print('importing drip gov')
+    else:
+        usage()
+        sys.exit(1)
+    tuning_filename, wave_file_name = file_args[:2]
+    cue_file_name = None if use_embedded_cues else file_args[2]
+
+    # Loading tuning parameters
+    tuning_collection = TuningParameterFileHandler.read_from_file(tuning_filename)
+
+    # Open the wave file
+    wave_file = wave.open(wave_file_name, 'rb')
+    if not wave_file.getnchannels() == 2:
+        log.error("Error: wave file must be in stereo (2 channels)")
+        sys.exit(1)
+    if not wave_file.getsampwidth() == 2:
+        log.error("Error: wave file must be 16-bit")
+        sys.exit(1)
+    wave_rate = wave_file.getframerate()
+
+    if use_embedded_cues:
+        cues = cue_file_mod.read_cue_chunk(wave_file_name)
+        if cues is None:
+            log.error("Error: wave file has no embedded cues")
+            sys.exit(1)
+    else:
+        # Read the cues from the cue file
+        with open(cue_file_name, 'rb') as infile:
+            cues = cue_file_mod.CueFileReader(infile).read_cue_table()
+
+    if use_simulation:
+        simulate(wave_file, cues, tuning_collection, drip_recording, use_flow_control)
+        return
+
+    # Progress is saved at every cue so an interrupted print can be resumed
+    checkpoint = Checkpoint((cue_file_name or wave_file_name) + '.checkpoint')
+    start_cue_index = 0
+    start_num_drips = 0
+    if resume:
+        state = checkpoint.load()
+        if state is None:
+            log.error("Error: can't resume; no checkpoint found at %s" % checkpoint.filename)
+            sys.exit(1)
+        start_cue_index = find_resume_cue_index(cues, state['height'], state['cue_index'])
+        start_num_drips = state['num_drips']
+        if start_cue_index >= len(cues):
+            log.info('Checkpoint is at the end of the print; nothing left to play.')
+            return
+        log.info('Resuming at cue %d of %d (height %0.3f, checkpoint was at cue %d)' % (
+            start_cue_index+1, len(cues), state['height'], state['cue_index']+1))
+
+    # Setup the audio interface
+    if use_simulated_audio:
+        from audio.backends import WaveFileBackend
+        backend = WaveFileBackend(output_filename=output_wav, input_filename=input_wav)
+    else:
+        from audio.backends import PyAudioBackend
+        backend = PyAudioBackend()
+    outstream = backend.open_output(wave_rate, 2, int(wave_rate*OUTPUT_BUFFER_TIME))
+
+    # Drips are heard on a separate input and lined up with the output frames that were playing at the time
+    drip_input = open_drip_input(backend, use_drip_process)
+
+    debug_outfile = None
     if DEBUG_STREAM:
-        debug_outfile.close()
+        debug_outfile = wave.open('./debug.wav', 'wb')
+        debug_outfile.setnchannels(2)
+        debug_outfile.setframerate(wave_rate)
+        debug_outfile.setsampwidth(2)
+
+    telemetry = None
+    if telemetry_filename:
+        from player.telemetry import TelemetryWriter
+        telemetry = TelemetryWriter(open(telemetry_filename, 'w'))
+        telemetry.start()
+
+    player = CuePlayer(wave_file, cues, tuning_collection, outstream, drip_input, log, drip_governor=drip_governor,
+                       debug=DEBUG, trace=TRACE, debug_outfile=debug_outfile, telemetry=telemetry,
+                       checkpoint=checkpoint, start_cue_index=start_cue_index, start_num_drips=start_num_drips,
+                       flow_controller=flow_controller)
+    try:
+        player.play()
+        checkpoint.clear()
+    finally:
+        # Stop audio interface
+        outstream.stop_stream()
+        drip_input.stop()
+        outstream.close()
+        backend.terminate()
+        if player.output_underruns:
+            log.warning('Output ran dry %d times during playback; try a longer OUTPUT_BUFFER_TIME' %
+                        player.output_underruns)
+        if drip_input.overflows:
+            log.warning('Drip input overflowed %d times; some drips may have been missed' % drip_input.overflows)
+        if drip_governor:
+            drip_governor.stop_dripping()
+            print('------Stop Dripping!-----')
+            drip_governor.close()
+        if debug_outfile:
+            debug_outfile.close()
+        if telemetry:
+            telemetry.stop()
+            if telemetry.dropped:
+                log.warning('Dropped %d telemetry records' % telemetry.dropped)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import unittest
+import os
+import sys
+import time
+import numpy
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+
+from audio.audio_server import AudioServer
+from audio.backends import NullBackend
+
+
+class ConstantGenerator(object):
+    def __init__(self, value):
+        self.value = value
+
+    def nextN(self, n):
+        return numpy.tile(self.value, (n, 1))
+
+
+class FailingGenerator(object):
+    def nextN(self, n):
+        raise ValueError('Broken generator')
+
+
+class RecordingCallback(object):
+    """Sits between the backend and the server's callback and keeps everything the server played."""
+    def __init__(self, callback):
+        self.callback = callback
+        self.frames = b''
+
+    def __call__(self, in_data, frame_count, time_info, status_flags):
+        frames, flag = self.callback(in_data, frame_count, time_info, status_flags)
+        self.frames += frames
+        return (frames, flag)
+
+
+class AudioServerTests(unittest.TestCase):
+    def start_server(self, generator, latency=0.0, **kwargs):
+        self.backend = NullBackend(latency=latency)
+        self.server = AudioServer(generator, 1000, buffer_time=0.1, chunk_time=0.01, frames_per_buffer=10,
+                                  backend=self.backend, **kwargs)
+        self.recording = RecordingCallback(self.server._callback)
+        self.server._callback = self.recording
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.backend.terminate()
+
+    def wait_for(self, condition):
+        end_time = time.time() + 5.0
+        while not condition() and time.time() < end_time:
+            time.sleep(0.001)
+        self.assertTrue(condition())
+
+    def test_should_fill_ring_buffer_ahead_of_playback(self):
+        self.start_server(ConstantGenerator([0.5, -0.5]))
+
+        self.wait_for(lambda: self.server.buffered_time >= 0.1)
+
+    def test_should_play_generated_frames(self):
+        self.start_server(ConstantGenerator([0.5, -2.0]))
+        self.wait_for(lambda: self.server.buffered_time >= 0.1)
+
+        for _ in range(5):
+            self.backend.advance(0.05)
+            self.wait_for(lambda: self.server.buffered_time >= 0.1)
+
+        self.assertEqual(250 * 4, len(self.recording.frames))
+        self.assertEqual(numpy.array([16384, -32767], dtype='<i2').tobytes() * 250, self.recording.frames)
+        self.assertEqual(0, self.server.underruns)
+
+    def test_should_play_silence_and_back_off_when_generator_fails(self):
+        self.start_server(FailingGenerator())
+        self.wait_for(lambda: self.server.generator_errors >= 2)
+
+        self.backend.advance(0.05)
+
+        self.assertEqual(b'\x00' * 200, self.recording.frames)
+        self.assertEqual(5, self.server.underruns)
+        time.sleep(0.05)
+        self.assertTrue(self.server.generator_errors < 10)
+
+    def test_should_not_refill_until_low_watermark(self):
+        self.start_server(ConstantGenerator([0.5, -0.5]), low_water_time=0.05)
+        self.wait_for(lambda: self.server.buffered_time >= 0.1)
+
+        self.backend.advance(0.04)
+        time.sleep(0.05)
+        self.assertAlmostEqual(0.06, self.server.buffered_time)
+
+        self.backend.advance(0.01)
+        self.wait_for(lambda: self.server.buffered_time >= 0.1)
+
+    def test_should_measure_latency_of_parameter_change(self):
+        self.start_server(ConstantGenerator([0.5, -0.5]), latency=0.01)
+        self.wait_for(lambda: self.server.buffered_time >= 0.1)
+
+        self.server.parameter_changed()
+        self.backend.advance(0.05)
+        self.wait_for(lambda: self.server.buffered_time >= 0.1)
+        self.assertEqual(None, self.server.change_latency)
+        self.backend.advance(0.06)
+
+        # Everything already rendered plays first, then the device's latency
+        self.assertAlmostEqual(0.11, self.server.change_latency)
+
+    def play_topped_up(self, seconds, num_times):
+        for _ in range(num_times):
+            self.wait_for(lambda: self.server.ring_buffer.available + self.server.chunk_frames > self.server.depth_frames)
+            self.backend.advance(seconds)
+
+    def test_adaptive_depth_should_shrink_until_underruns(self):
+        self.start_server(ConstantGenerator([0.5, -0.5]), adaptive=True, min_buffer_time=0.02)
+        self.server.ADAPT_PERIOD = 0.1
+
+        self.play_topped_up(0.01, 100)
+        self.assertEqual(20, self.server.depth_frames)
+        self.assertEqual(0, self.server.underruns)
+
+        # A stall longer than the depth underruns, so the depth grows and never shrinks back that far
+        self.play_topped_up(0.03, 1)
+        self.wait_for(lambda: self.server.depth_frames > 20)
+        self.play_topped_up(0.01, 100)
+        self.assertEqual(25, self.server.depth_frames)
+        self.assertEqual(1, self.server.underruns)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+import unittest
+import os
+import sys
+import struct
+import tempfile
+import shutil
+import wave
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+
+from audio import backends
+from audio.backends import NullBackend, WaveFileBackend
+
+
+def stereo_frames(first, count):
+    return b''.join(struct.pack('<hh', i, -i) for i in range(first, first + count))
+
+
+class NullBackendTests(unittest.TestCase):
+    def test_blocking_write_should_wait_for_room_in_buffer(self):
+        backend = NullBackend()
+        stream = backend.open_output(1000, 2, 100)
+
+        stream.write(stereo_frames(0, 100))
+        self.assertEqual(0.0, stream.get_time())
+        stream.write(stereo_frames(100, 50))
+
+        self.assertAlmostEqual(0.05, stream.get_time())
+        self.assertEqual(50, stream.get_write_available())
+
+    def test_polling_full_buffer_should_wait_for_half_of_it(self):
+        backend = NullBackend()
+        stream = backend.open_output(1000, 2, 100)
+        stream.write(stereo_frames(0, 100))
+
+        self.assertEqual(50, stream.get_write_available())
+        self.assertAlmostEqual(0.05, stream.get_time())
+
+    def test_should_count_underflows_once_per_gap(self):
+        backend = NullBackend()
+        stream = backend.open_output(1000, 2, 100)
+        stream.write(stereo_frames(0, 50))
+
+        backend.advance(0.1)
+        backend.advance(0.1)
+        stream.write(stereo_frames(0, 50))
+        backend.advance(0.1)
+
+        self.assertEqual(2, stream.underflows)
+
+    def test_should_call_output_callback_once_per_buffer(self):
+        backend = NullBackend(latency=0.01)
+        calls = []
+        def callback(in_data, frame_count, time_info, status_flags):
+            calls.append((frame_count, time_info['output_buffer_dac_time']))
+            return (stereo_frames(0, frame_count), backends.paContinue)
+        backend.open_output(1000, 2, 10, callback=callback)
+
+        backend.advance(0.035)
+
+        self.assertEqual([10, 10, 10], [frame_count for frame_count, _ in calls])
+        self.assertAlmostEqual(0.03, calls[-1][1])
+
+    def test_should_stop_calling_callback_when_complete(self):
+        backend = NullBackend()
+        calls = []
+        def callback(in_data, frame_count, time_info, status_flags):
+            calls.append(frame_count)
+            return (b'', backends.paComplete)
+        stream = backend.open_output(1000, 2, 10, callback=callback)
+
+        backend.advance(0.1)
+
+        self.assertEqual(1, len(calls))
+        self.assertFalse(stream.is_active())
+
+    def test_should_not_run_streams_until_started(self):
+        backend = NullBackend()
+        calls = []
+        def callback(in_data, frame_count, time_info, status_flags):
+            calls.append(frame_count)
+            return (None, backends.paContinue)
+        stream = backend.open_input(1000, 1, 10, callback=callback, start=False)
+        backend.advance(0.1)
+        self.assertEqual([], calls)
+
+        stream.start_stream()
+        backend.advance(0.1)
+
+        self.assertEqual(10, len(calls))
+
+    def test_silent_input_should_read_zeros(self):
+        backend = NullBackend()
+        stream = backend.open_input(1000, 1, 10)
+
+        self.assertEqual(b'\x00' * 50, stream.read(25))
+        self.assertAlmostEqual(0.025, stream.get_time())
+
+    def test_input_should_overflow_when_not_read(self):
+        backend = NullBackend()
+        stream = backend.open_input(1000, 1, 10)
+
+        backend.advance(0.05)
+
+        self.assertEqual(1, stream.overflows)
+        self.assertEqual(10, stream.get_read_available())
+
+    def test_realtime_clock_should_follow_wall_clock(self):
+        backend = NullBackend(realtime=True)
+        calls = []
+        def callback(in_data, frame_count, time_info, status_flags):
+            calls.append(frame_count)
+            return (None, backends.paContinue)
+        backend.open_input(1000, 1, 10, callback=callback)
+
+        stream = backend.open_output(1000, 2, 10)
+        stream.write(stereo_frames(0, 60))
+        backend.terminate()
+
+        self.assertTrue(backend.get_time() >= 0.05)
+        self.assertTrue(len(calls) >= 5)
+
+
+class WaveFileBackendTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='unittest')
+        self.wave_filename = os.path.join(self.tmp_dir, 'test.wav')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_mono_wave(self, num_frames, rate=1000):
+        wave_file = wave.open(self.wave_filename, 'wb')
+        wave_file.setnchannels(1)
+        wave_file.setsampwidth(2)
+        wave_file.setframerate(rate)
+        wave_file.writeframes(b''.join(struct.pack('<h', i) for i in range(num_frames)))
+        wave_file.close()
+
+    def test_should_record_output_played(self):
+        backend = WaveFileBackend(output_filename=self.wave_filename)
+        stream = backend.open_output(1000, 2, 100)
+
+        stream.write(stereo_frames(0, 250))
+        stream.stop_stream()
+        stream.close()
+
+        wave_file = wave.open(self.wave_filename, 'rb')
+        self.assertEqual((2, 1000), (wave_file.getnchannels(), wave_file.getframerate()))
+        self.assertEqual(stereo_frames(0, 250), wave_file.readframes(1000))
+        wave_file.close()
+        self.assertAlmostEqual(0.25, backend.get_time())
+
+    def test_should_record_silence_of_underflows(self):
+        backend = WaveFileBackend(output_filename=self.wave_filename)
+        stream = backend.open_output(1000, 2, 100)
+
+        stream.write(stereo_frames(1, 10))
+        backend.advance(0.02)
+        stream.write(stereo_frames(1, 10))
+        stream.stop_stream()
+        backend.terminate()
+
+        wave_file = wave.open(self.wave_filename, 'rb')
+        self.assertEqual(stereo_frames(1, 10) + b'\x00' * 40 + stereo_frames(1, 10), wave_file.readframes(1000))
+        wave_file.close()
+
+    def test_should_read_input_and_stop_at_end(self):
+        self.write_mono_wave(25)
+        backend = WaveFileBackend(input_filename=self.wave_filename)
+        stream = backend.open_input(1000, 1, 10)
+
+        frames = stream.read(100)
+
+        self.assertEqual(50, len(frames))
+        self.assertEqual(struct.pack('<h', 24), frames[-2:])
+        self.assertFalse(stream.is_active())
+        backend.terminate()
+
+    def test_should_stamp_input_callbacks_with_capture_time(self):
+        self.write_mono_wave(25)
+        backend = WaveFileBackend(input_filename=self.wave_filename)
+        buffers = []
+        def callback(in_data, frame_count, time_info, status_flags):
+            buffers.append((struct.unpack_from('<h', in_data)[0], frame_count, time_info['input_buffer_adc_time']))
+            return (None, backends.paContinue)
+        backend.open_input(1000, 1, 10, callback=callback)
+
+        backend.advance(1.0)
+        backend.terminate()
+
+        self.assertEqual([0, 10, 20], [first_value for first_value, _, _ in buffers])
+        self.assertEqual([10, 10, 5], [frame_count for _, frame_count, _ in buffers])
+        self.assertAlmostEqual(0.02, buffers[-1][2])
+
+    def test_should_reject_input_of_wrong_rate(self):
+        self.write_mono_wave(25, rate=2000)
+        backend = WaveFileBackend(input_filename=self.wave_filename)
+
+        with self.assertRaises(ValueError):
+            backend.open_input(1000, 1, 10)
+
+if __name__ == '__main__':
+    unittest.main()
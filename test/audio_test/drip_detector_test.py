@@ -0,0 +1,87 @@
+import unittest
+import sys
+import os
+import wave
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+from audio.drip_detector import DripDetector, VirtualDripDetector
+from audio.util import MONO_WAVE_STRUCT, MAX_S16
+
+
+class DripDetectorTests(unittest.TestCase):
+    test_file_path = os.path.join(os.path.dirname(__file__), '..', 'test_data')
+
+    def _read_wave(self, filename):
+        wave_file = wave.open(os.path.join(self.test_file_path, filename), 'rb')
+        try:
+            return wave_file.getframerate(), wave_file.readframes(wave_file.getnframes())
+        finally:
+            wave_file.close()
+
+    def test_should_count_drips(self):
+        wave_rate, frames = self._read_wave('14_drips.wav')
+        drip_detector = DripDetector(wave_rate)
+
+        drip_detector.add_frames(frames)
+
+        self.assertEqual(14, drip_detector.num_drips)
+
+    def test_should_return_frame_index_of_each_drip(self):
+        wave_rate, frames = self._read_wave('14_drips.wav')
+        drip_detector = DripDetector(wave_rate)
+
+        drip_frame_indices = drip_detector.add_frames(frames)
+
+        self.assertEqual(14, len(drip_frame_indices))
+        self.assertEqual(sorted(drip_frame_indices), drip_frame_indices)
+
+    def test_should_return_frame_drip_started_at(self):
+        drip_detector = DripDetector(1000)
+        frames = b''.join(MONO_WAVE_STRUCT.pack(value) for value in [0] * 100 + [int(MAX_S16)] * 50)
+
+        self.assertEqual([100], drip_detector.add_frames(frames))
+
+    def test_should_return_negative_index_for_drip_started_in_earlier_frames(self):
+        drip_detector = DripDetector(1000)
+        frames = b''.join(MONO_WAVE_STRUCT.pack(value) for value in [0] * 100 + [int(MAX_S16)] * 50)
+
+        self.assertEqual([], drip_detector.add_frames(frames[:105 * MONO_WAVE_STRUCT.size]))
+        self.assertEqual([-5], drip_detector.add_frames(frames[105 * MONO_WAVE_STRUCT.size:]))
+
+    def test_should_return_same_drip_frames_regardless_of_buffer_size(self):
+        wave_rate, frames = self._read_wave('14_drips.wav')
+        whole_drip_detector = DripDetector(wave_rate)
+        chunked_drip_detector = DripDetector(wave_rate)
+        chunk_size = 256 * MONO_WAVE_STRUCT.size
+
+        expected = whole_drip_detector.add_frames(frames)
+        actual = []
+        for offset in range(0, len(frames), chunk_size):
+            chunk_frame_indices = chunked_drip_detector.add_frames(frames[offset:offset+chunk_size])
+            actual += [offset // MONO_WAVE_STRUCT.size + index for index in chunk_frame_indices]
+
+        self.assertEqual(expected, actual)
+
+
+class VirtualDripDetectorTests(unittest.TestCase):
+
+    def test_should_return_frame_index_of_each_drip(self):
+        drip_detector = VirtualDripDetector(100, 10.0)
+
+        drip_frame_indices = drip_detector.add_frames(b'\0\0' * 25)
+
+        self.assertEqual(2, drip_detector.num_drips)
+        self.assertEqual([9, 19], drip_frame_indices)
+
+    def test_should_carry_partial_drips_between_buffers(self):
+        drip_detector = VirtualDripDetector(100, 10.0)
+        drip_detector.add_frames(b'\0\0' * 25)
+
+        drip_frame_indices = drip_detector.add_frames(b'\0\0' * 10)
+
+        self.assertEqual(3, drip_detector.num_drips)
+        self.assertEqual([4], drip_frame_indices)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+
+from audio.backends import WaveFileBackend
+from audio.drip_detector import DripDetector
+from audio.drip_input import DripInput
+
+
+class DripInputTests(unittest.TestCase):
+    test_file_path = os.path.join(os.path.dirname(__file__), '..', 'test_data')
+
+    def test_should_publish_drips_heard_with_their_times(self):
+        backend = WaveFileBackend(input_filename=os.path.join(self.test_file_path, '14_drips.wav'))
+        drip_input = DripInput(backend, DripDetector(44100), 44100)
+        drip_input.start()
+
+        backend.advance(1.0)
+        first_drip_events = drip_input.new_drip_events()
+        backend.advance(9.0)
+        drip_events = first_drip_events + drip_input.new_drip_events()
+        drip_input.stop()
+        backend.terminate()
+
+        self.assertTrue(0 < len(first_drip_events) < 14)
+        self.assertEqual(list(range(1, 15)), [drip_event.num_drips for drip_event in drip_events])
+        drip_times = [drip_event.stream_time for drip_event in drip_events]
+        self.assertEqual(sorted(drip_times), drip_times)
+        self.assertTrue(drip_times[0] < 1.0)
+        self.assertTrue(drip_times[-1] < 160256 / 44100.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import os
+import sys
+import time
+import functools
+import tempfile
+import shutil
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+
+from audio.backends import NullBackend, WaveFileBackend
+from audio.drip_process import DripDetectorProcess
+
+
+class DripDetectorProcessTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='unittest')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_should_publish_drips_detected_in_child(self):
+        drip_process = DripDetectorProcess(1000, 10, virtual_drip_rate=100.0,
+                                           open_backend=functools.partial(NullBackend, realtime=True))
+        drip_process.start()
+        try:
+            time.sleep(0.2)
+            drip_events = drip_process.new_drip_events()
+        finally:
+            drip_process.stop()
+
+        self.assertTrue(len(drip_events) > 0)
+        self.assertEqual(list(range(1, len(drip_events) + 1)), [drip_event.num_drips for drip_event in drip_events])
+
+    def test_start_should_fail_when_child_cannot_open_input(self):
+        open_backend = functools.partial(WaveFileBackend, input_filename=os.path.join(self.tmp_dir, 'missing.wav'))
+        drip_process = DripDetectorProcess(1000, 10, open_backend=open_backend)
+
+        with self.assertRaises(RuntimeError):
+            drip_process.start()
+        self.assertFalse(drip_process.is_alive())
+        self.assertNotEqual(0, drip_process.exitcode)
+
+if __name__ == '__main__':
+    unittest.main()
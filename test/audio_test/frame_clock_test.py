@@ -0,0 +1,39 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+from audio.frame_clock import OutputFrameClock
+
+
+class OutputFrameClockTests(unittest.TestCase):
+
+    def test_should_report_frame_0_before_first_update(self):
+        clock = OutputFrameClock(1000)
+
+        self.assertEqual(0, clock.frame_at(12.0))
+
+    def test_should_not_count_queued_frames_as_played(self):
+        clock = OutputFrameClock(1000)
+
+        clock.update(10.0, 500, 200)
+
+        self.assertEqual(300, clock.frame_at(10.0))
+
+    def test_should_advance_with_stream_time(self):
+        clock = OutputFrameClock(1000)
+        clock.update(10.0, 500, 200)
+
+        self.assertEqual(350, clock.frame_at(10.05))
+        self.assertEqual(250, clock.frame_at(9.95))
+
+    def test_should_account_for_output_latency(self):
+        clock = OutputFrameClock(1000, output_latency=0.1)
+
+        clock.update(10.0, 500, 200)
+
+        self.assertEqual(200, clock.frame_at(10.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
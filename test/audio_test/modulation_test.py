@@ -4,7 +4,7 @@ import sys
 import os
 
 sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', 'src', ))
-from audio.modulation import AmplitudeModulator
+from audio.modulation import AmplitudeModulator, DirectConnectionModulator
 
 
 class AmplitudeModulatorTests(unittest.TestCase):
@@ -94,4 +94,30 @@ class AmplitudeModulatorTests(unittest.TestCase):
 
         # self.assertTrue(numpy.allclose(expected_results,actual_results), "was %s expected %s" % (actual_results, expected_results))
 
-        
+
+class LoopPeriodTests(unittest.TestCase):
+
+    def test_am_loop_period_should_be_one_carrier_cycle_when_carrier_divides_sampling_rate(self):
+        amplitudeModulator = AmplitudeModulator(48000)
+        self.assertEqual(24, amplitudeModulator.loop_period)
+        amplitudeModulator.laser_enabled = True
+        self.assertEqual(6, amplitudeModulator.loop_period)
+
+    def test_am_loop_period_should_be_waveform_period_when_carrier_does_not_divide_sampling_rate(self):
+        amplitudeModulator = AmplitudeModulator(44100)
+        self.assertEqual(amplitudeModulator.waveform_period, amplitudeModulator.loop_period)
+
+    def test_am_loop_period_should_repeat_seamlessly(self):
+        amplitudeModulator = AmplitudeModulator(48000)
+        loop_period = amplitudeModulator.loop_period
+        values = amplitudeModulator.modulate_values(numpy.zeros((loop_period * 2, 2)))
+        self.assertTrue(numpy.allclose(values[:loop_period], values[loop_period:]))
+
+    def test_dc_loop_period_should_be_one_sample_when_laser_disabled(self):
+        directConnectionModulator = DirectConnectionModulator(48000)
+        self.assertEqual(1, directConnectionModulator.loop_period)
+
+    def test_dc_loop_period_should_be_one_side_tone_cycle_when_side_tone_divides_sampling_rate(self):
+        directConnectionModulator = DirectConnectionModulator(44100)
+        directConnectionModulator.laser_enabled = True
+        self.assertEqual(4, directConnectionModulator.loop_period)
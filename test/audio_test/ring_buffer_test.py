@@ -0,0 +1,65 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+
+from audio.ring_buffer import RingBuffer
+
+
+class RingBufferTests(unittest.TestCase):
+    def frames(self, first, count):
+        return b''.join(bytes(bytearray([i % 256] * 4)) for i in range(first, first + count))
+
+    def test_should_read_frames_in_order_written(self):
+        ring_buffer = RingBuffer(10)
+
+        self.assertEqual(3, ring_buffer.write(self.frames(0, 3)))
+        self.assertEqual(2, ring_buffer.write(self.frames(3, 2)))
+
+        self.assertEqual(self.frames(0, 5), ring_buffer.read(5))
+        self.assertEqual(0, ring_buffer.available)
+
+    def test_should_only_write_frames_that_fit(self):
+        ring_buffer = RingBuffer(4)
+
+        self.assertEqual(4, ring_buffer.write(self.frames(0, 6)))
+
+        self.assertEqual(0, ring_buffer.free)
+        self.assertEqual(0, ring_buffer.write(self.frames(6, 1)))
+        self.assertEqual(self.frames(0, 4), ring_buffer.read(10))
+
+    def test_should_return_short_read_when_not_enough_frames(self):
+        ring_buffer = RingBuffer(4)
+        ring_buffer.write(self.frames(0, 1))
+
+        self.assertEqual(self.frames(0, 1), ring_buffer.read(3))
+        self.assertEqual(b'', ring_buffer.read(3))
+
+    def test_should_wrap_around(self):
+        ring_buffer = RingBuffer(5)
+        ring_buffer.write(self.frames(0, 4))
+        ring_buffer.read(3)
+
+        self.assertEqual(4, ring_buffer.write(self.frames(4, 4)))
+
+        self.assertEqual(5, ring_buffer.available)
+        self.assertEqual(self.frames(3, 5), ring_buffer.read(5))
+
+    def test_should_ignore_partial_frames(self):
+        ring_buffer = RingBuffer(4)
+
+        self.assertEqual(1, ring_buffer.write(self.frames(0, 2)[:6]))
+        self.assertEqual(self.frames(0, 1), ring_buffer.read(4))
+
+    def test_clear_should_discard_frames(self):
+        ring_buffer = RingBuffer(4)
+        ring_buffer.write(self.frames(0, 3))
+
+        ring_buffer.clear()
+
+        self.assertEqual(4, ring_buffer.free)
+        self.assertEqual(b'', ring_buffer.read(1))
+
+if __name__ == '__main__':
+    unittest.main()
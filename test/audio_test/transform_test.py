@@ -0,0 +1,51 @@
+import unittest
+import numpy
+import sys
+import os
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+from audio.transform import PositionToAudioTransformer
+from audio.tuning_parameters import TuningParameterCollection
+
+
+def make_tuning_collection(**parameters):
+    tuning_collection = TuningParameterCollection()
+    tuning_collection.build_x_min = tuning_collection.build_y_min = -50.0
+    tuning_collection.build_x_max = tuning_collection.build_y_max = 50.0
+    tuning_parameters = tuning_collection.get_tuning_parameters_for_height(0.0)
+    for name, value in parameters.items():
+        setattr(tuning_parameters, name, value)
+    tuning_collection.tuning_parameters.append(tuning_parameters)
+    tuning_collection.reset_cache()
+    return tuning_collection
+
+
+class SegmentExtentsTests(unittest.TestCase):
+    def rendered_extents(self, transformer, starts, ends):
+        fractions = numpy.linspace(0.0, 1.0, 2001)[:, numpy.newaxis]
+        extents = []
+        for start, end in zip(starts, ends):
+            points = numpy.column_stack((start + fractions * (end - start), numpy.zeros(len(fractions))))
+            extents.append(numpy.abs(transformer.transform_points(points)).max())
+        return numpy.array(extents)
+
+    def test_should_match_extents_of_rendered_moves(self):
+        transformer = PositionToAudioTransformer(make_tuning_collection(
+            rotation=20.0, x_shear=0.1, y_shear=-0.05, x_trapezoid=0.8, y_trapezoid=-0.5, x_offset=0.1))
+        random = numpy.random.RandomState(1)
+        starts = random.uniform(-60.0, 60.0, (200, 2))
+        ends = random.uniform(-60.0, 60.0, (200, 2))
+
+        extents = transformer.segment_extents(starts, ends, 0.0)
+
+        # Sampling can only find less than the true extent, and only slightly less
+        rendered = self.rendered_extents(transformer, starts, ends)
+        self.assertTrue(numpy.all(rendered <= extents + 1e-12))
+        self.assertTrue(numpy.all(extents - rendered < 1e-5))
+        # Some only reach their extent part way along
+        end_extents = numpy.maximum(self.rendered_extents(transformer, starts, starts),
+                                    self.rendered_extents(transformer, ends, ends))
+        self.assertTrue(numpy.any(extents > end_extents + 0.01))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+from audio.modulation import AmplitudeModulator
+from audio.transform import PositionToAudioTransformer
+from audio.tuning_parameters import TuningParameterCollection
+from calibrate.shape_generators import SquareGenerator
+from calibrate.plane_2d_to_3d_adapter import Plane2dTo3dAdapter
+from calibrate.transformer_proxy import PositionToAudioTransformerProxy
+from calibrate.modulator_proxy import ModulatorProxy
+from calibrate.render_pipeline import RenderPipeline
+from calibrate.loop_cache import LoopCache
+
+
+class CountingPipeline(object):
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.frames_rendered = 0
+
+    @property
+    def loop_period(self):
+        return self.pipeline.loop_period
+
+    def skip(self, n):
+        self.pipeline.skip(n)
+
+    def render_frames(self, n):
+        self.frames_rendered += n
+        return self.pipeline.render_frames(n)
+
+
+class LoopCacheTests(unittest.TestCase):
+    SAMPLING_RATE = 48000
+    BLOCK = 480
+
+    def make_pipeline(self):
+        self.generator = SquareGenerator(self.SAMPLING_RATE, 4000.0, 40.0, (0.0, 0.0))
+        tuning_collection = TuningParameterCollection()
+        tuning_collection.tuning_parameters.append(tuning_collection.get_tuning_parameters_for_height(0.0))
+        transformer_proxy = PositionToAudioTransformerProxy(PositionToAudioTransformer(tuning_collection),
+                                                            Plane2dTo3dAdapter(self.generator, 0.0))
+        modulator = AmplitudeModulator(self.SAMPLING_RATE)
+        modulator.laser_enabled = True
+        return RenderPipeline(ModulatorProxy(modulator, transformer_proxy))
+
+    def setUp(self):
+        self.expected_pipeline = self.make_pipeline()
+        self.expected_generator = self.generator
+        self.counting_pipeline = CountingPipeline(self.make_pipeline())
+        self.cache = LoopCache(self.counting_pipeline, self.SAMPLING_RATE)
+
+    def assert_plays_same_as_pipeline(self, blocks):
+        for block in range(blocks):
+            self.assertEqual(self.expected_pipeline.render_frames(self.BLOCK), self.cache.render_frames(self.BLOCK))
+
+    def test_should_play_same_frames_as_pipeline(self):
+        self.assert_plays_same_as_pipeline(20)
+
+    def test_should_stop_rendering_once_pattern_is_recorded(self):
+        self.assert_plays_same_as_pipeline(10)
+        frames_rendered = self.counting_pipeline.frames_rendered
+
+        self.assert_plays_same_as_pipeline(10)
+
+        self.assertTrue(self.cache.looping)
+        self.assertEqual(frames_rendered, self.counting_pipeline.frames_rendered)
+
+    def test_should_resume_drawing_where_playback_is_when_parameters_change(self):
+        self.assert_plays_same_as_pipeline(20)
+
+        self.expected_generator.size = 30.0
+        self.generator.size = 30.0
+        self.cache.parameter_changed()
+
+        self.assert_plays_same_as_pipeline(20)
+        self.assertTrue(self.cache.looping)
+
+    def test_should_notice_generator_changes_without_being_told(self):
+        self.assert_plays_same_as_pipeline(20)
+
+        self.expected_generator.speed = 3000.0
+        self.generator.speed = 3000.0
+
+        self.assert_plays_same_as_pipeline(20)
+
+    def test_should_not_record_patterns_that_take_too_long_to_repeat(self):
+        self.cache = LoopCache(self.counting_pipeline, self.SAMPLING_RATE, max_loop_time=0.001)
+
+        self.assert_plays_same_as_pipeline(20)
+
+        self.assertFalse(self.cache.looping)
+        self.assertEqual(20 * self.BLOCK, self.counting_pipeline.frames_rendered)
+
+if __name__ == '__main__':
+    unittest.main()
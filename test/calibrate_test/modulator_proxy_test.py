@@ -0,0 +1,53 @@
+import unittest
+import sys
+import os
+import numpy
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+from calibrate.modulator_proxy import ModulatorProxy
+
+
+class FakeModulator(object):
+    def __init__(self, scale):
+        self.scale = scale
+        self.laser_enabled = False
+        self.laser_changes = []
+
+    def modulate_values(self, values):
+        self.laser_changes.append(self.laser_enabled)
+        return values * self.scale
+
+
+class FakeGenerator(object):
+    def nextN(self, n):
+        return numpy.ones((n, 2))
+
+
+class ModulatorProxyTests(unittest.TestCase):
+    def test_should_modulate_generated_values(self):
+        proxy = ModulatorProxy(FakeModulator(0.5), FakeGenerator())
+
+        self.assertEqual([[0.5, 0.5]] * 2, proxy.nextN(2).tolist())
+
+    def test_should_use_modulator_published_for_next_block(self):
+        proxy = ModulatorProxy(FakeModulator(0.5), FakeGenerator())
+        modulator = FakeModulator(0.25)
+        modulator.laser_enabled = True
+
+        proxy.modulator = modulator
+
+        self.assertEqual([[0.25, 0.25]], proxy.nextN(1).tolist())
+        self.assertTrue(proxy.laser_enabled)
+
+    def test_should_leave_laser_change_to_audio_thread(self):
+        modulator = FakeModulator(0.5)
+        proxy = ModulatorProxy(modulator, FakeGenerator())
+
+        proxy.laser_enabled = True
+
+        self.assertFalse(modulator.laser_enabled)
+        proxy.nextN(1)
+        self.assertEqual([True], modulator.laser_changes)
+
+if __name__ == '__main__':
+    unittest.main()
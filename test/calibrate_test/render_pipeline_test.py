@@ -0,0 +1,74 @@
+import unittest
+import sys
+import os
+import numpy
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+from audio import util as audio_util
+from audio.modulation import AmplitudeModulator, DirectConnectionModulator
+from audio.transform import PositionToAudioTransformer
+from audio.tuning_parameters import TuningParameterCollection
+from calibrate.shape_generators import StarGenerator, NullGenerator
+from calibrate.plane_2d_to_3d_adapter import Plane2dTo3dAdapter
+from calibrate.transformer_proxy import PositionToAudioTransformerProxy
+from calibrate.modulator_proxy import ModulatorProxy
+from calibrate.render_pipeline import RenderPipeline
+
+
+def make_chain(generator, modulator):
+    tuning_collection = TuningParameterCollection()
+    tuning_parameters = tuning_collection.get_tuning_parameters_for_height(0.0)
+    tuning_parameters.rotation = 10.0
+    tuning_parameters.x_trapezoid = 0.1
+    tuning_collection.tuning_parameters.append(tuning_parameters)
+    height_adapter = Plane2dTo3dAdapter(generator, 0.0)
+    transformer_proxy = PositionToAudioTransformerProxy(PositionToAudioTransformer(tuning_collection), height_adapter)
+    return ModulatorProxy(modulator, transformer_proxy)
+
+
+class RenderPipelineTests(unittest.TestCase):
+    def render_unfused(self, chain, n):
+        values = audio_util.clip_values(chain.nextN(n))
+        return audio_util.convert_values_to_frames(values)
+
+    def assert_renders_same_as_unfused(self, make_generator, make_modulator, block_sizes):
+        unfused = make_chain(make_generator(), make_modulator())
+        pipeline = RenderPipeline(make_chain(make_generator(), make_modulator()))
+        for n in block_sizes:
+            self.assertEqual(self.render_unfused(unfused, n), pipeline.render_frames(n))
+
+    def test_should_render_same_frames_as_unfused_chain_with_am(self):
+        self.assert_renders_same_as_unfused(lambda: StarGenerator(48000, 2000.0, 80.0, [0.0, 0.0]),
+                                            lambda: AmplitudeModulator(48000), [480] * 5 + [100, 1000])
+
+    def test_should_render_same_frames_as_unfused_chain_with_dc(self):
+        def make_modulator():
+            modulator = DirectConnectionModulator(44100)
+            modulator.laser_enabled = True
+            return modulator
+        self.assert_renders_same_as_unfused(lambda: StarGenerator(44100, 5000.0, 60.0, [10.0, -10.0]),
+                                            make_modulator, [441] * 5)
+
+    def test_should_render_same_frames_as_unfused_chain_from_null_generator(self):
+        self.assert_renders_same_as_unfused(lambda: NullGenerator(48000, 20.0, 1.0, [25.0, -25.0]),
+                                            lambda: AmplitudeModulator(48000), [480] * 2)
+
+    def test_should_reuse_buffers_between_blocks_of_same_size(self):
+        pipeline = RenderPipeline(make_chain(StarGenerator(48000, 2000.0, 80.0, [0.0, 0.0]), AmplitudeModulator(48000)))
+
+        first = pipeline.nextN(480)
+        second = pipeline.nextN(480)
+
+        self.assertTrue(first is second)
+
+    def test_should_clip_values(self):
+        modulator = DirectConnectionModulator(48000)
+        modulator.DC_AUDIO_SCALE = 4.0
+        pipeline = RenderPipeline(make_chain(NullGenerator(48000, 20.0, 1.0, [40.0, 40.0]), modulator))
+
+        values = pipeline.nextN(10)
+
+        self.assertTrue(numpy.all(values == 1.0))
+
+if __name__ == '__main__':
+    unittest.main()
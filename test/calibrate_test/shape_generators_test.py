@@ -2,6 +2,8 @@ import unittest
 import sys
 import os
 import numpy
+import tempfile
+import shutil
 from testhelpers import TestHelpers
 
 sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', 'src', ))
@@ -69,7 +71,7 @@ class PathGeneratorTests(unittest.TestCase,TestHelpers):
         class SquareLineGenerator(PathGenerator):
             PATH = [(0.0,0.0),(2.7,0.0),(2.7,2.7),(0.0,2.7)]
 
-        expected = numpy.array( [(0.0,0.0),(0.45,0.0),(0.9,0.0),(1.35,0.0), (1.35,0.5)] )
+        expected = numpy.array( [(0.0,0.0),(0.45,0.0),(0.9,0.0),(1.35,0.0), (1.35,0.45)] )
         generator = SquareLineGenerator(self.sampling_rate,self.speed,self.size,self.center)
         
         results = generator.nextN(5)
@@ -101,6 +103,122 @@ class PathGeneratorTests(unittest.TestCase,TestHelpers):
         results_2 = generator.nextN(3)
         self.assertNumpyArrayEquals(expected_2,results_2)
 
+    def test_should_draw_with_parameters_current_at_start_of_each_call(self):
+        class SquareLineGenerator(PathGenerator):
+            PATH = [(0.0,0.0),(3.0,0.0),(3.0,3.0),(0.0,3.0)]
+
+        expected_1 = numpy.array( [(0.0,0.0),(0.5,0.0),(1.0,0.0)] )
+        expected_2 = numpy.array( [(1.5,0.0),(1.5,1.5),(0.0,1.5)] )
+        generator = SquareLineGenerator(self.sampling_rate,self.speed,self.size,self.center)
+
+        results_1 = generator.nextN(3)
+        generator.speed = 2.0
+        generator.sampling_rate = 1
+        results_2 = generator.nextN(3)
+
+        self.assertNumpyArrayEquals(expected_1,results_1)
+        self.assertNumpyArrayEquals(expected_2,results_2)
+
+    def test_should_draw_same_path_however_it_is_split_into_blocks(self):
+        class SquareLineGenerator(PathGenerator):
+            PATH = [(2.7,0.0),(2.7,2.7),(0.0,2.7),(0.0,0.0)]
+        whole_generator = SquareLineGenerator(self.sampling_rate,self.speed,self.size,self.center)
+        split_generator = SquareLineGenerator(self.sampling_rate,self.speed,self.size,self.center)
+
+        expected = whole_generator.nextN(40)
+        results = numpy.concatenate([split_generator.nextN(n) for n in [1, 2, 3, 7, 11, 16]])
+
+        self.assertNumpyArrayEquals(expected,results)
+
+    def test_should_loop_round_path_landing_on_every_vertex(self):
+        class SquareLineGenerator(PathGenerator):
+            PATH = [(0.0,0.0),(1.0,0.0),(1.0,1.0),(0.0,1.0)]
+
+        expected = numpy.array([(0.0,0.0),(0.5,0.0),(0.5,0.5),(0.0,0.5),(0.0,0.0),(0.5,0.0)])
+        generator = SquareLineGenerator(self.sampling_rate,self.speed,self.size,self.center)
+
+        results = generator.nextN(6)
+
+        self.assertNumpyArrayEquals(expected,results)
+
+    def test_should_skip_to_where_drawing_would_have_got(self):
+        class SquareLineGenerator(PathGenerator):
+            PATH = [(2.7,0.0),(2.7,2.7),(0.0,2.7),(0.0,0.0)]
+        drawn_generator = SquareLineGenerator(self.sampling_rate,self.speed,self.size,self.center)
+        skipped_generator = SquareLineGenerator(self.sampling_rate,self.speed,self.size,self.center)
+        skipped_generator.nextN(1)
+
+        drawn_generator.nextN(30)
+        skipped_generator.skip(29)
+
+        self.assertNumpyArrayEquals(drawn_generator.nextN(5),skipped_generator.nextN(5))
+
+    def test_should_report_loop_period_once_lead_in_is_drawn(self):
+        class SquareLineGenerator(PathGenerator):
+            PATH = [(2.7,0.0),(2.7,2.7),(0.0,2.7),(0.0,0.0)]
+        generator = SquareLineGenerator(self.sampling_rate,self.speed,self.size,self.center)
+
+        self.assertEqual(None, generator.loop_period)
+        generator.nextN(1)
+        self.assertEqual(None, generator.loop_period)
+        generator.nextN(2)
+        self.assertEqual(12, generator.loop_period)
+        generator.size = 2.0
+        self.assertEqual(None, generator.loop_period)
+
+    def test_should_ramp_speed_every_sample(self):
+        class HorizontalLineGenerator(PathGenerator):
+            PATH = [(0.0, 0.0), (100.0, 0.0)]
+        generator = HorizontalLineGenerator(10, 1.0, 1.0, self.center)
+        generator.nextN(1)
+
+        generator.ramp_speed(1.0, 2.0, 5.0)
+        results = generator.nextN(4)
+
+        self.assertTrue(numpy.allclose([0.0, 0.1, 0.25, 0.45], results[:,0] - results[0,0]))
+        self.assertEqual(0.0, results[:,1].max())
+        self.assertEqual(2.0, generator.current_speed)
+        self.assertFalse(generator.ramping)
+
+    def test_should_hold_end_speed_and_repeat_once_ramp_is_over(self):
+        class SquareLineGenerator(PathGenerator):
+            PATH = [(0.0,0.0),(1.0,0.0),(1.0,1.0),(0.0,1.0)]
+        generator = SquareLineGenerator(self.sampling_rate,self.speed,self.size,self.center)
+
+        generator.ramp_speed(0.5, 1.0, 0.25)
+        generator.nextN(3)
+        self.assertTrue(generator.ramping)
+        self.assertEqual(None, generator.loop_period)
+        generator.nextN(2)
+        generator.nextN(1)
+
+        self.assertEqual(4, generator.loop_period)
+
+    def test_setting_speed_should_end_ramp(self):
+        class SquareLineGenerator(PathGenerator):
+            PATH = [(0.0,0.0),(1.0,0.0),(1.0,1.0),(0.0,1.0)]
+        generator = SquareLineGenerator(self.sampling_rate,self.speed,self.size,self.center)
+        generator.ramp_speed(0.5, 10.0, 0.25)
+        generator.nextN(3)
+
+        generator.speed = 2.0
+        generator.nextN(1)
+
+        self.assertFalse(generator.ramping)
+        self.assertEqual(2.0, generator.current_speed)
+
+    def test_should_publish_parameters_as_a_whole(self):
+        class SquareLineGenerator(PathGenerator):
+            PATH = [(0.0,0.0),(3.0,0.0),(3.0,3.0),(0.0,3.0)]
+        generator = SquareLineGenerator(self.sampling_rate,self.speed,self.size,self.center)
+        parameters = generator._parameters
+
+        generator.center = [1.0, 2.0]
+        generator.size = 4.0
+
+        self.assertEqual((2, 1.0, 1.0, (0, 0)), parameters)
+        self.assertEqual((2, 1.0, 4.0, (1.0, 2.0)), generator._parameters)
+
 class ObjFileGeneratorTests(unittest.TestCase,TestHelpers):
     def setUp(self):
         self.sampling_rate = 2
@@ -138,5 +256,28 @@ class ObjFileGeneratorTests(unittest.TestCase,TestHelpers):
         results = generator.nextN(6)
         self.assertNumpyArrayEquals(expected,results)
 
+    def test_should_keep_path_per_generator(self):
+        file_path = os.path.join(self.test_data_folder,'simple.obj')
+        ObjFileGenerator(self.sampling_rate,self.speed,self.size,self.center,file_path)
+        generator = ObjFileGenerator(self.sampling_rate,self.speed,self.size,self.center,file_path)
 
+        self.assertEqual(4, len(generator.PATH))
+        self.assertEqual(None, ObjFileGenerator.PATH)
 
+    def test_should_reload_file_once_changed(self):
+        tmp_dir = tempfile.mkdtemp(prefix='unittest')
+        try:
+            file_path = os.path.join(tmp_dir, 'line.obj')
+            with open(file_path, 'w') as obj_file:
+                obj_file.write('o Line\nv 0.0 0.0 0.0\nv 1.0 0.0 1.0\nl 1 2\n')
+            self.assertEqual([(1.0, 1.0), (0.0, 0.0)],
+                             ObjFileGenerator(self.sampling_rate,self.speed,self.size,self.center,file_path).PATH)
+
+            with open(file_path, 'w') as obj_file:
+                obj_file.write('o Line\nv 0.0 0.0 0.0\nv 0.5 0.0 0.5\nvn 0.0 1.0 0.0\nl 1//1 2//1\n')
+            os.utime(file_path, (0, os.path.getmtime(file_path) + 10))
+
+            self.assertEqual([(0.5, 0.5), (0.0, 0.0)],
+                             ObjFileGenerator(self.sampling_rate,self.speed,self.size,self.center,file_path).PATH)
+        finally:
+            shutil.rmtree(tmp_dir)
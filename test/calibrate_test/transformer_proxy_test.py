@@ -0,0 +1,39 @@
+import unittest
+import sys
+import os
+import numpy
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+from audio.transform import PositionToAudioTransformer
+from audio.tuning_parameters import TuningParameterCollection
+from calibrate.transformer_proxy import PositionToAudioTransformerProxy
+
+
+class FakeGenerator(object):
+    def nextN(self, n):
+        return numpy.array([[0.0, 0.0, 0.0]] * n)
+
+
+class PositionToAudioTransformerProxyTests(unittest.TestCase):
+    def setUp(self):
+        self.tuning_collection = TuningParameterCollection()
+        self.tuning_parameters = self.tuning_collection.get_tuning_parameters_for_height(0.0)
+        self.tuning_collection.tuning_parameters.append(self.tuning_parameters)
+        self.proxy = PositionToAudioTransformerProxy(PositionToAudioTransformer(self.tuning_collection),
+                                                     FakeGenerator())
+
+    def test_should_keep_using_published_tuning_until_changed(self):
+        self.tuning_parameters.x_offset = 0.5
+
+        self.assertEqual([[0.0, 0.0]], self.proxy.nextN(1).tolist())
+
+        self.proxy.tuning_changed()
+        self.assertEqual([[0.5 * self.tuning_parameters.x_scale, 0.0]], self.proxy.nextN(1).tolist())
+
+    def test_should_not_share_tuning_with_ui(self):
+        self.proxy.tuning_changed()
+
+        self.assertFalse(self.proxy.transformer.tuning_parameter_collection is self.tuning_collection)
+
+if __name__ == '__main__':
+    unittest.main()
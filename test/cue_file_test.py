@@ -0,0 +1,197 @@
+import unittest
+import sys
+import os
+import struct
+import tempfile
+import shutil
+import wave
+from io import BytesIO
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', 'src', ))
+from cue_file import CueFileWriter, CueFileReader, CueTable, CueTypes, PlayCue, LoopUntilHeightCue, write_cue_chunk, read_cue_chunk
+
+
+class CueAssertions(object):
+    cues = [PlayCue(0, 100), LoopUntilHeightCue(100, 124, 0.01), PlayCue(124, 300)]
+
+    def assertCuesEqual(self, expected, actual):
+        self.assertEqual(len(expected), len(actual))
+        for expected_cue, actual_cue in zip(expected, actual):
+            self.assertEqual(expected_cue.cue_type, actual_cue.cue_type)
+            self.assertEqual(expected_cue.start_frame, actual_cue.start_frame)
+            self.assertEqual(expected_cue.end_frame, actual_cue.end_frame)
+            if expected_cue.cue_type == CueTypes.LOOP_UNTIL_HEIGHT:
+                self.assertEqual(expected_cue.until_height, actual_cue.until_height)
+
+
+class CueTableTests(unittest.TestCase, CueAssertions):
+
+    def test_should_index_cues(self):
+        cue_table = CueTable.from_cues(self.cues)
+
+        self.assertEqual(3, len(cue_table))
+        self.assertCuesEqual(self.cues, [cue_table[index] for index in range(3)])
+        self.assertCuesEqual(self.cues, list(cue_table))
+
+    def test_should_store_fixed_width_records(self):
+        cue_table = CueTable.from_cues(self.cues)
+
+        self.assertEqual(3 * 25, len(cue_table.to_bytes()))
+        self.assertEqual([100, 124, 300], list(cue_table.records['end_frame']))
+
+    def test_should_round_trip_through_bytes(self):
+        cue_table = CueTable.from_bytes(CueTable.from_cues(self.cues).to_bytes())
+
+        self.assertCuesEqual(self.cues, cue_table)
+
+    def test_should_reject_partial_records(self):
+        with self.assertRaises(ValueError):
+            CueTable.from_bytes(CueTable.from_cues(self.cues).to_bytes()[:-1])
+
+
+class CueFileReaderTests(unittest.TestCase, CueAssertions):
+    def write_cue_file(self, cues):
+        outfile = StringIO()
+        cue_file = CueFileWriter(outfile)
+        for cue in cues:
+            cue_file.write_cue(cue)
+        cue_file.close()
+        outfile.seek(0)
+        return outfile
+
+    def test_should_read_cues_written(self):
+        cue_file = CueFileReader(self.write_cue_file(self.cues))
+
+        self.assertCuesEqual(self.cues, cue_file.read_cues())
+        self.assertCuesEqual(self.cues, cue_file.read_cue_table())
+
+    def test_should_read_no_cues(self):
+        cue_file = CueFileReader(self.write_cue_file([]))
+
+        self.assertEqual([], cue_file.read_cues())
+        self.assertEqual(0, len(cue_file.read_cue_table()))
+
+    def test_should_read_file_opened_in_binary_mode(self):
+        infile = BytesIO(self.write_cue_file(self.cues).read().encode('ascii'))
+
+        cue_file = CueFileReader(infile)
+
+        self.assertCuesEqual(self.cues, cue_file.read_cues())
+        self.assertCuesEqual(self.cues, cue_file.read_cue_table())
+
+    def test_should_report_syntax_errors_in_binary_mode(self):
+        infile = BytesIO(b'CUE_FILE\nVERSION 2\nBEGIN_CUES\nPLAY 0 x\nEND_CUES\nEND\n')
+
+        with self.assertRaises(ValueError):
+            CueFileReader(infile).read_cue_table()
+
+    def test_should_iterate_lazily(self):
+        infile = self.write_cue_file(self.cues)
+        cues = CueFileReader(infile).iter_cues()
+
+        first_cue = next(cues)
+
+        self.assertEqual(0, first_cue.start_frame)
+        self.assertNotEqual('', infile.read())
+
+    def test_should_read_heights_as_float_does(self):
+        heights = ['0.010000', '0.1', '123.456789', '0.3', '2.675', '7.000000000000001']
+        lines = ['LOOP %d %d UNTIL HEIGHT %s' % (i, i + 1, height) for i, height in enumerate(heights)]
+        infile = StringIO('CUE_FILE\nVERSION 2\nBEGIN_CUES\n%s\nEND_CUES\nEND\n' % '\n'.join(lines))
+
+        cue_table = CueFileReader(infile).read_cue_table()
+
+        self.assertEqual([float(height) for height in heights], list(cue_table.records['until_height']))
+
+    def test_should_accept_cues_not_written_by_writer(self):
+        infile = StringIO('CUE_FILE\nVERSION 2\nBEGIN_CUES\n'
+                          'play 0 100\n\n  LOOP 100  124 until height 1\r\nPLAY 124 300\nEND_CUES\nEND\n')
+        expected = [PlayCue(0, 100), LoopUntilHeightCue(100, 124, 1.0), PlayCue(124, 300)]
+
+        cue_file = CueFileReader(infile)
+
+        self.assertCuesEqual(expected, cue_file.read_cues())
+        self.assertCuesEqual(expected, cue_file.read_cue_table())
+
+    def test_should_stop_at_end_of_file_without_end_cues(self):
+        infile = StringIO('CUE_FILE\nVERSION 2\nBEGIN_CUES\nPLAY 0 100\n')
+
+        self.assertEqual(1, len(CueFileReader(infile).read_cue_table()))
+
+    def test_should_report_syntax_errors(self):
+        for line in ['PLAY 0', 'PLAY 0 1 2', 'PLAY -1 100', 'PLAY 0 1.5', 'LOOP 0 1 UNTIL 0.5', 'LOOP 0 1 UNTIL HEIGHT x',
+                     'PAUSE 0 1']:
+            infile = StringIO('CUE_FILE\nVERSION 2\nBEGIN_CUES\n%s\nEND_CUES\nEND\n' % line)
+            with self.assertRaises(ValueError):
+                CueFileReader(infile).read_cues()
+            with self.assertRaises(ValueError):
+                CueFileReader(infile).read_cue_table()
+
+
+class CueTableIndexTests(unittest.TestCase):
+    cue_table = CueTable.from_cues([
+        PlayCue(0, 100), LoopUntilHeightCue(100, 124, 0.01),
+        PlayCue(124, 200), LoopUntilHeightCue(200, 224, 0.02),
+    ])
+
+    def test_should_find_cue_for_frame(self):
+        self.assertEqual(0, self.cue_table.find_cue_for_frame(0))
+        self.assertEqual(0, self.cue_table.find_cue_for_frame(99))
+        self.assertEqual(1, self.cue_table.find_cue_for_frame(100))
+        self.assertEqual(3, self.cue_table.find_cue_for_frame(223))
+        self.assertEqual(None, self.cue_table.find_cue_for_frame(224))
+
+    def test_should_find_cue_for_height(self):
+        self.assertEqual(1, self.cue_table.find_cue_for_height(0.0))
+        self.assertEqual(3, self.cue_table.find_cue_for_height(0.01))
+        self.assertEqual(3, self.cue_table.find_cue_for_height(0.015))
+        self.assertEqual(None, self.cue_table.find_cue_for_height(0.02))
+
+
+class CueChunkTests(unittest.TestCase, CueAssertions):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='unittest')
+        self.wave_filename = os.path.join(self.tmp_dir, 'test.wav')
+        wave_file = wave.open(self.wave_filename, 'wb')
+        wave_file.setnchannels(2)
+        wave_file.setsampwidth(2)
+        wave_file.setframerate(48000)
+        wave_file.writeframes(b''.join(struct.pack('<hh', i, -i) for i in range(300)))
+        wave_file.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_should_return_none_without_cue_chunk(self):
+        self.assertEqual(None, read_cue_chunk(self.wave_filename))
+
+    def test_should_read_back_embedded_cues(self):
+        write_cue_chunk(self.wave_filename, CueTable.from_cues(self.cues))
+
+        cue_table = read_cue_chunk(self.wave_filename)
+
+        self.assertCuesEqual(self.cues, cue_table)
+
+    def test_should_keep_audio_readable(self):
+        write_cue_chunk(self.wave_filename, CueTable.from_cues(self.cues))
+
+        wave_file = wave.open(self.wave_filename, 'rb')
+        self.assertEqual(300, wave_file.getnframes())
+        self.assertEqual(struct.pack('<hh', 299, -299), wave_file.readframes(300)[-4:])
+        wave_file.close()
+
+    def test_should_keep_riff_size_consistent(self):
+        write_cue_chunk(self.wave_filename, CueTable.from_cues(self.cues))
+
+        with open(self.wave_filename, 'rb') as infile:
+            data = infile.read()
+        self.assertEqual(0, len(data) % 2)
+        self.assertEqual(len(data) - 8, struct.unpack_from('<I', data, 4)[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+import unittest
+import tempfile
+import shutil
+import os
+import sys
+import wave
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', 'src'))
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+from gcode_wav_converter import GcodeConverter, RangeChecker, MoveList, Move, convert_moves, linspace_block
+import numpy
+from audio.tuning_parameter_file import TuningParameterFileHandler
+import exposure_test
+
+
+test_data_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_data')
+def dataFile(filename):
+    return os.path.join(test_data_path, filename)
+
+
+class MoveListTest(unittest.TestCase):
+    def test_should_write_gcode_for_moves(self):
+        gcode = StringIO()
+        moves = MoveList(gcode)
+
+        moves.move(z=0.1, feed_rate=600)
+        moves.write_gcode('M101')
+        moves.move(x=-1.0, y=2.005, feed_rate=1200, extrude=True)
+
+        self.assertEqual('G1 Z0.10 F600.00\nM101\nG1 X-1.00 Y2.00 F1200.00 E1\n', gcode.getvalue())
+        self.assertEqual([Move(None, None, 0.1, 10.0, False), Move(-1.0, 2.0, None, 20.0, True)], moves.moves)
+
+
+class GcodeConverterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='unittest')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def tmpFile(self, filename):
+        return os.path.join(self.tmp_dir, filename)
+
+    def readFrames(self, wave_filename):
+        wave_file = wave.open(wave_filename, 'rb')
+        frames = wave_file.readframes(wave_file.getnframes())
+        wave_file.close()
+        return frames
+
+    def readText(self, filename):
+        with open(filename, 'rt') as infile:
+            return infile.read()
+
+    def test_moves_should_convert_the_same_as_their_gcode(self):
+        with open(self.tmpFile('test.gcode'), 'wt') as gcode_file:
+            moves = MoveList(gcode_file)
+            z = 0.1
+            for speed in [3000, 6000]:
+                exposure_test.add_layer(moves, z, speed, 12000, 2)
+                z = z + 0.1
+        tuning_collection = TuningParameterFileHandler().read_from_file(dataFile('valid.dat'))
+
+        GcodeConverter(tuning_collection).convertGcode(
+            self.tmpFile('test.gcode'), self.tmpFile('gcode.wav'), self.tmpFile('gcode.cue'))
+        convert_moves(moves.moves, dataFile('valid.dat'), self.tmpFile('moves.wav'), self.tmpFile('moves.cue'))
+
+        self.assertEqual(self.readFrames(self.tmpFile('gcode.wav')), self.readFrames(self.tmpFile('moves.wav')))
+        self.assertEqual(self.readText(self.tmpFile('gcode.cue')), self.readText(self.tmpFile('moves.cue')))
+        self.assertTrue(self.readText(self.tmpFile('moves.cue')))
+
+    def test_long_moves_should_convert_the_same_in_blocks(self):
+        moves = MoveList()
+        moves.move(x=-20.0, y=-10.0, feed_rate=60)
+        moves.move(z=0.02)
+        moves.move(x=30.0, y=5.0, feed_rate=300, extrude=True)
+        tuning_collection = TuningParameterFileHandler().read_from_file(dataFile('valid.dat'))
+
+        GcodeConverter(tuning_collection).convertMoves(moves.moves, self.tmpFile('whole.wav'), self.tmpFile('whole.cue'))
+        converter = GcodeConverter(tuning_collection)
+        converter.MOVE_BLOCK_SAMPLES = 1000
+        converter.convertMoves(moves.moves, self.tmpFile('blocks.wav'), self.tmpFile('blocks.cue'))
+
+        self.assertEqual(self.readFrames(self.tmpFile('whole.wav')), self.readFrames(self.tmpFile('blocks.wav')))
+        self.assertEqual(self.readText(self.tmpFile('whole.cue')), self.readText(self.tmpFile('blocks.cue')))
+
+
+class LinspaceBlockTest(unittest.TestCase):
+    def test_blocks_should_match_linspace_exactly(self):
+        random = numpy.random.RandomState(2)
+        cases = [(0.0, 0.0, 5), (1.5, 1.5, 3), (-3.0, 7.25, 1), (1e-310, 2e-310, 7), (0.1, 0.3, 2)]
+        cases += [(start, stop, num) for start, stop, num in zip(
+            random.uniform(-50.0, 50.0, 20), random.uniform(-50.0, 50.0, 20), random.randint(1, 5000, 20))]
+        for start, stop, num in cases:
+            start, stop, num = float(start), float(stop), int(num)
+            whole = numpy.linspace(start, stop, num=num)
+            for block in (1, 7, 1000, num):
+                blocks = numpy.concatenate([linspace_block(start, stop, num, first, min(block, num - first))
+                                            for first in range(0, num, block)])
+                self.assertEqual(whole.tobytes(), blocks.tobytes())
+
+
+class RangeCheckerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='unittest')
+        self.tuning_collection = TuningParameterFileHandler().read_from_file(dataFile('valid.dat'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def tmpFile(self, filename):
+        return os.path.join(self.tmp_dir, filename)
+
+    def check(self, moves):
+        return RangeChecker(self.tuning_collection).check(moves.moves, 'applyMove')
+
+    def test_should_pass_moves_in_range_with_clip_margin(self):
+        moves = MoveList()
+        moves.move(x=-25.0, y=-25.0, feed_rate=6000)
+        moves.move(z=0.05)
+        moves.move(x=25.0, y=25.0, extrude=True)
+
+        report = self.check(moves)
+
+        self.assertEqual([], report.problems)
+        self.assertEqual([], report.clipped)
+        self.assertTrue(0.0 < report.clip_margin < 1.0)
+
+    def test_should_report_every_move_out_of_bounds(self):
+        moves = MoveList()
+        moves.move(x=60.0, y=0.0, feed_rate=6000)
+        moves.move(x=0.0, y=-70.0)
+        moves.move(z=0.05)
+        moves.move(z=0.01)
+
+        report = self.check(moves)
+
+        self.assertEqual(3, len(report.problems))
+        self.assertTrue(report.problems[0].startswith("Line 1: Requested x position '60.000000'"))
+        self.assertTrue(report.problems[1].startswith("Line 2: Requested y position '-70.000000'"))
+        self.assertTrue(report.problems[2].startswith("Line 4: G-code requested us to move down"))
+        # Going out to y=-70 and back to the dwell position would both be clipped
+        self.assertEqual(2, len(report.clipped))
+        self.assertTrue(report.clipped[0].startswith("Line 2: move from (60.00, 0.00) to (0.00, -70.00) reaches audio"))
+        self.assertTrue(report.clipped[1].startswith("Line 3: move from (0.00, -70.00) to (0.00, 0.00) reaches audio"))
+
+    def test_should_report_moves_clipped_at_any_sublayer(self):
+        tuning_parameters = self.tuning_collection.get_tuning_parameters_for_height(1.0)
+        tuning_parameters.height = 1.0
+        tuning_parameters.x_scale = 1.5
+        self.tuning_collection.tuning_parameters.append(tuning_parameters)
+        self.tuning_collection.reset_cache()
+        moves = MoveList()
+        moves.move(x=0.0, y=0.0, feed_rate=6000)
+        moves.move(x=45.0, y=0.0, extrude=True)
+        moves.move(z=1.0)
+
+        report = self.check(moves)
+
+        # Only the top sublayers are clipped, on the way out and on the way back to the dwell position
+        self.assertEqual([], report.problems)
+        self.assertEqual(2, len(report.clipped))
+        self.assertTrue(report.clipped[0].startswith('Line 2: move from (0.00, 0.00) to (45.00, 0.00)'))
+        self.assertTrue(report.clipped[0].endswith('at height 0.99, and would be clipped'))
+        self.assertTrue(report.clip_margin < 0.0)
+
+    def test_conversion_should_go_ahead_when_moves_would_only_be_clipped(self):
+        for tuning_parameters in self.tuning_collection.tuning_parameters:
+            tuning_parameters.x_scale *= 2.0
+        self.tuning_collection.reset_cache()
+        moves = MoveList()
+        moves.move(x=0.0, y=0.0, feed_rate=6000)
+        moves.move(x=45.0, y=0.0, extrude=True)
+        moves.move(z=0.05)
+        self.assertTrue(self.check(moves).clip_margin < 0.0)
+
+        GcodeConverter(self.tuning_collection).convertMoves(moves.moves, self.tmpFile('out.wav'),
+                                                            self.tmpFile('out.cue'))
+
+        self.assertTrue(os.path.exists(self.tmpFile('out.wav')))
+
+    def test_conversion_should_stop_before_writing_anything(self):
+        moves = MoveList()
+        moves.move(x=60.0, y=0.0, feed_rate=6000)
+
+        with self.assertRaises(ValueError):
+            convert_moves(moves.moves, dataFile('valid.dat'), self.tmpFile('out.wav'), self.tmpFile('out.cue'))
+        self.assertFalse(os.path.exists(self.tmpFile('out.wav')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,11 @@ import tempfile
 import shutil
 import os
 import sys
+import numpy
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
 
 sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', 'src'))
 from gcode_writer import GcodeWriter, MoveModes
@@ -38,6 +43,37 @@ class GcodeWriterTest(unittest.TestCase):
             writer.moveToHeight(0.04)
             writer.drawPath([(0.0, 0.0), (1.0, 1.0), (1.0, -1.0), (-1.0, 1.0), (-1.0, -1.0), (0.0, 0.0)])
         self.assertEqual(open(dataFile('gcode.out')).read(), open(filepath,'rt').read())
+
+    def test_draw_paths(self):
+        path = numpy.array([(0.0, 0.0), (1.0, 1.0), (1.0, -1.0), (-1.0, 1.0), (-1.0, -1.0), (0.0, 0.0)])
+        filepath = os.path.join(self.tmp_dir, 'gcode.out')
+        with open(filepath, 'wt') as outfile:
+            writer = GcodeWriter(outfile, 300.0, 900.0)
+            writer.FORMAT_CHUNK_MOVES = 2
+            writer.moveToHeight(0.01)
+            writer.drawPaths([path])
+            writer.moveToHeight(0.02)
+            writer.drawPaths([path.tolist()])
+            writer.moveToHeight(0.03)
+            writer.drawPaths([numpy.array([(-1.0, 1.0), (1.0, 1.0), (1.0, -1.0), (-1.0, -1.0)])])
+            writer.moveToHeight(0.04)
+            writer.drawPaths([path])
+        self.assertEqual(open(dataFile('gcode.out')).read(), open(filepath,'rt').read())
+
+    def test_draw_paths_should_write_same_as_draw_path(self):
+        paths = [[(0.0, 0.0), (0.0, 0.0), (1.004, 2.0), (1.004, 2.0), (-3.125, 0.005)],
+                 [(-3.125, 0.005), (-0.001, 5.0)],
+                 [(7.0, 7.0), (7.0, 7.0)],
+                 [(1.0, 1.0), (2.0, 2.0), (1.0, 1.0)]]
+        one_by_one = StringIO()
+        writer = GcodeWriter(one_by_one, 300.0, 900.0)
+        for path in paths:
+            writer.drawPath(path)
+        in_bulk = StringIO()
+        writer = GcodeWriter(in_bulk, 300.0, 900.0)
+        writer.drawPaths(numpy.array(path) for path in paths)
+
+        self.assertEqual(one_by_one.getvalue(), in_bulk.getvalue())
         
 
 if __name__ == '__main__':
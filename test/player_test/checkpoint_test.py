@@ -0,0 +1,69 @@
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+from cue_file import CueTable, PlayCue, LoopUntilHeightCue
+from player.checkpoint import Checkpoint, find_resume_cue_index
+
+
+class CheckpointTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='unittest')
+        self.filename = os.path.join(self.tmp_dir, 'test.cue.checkpoint')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_should_load_none_without_checkpoint(self):
+        self.assertEqual(None, Checkpoint(self.filename).load())
+
+    def test_should_load_last_saved_state(self):
+        checkpoint = Checkpoint(self.filename)
+        checkpoint.save(3, 10, 0.1)
+        checkpoint.save(4, 20, 0.2)
+
+        self.assertEqual({'cue_index': 4, 'num_drips': 20, 'height': 0.2}, Checkpoint(self.filename).load())
+        self.assertEqual(['test.cue.checkpoint'], os.listdir(self.tmp_dir))
+
+    def test_should_clear_checkpoint(self):
+        checkpoint = Checkpoint(self.filename)
+        checkpoint.save(3, 10, 0.1)
+        checkpoint.clear()
+
+        self.assertEqual(None, checkpoint.load())
+        checkpoint.clear()
+
+
+class FindResumeCueIndexTests(unittest.TestCase):
+    cues = CueTable.from_cues([
+        PlayCue(0, 10), LoopUntilHeightCue(10, 12, 0.1),
+        PlayCue(12, 20), PlayCue(20, 30), LoopUntilHeightCue(30, 32, 0.2),
+        PlayCue(32, 40), LoopUntilHeightCue(40, 42, 0.3),
+    ])
+
+    def test_should_start_at_beginning_below_first_layer(self):
+        self.assertEqual(0, find_resume_cue_index(self.cues, 0.0, 0))
+        self.assertEqual(0, find_resume_cue_index(self.cues, 0.09, 1))
+
+    def test_should_start_after_last_loop_reached(self):
+        self.assertEqual(2, find_resume_cue_index(self.cues, 0.1, 2))
+        self.assertEqual(2, find_resume_cue_index(self.cues, 0.15, 4))
+        self.assertEqual(5, find_resume_cue_index(self.cues, 0.2, 5))
+
+    def test_should_return_end_when_print_complete(self):
+        self.assertEqual(7, find_resume_cue_index(self.cues, 0.3, 7))
+
+    def test_should_not_skip_layers_when_drips_are_ahead(self):
+        # Saved after the first layer was drawn, with the liquid already past the second layer's height
+        self.assertEqual(2, find_resume_cue_index(self.cues, 0.25, 2))
+        self.assertEqual(2, find_resume_cue_index(self.cues, 0.3, 3))
+
+    def test_should_go_back_to_layer_of_height_when_drips_are_behind(self):
+        self.assertEqual(2, find_resume_cue_index(self.cues, 0.15, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
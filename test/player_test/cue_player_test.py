@@ -0,0 +1,199 @@
+import unittest
+import sys
+import os
+import struct
+import tempfile
+import shutil
+import wave
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+from audio.backends import NullBackend
+from audio.drip_input import DripEvent
+from audio.tuning_parameters import TuningParameterCollection
+from cue_file import PlayCue, LoopUntilHeightCue
+from player.cue_player import CuePlayer
+from util.drip_governor import DripRateController
+from util.logging import Logging
+
+
+class FakeOutStream(object):
+    """Output stream that plays everything written to it instantly."""
+    def __init__(self, sampling_rate, buffer_frames):
+        self.sampling_rate = sampling_rate
+        self.buffer_frames = buffer_frames
+        self.frames = b''
+
+    def get_write_available(self):
+        return self.buffer_frames
+
+    def get_output_latency(self):
+        return 0.0
+
+    def get_time(self):
+        return float(len(self.frames) // 4) / self.sampling_rate
+
+    def write(self, frames):
+        self.frames += frames
+
+    def frame_values(self):
+        return [struct.unpack_from('<hh', self.frames, offset)[0] for offset in range(0, len(self.frames), 4)]
+
+
+class FakeDripInput(object):
+    """Reports a single drip once the output has played past the given time."""
+    def __init__(self, outstream, drip_time):
+        self.outstream = outstream
+        self.drip_time = drip_time
+        self.overflows = 0
+
+    def new_drip_events(self):
+        if self.drip_time is not None and self.outstream.get_time() > self.drip_time:
+            drip_time, self.drip_time = self.drip_time, None
+            return [DripEvent(1, drip_time)]
+        return []
+
+
+class FakeTelemetry(object):
+    def __init__(self):
+        self.records = []
+
+    def record(self, record):
+        self.records.append(record)
+
+
+class FakeCheckpoint(object):
+    def __init__(self):
+        self.saves = []
+
+    def save(self, cue_index, num_drips, height):
+        self.saves.append((cue_index, num_drips, height))
+
+
+class FakeDripGovernor(object):
+    def __init__(self):
+        self.commands = []
+
+    def start_dripping(self):
+        self.commands.append(1.0)
+
+    def stop_dripping(self):
+        self.commands.append(0.0)
+
+    def set_duty_cycle(self, duty_cycle):
+        self.commands.append(duty_cycle)
+
+
+class CuePlayerTests(unittest.TestCase):
+    sampling_rate = 1000
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='unittest')
+        self.wave_filename = os.path.join(self.tmp_dir, 'test.wav')
+        wave_file = wave.open(self.wave_filename, 'wb')
+        wave_file.setnchannels(2)
+        wave_file.setsampwidth(2)
+        wave_file.setframerate(self.sampling_rate)
+        wave_file.writeframes(b''.join(struct.pack('<hh', i, i) for i in range(20)))
+        wave_file.close()
+        self.tuning_collection = TuningParameterCollection()
+        self.tuning_collection.drips_per_height = 10.0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def play(self, cues, drip_time, **kwargs):
+        wave_file = wave.open(self.wave_filename, 'rb')
+        outstream = FakeOutStream(self.sampling_rate, 8)
+        drip_input = FakeDripInput(outstream, drip_time)
+        player = CuePlayer(wave_file, cues, self.tuning_collection, outstream, drip_input, Logging('error'), **kwargs)
+        player.play()
+        wave_file.close()
+        return outstream.frame_values()
+
+    def test_should_play_cues_in_order(self):
+        cues = [PlayCue(0, 5), PlayCue(10, 12)]
+
+        self.assertEqual([0, 1, 2, 3, 4, 10, 11], self.play(cues, None))
+
+    def test_should_loop_until_height_reached(self):
+        cues = [PlayCue(0, 5), LoopUntilHeightCue(5, 7, 0.1), PlayCue(7, 9)]
+
+        frames = self.play(cues, 0.02)
+
+        self.assertEqual([0, 1, 2, 3, 4], frames[:5])
+        self.assertEqual([5, 6] * ((len(frames) - 7) // 2), frames[5:-2])
+        self.assertEqual([7, 8], frames[-2:])
+
+    def test_should_leave_loop_at_first_loop_boundary_after_drip(self):
+        cues = [PlayCue(0, 5), LoopUntilHeightCue(5, 7, 0.1), PlayCue(7, 9)]
+
+        frames = self.play(cues, 0.02)
+
+        # Drip heard once frame 20 has played; loop ends at the next boundary
+        self.assertEqual(23, len(frames))
+
+    def test_should_not_loop_when_height_already_reached(self):
+        cues = [PlayCue(0, 5), LoopUntilHeightCue(5, 7, 0.0), PlayCue(7, 9)]
+
+        self.assertEqual([0, 1, 2, 3, 4, 5, 6, 7, 8], self.play(cues, None))
+
+    def test_should_record_telemetry_for_each_cue(self):
+        cues = [PlayCue(0, 5), LoopUntilHeightCue(5, 7, 0.1), PlayCue(7, 9)]
+        telemetry = FakeTelemetry()
+
+        self.play(cues, 0.02, telemetry=telemetry)
+
+        self.assertEqual([0, 1, 2], [record['cue_index'] for record in telemetry.records])
+        self.assertEqual([5, 16, 2], [record['frames'] for record in telemetry.records])
+        self.assertEqual([1, 8, 1], [record['loops'] for record in telemetry.records])
+        loop_record = telemetry.records[1]
+        self.assertEqual('loop_until_height', loop_record['cue_type'])
+        self.assertEqual(1, loop_record['drips'])
+        self.assertAlmostEqual(0.0, loop_record['height_error'])
+        self.assertAlmostEqual(1.0, loop_record['loop_exit_delay_ms'])
+        self.assertEqual(None, telemetry.records[2]['height_error'])
+
+    def test_should_leave_loop_within_output_buffer_of_drip(self):
+        cues = [PlayCue(0, 5), LoopUntilHeightCue(5, 7, 0.1), PlayCue(7, 9)]
+        telemetry = FakeTelemetry()
+        wave_file = wave.open(self.wave_filename, 'rb')
+        outstream = NullBackend().open_output(self.sampling_rate, 2, 4)
+        drip_input = FakeDripInput(outstream, 0.1)
+
+        CuePlayer(wave_file, cues, self.tuning_collection, outstream, drip_input, Logging('error'),
+                  telemetry=telemetry).play()
+        wave_file.close()
+
+        # Frames still queued when the drip is heard are played before the loop can be left
+        self.assertTrue(telemetry.records[1]['loop_exit_delay_ms'] <= 4.0 + 2.0)
+        self.assertTrue(telemetry.records[1]['time'] > 0.1)
+
+    def test_should_save_checkpoint_at_start_of_each_cue(self):
+        cues = [PlayCue(0, 5), LoopUntilHeightCue(5, 7, 0.1), PlayCue(7, 9)]
+        checkpoint = FakeCheckpoint()
+
+        self.play(cues, 0.02, checkpoint=checkpoint)
+
+        self.assertEqual([(0, 0, 0.0), (1, 0, 0.0), (2, 1, 0.1)], checkpoint.saves)
+
+    def test_should_resume_from_given_cue(self):
+        cues = [PlayCue(0, 5), LoopUntilHeightCue(5, 7, 0.1), PlayCue(12, 15), LoopUntilHeightCue(15, 16, 0.1)]
+
+        frames = self.play(cues, None, start_cue_index=2, start_num_drips=1)
+
+        self.assertEqual([12, 13, 14, 15], frames)
+
+    def test_should_set_drip_duty_cycle_once_per_layer(self):
+        cues = [PlayCue(0, 5), LoopUntilHeightCue(5, 7, 0.1), PlayCue(7, 9), LoopUntilHeightCue(7, 9, 0.0)]
+        drip_governor = FakeDripGovernor()
+        expected_controller = DripRateController()
+
+        self.play(cues, 0.02, drip_governor=drip_governor, flow_controller=DripRateController())
+
+        # One drip behind at the end of the first layer, then waiting for it at that duty cycle; one drip ahead at the
+        # end of the second
+        self.assertEqual([expected_controller.update(1.0), expected_controller.update(-1.0)], drip_governor.commands)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+from player.drip_timeline import DripTimeline
+
+
+class DripTimelineTests(unittest.TestCase):
+
+    def test_should_have_no_drips_initially(self):
+        drip_timeline = DripTimeline()
+
+        self.assertEqual(0, drip_timeline.drips_at(1000))
+        self.assertEqual(None, drip_timeline.last_drip_frame)
+
+    def test_should_only_count_drips_up_to_requested_frame(self):
+        drip_timeline = DripTimeline()
+        drip_timeline.add_drip(100)
+        drip_timeline.add_drip(200)
+
+        self.assertEqual(0, drip_timeline.drips_at(99))
+        self.assertEqual(1, drip_timeline.drips_at(150))
+        self.assertEqual(100, drip_timeline.last_drip_frame)
+        self.assertEqual(2, drip_timeline.drips_at(200))
+        self.assertEqual(200, drip_timeline.last_drip_frame)
+
+
+if __name__ == '__main__':
+    unittest.main()
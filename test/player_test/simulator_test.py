@@ -0,0 +1,228 @@
+import unittest
+import sys
+import os
+import struct
+import tempfile
+import shutil
+import time
+import wave
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+from audio.backends import NullBackend
+from audio.tuning_parameters import TuningParameterCollection
+from cue_file import PlayCue, LoopUntilHeightCue
+from player.cue_player import CuePlayer
+from player.simulator import PrintSimulator, VirtualDripSource, RecordedDripSource, SimulatedDripInput
+from util.drip_governor import DripRateController
+from util.logging import Logging
+from audio.util import MAX_S16
+
+
+class FakeTelemetry(object):
+    def __init__(self):
+        self.records = []
+
+    def record(self, record):
+        self.records.append(record)
+
+
+class PrintSimulatorTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='unittest')
+        self.wave_file = None
+
+    def tearDown(self):
+        if self.wave_file:
+            self.wave_file.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def open_wave(self, sampling_rate, num_frames):
+        filename = os.path.join(self.tmp_dir, 'test.wav')
+        wave_file = wave.open(filename, 'wb')
+        wave_file.setnchannels(2)
+        wave_file.setsampwidth(2)
+        wave_file.setframerate(sampling_rate)
+        wave_file.writeframes(b'\x00' * 4 * num_frames)
+        wave_file.close()
+        self.wave_file = wave.open(filename, 'rb')
+        return self.wave_file
+
+    def simulate(self, cues, sampling_rate, drips_per_height, drip_source, **kwargs):
+        tuning_collection = TuningParameterCollection()
+        tuning_collection.drips_per_height = drips_per_height
+        wave_file = self.open_wave(sampling_rate, max(cue.end_frame for cue in cues))
+        return PrintSimulator(wave_file, cues, tuning_collection, drip_source, **kwargs).run()
+
+    def test_should_total_play_cues(self):
+        cues = [PlayCue(0, 1000), PlayCue(2000, 2500)]
+
+        report = self.simulate(cues, 1000, 10.0, VirtualDripSource(1.0))
+
+        self.assertEqual(1500, report.total_frames)
+        self.assertAlmostEqual(1.5, report.total_time)
+        self.assertEqual([], report.loop_counts)
+        self.assertTrue(report.completed)
+
+    def test_should_leave_loop_as_player_does(self):
+        cues = [PlayCue(0, 5), LoopUntilHeightCue(5, 7, 0.1), PlayCue(7, 9)]
+        tuning_collection = TuningParameterCollection()
+        tuning_collection.drips_per_height = 10.0
+        telemetry = FakeTelemetry()
+        wave_file = self.open_wave(1000, 9)
+        outstream = NullBackend().open_output(1000, 2, 5)
+        CuePlayer(wave_file, cues, tuning_collection, outstream,
+                  SimulatedDripInput(RecordedDripSource([0.02]), outstream), Logging('error'),
+                  telemetry=telemetry).play()
+        wave_file.close()
+
+        report = self.simulate(cues, 1000, 10.0, RecordedDripSource([0.02]))
+
+        # The simulated buffer is always full, while the NullBackend's drains by half (one loop here) between polls
+        player_loops = telemetry.records[1]['loops']
+        self.assertEqual(1, len(report.loop_counts))
+        self.assertTrue(player_loops <= report.loop_counts[0][1] <= player_loops + 1)
+        self.assertEqual(7 + 2 * report.loop_counts[0][1], report.total_frames)
+        self.assertAlmostEqual(0.1, report.final_height)
+
+    def test_should_leave_loop_within_output_buffer_of_drip(self):
+        cues = [PlayCue(0, 5), LoopUntilHeightCue(5, 7, 0.1), PlayCue(7, 9)]
+
+        report = self.simulate(cues, 1000, 10.0, RecordedDripSource([0.02]))
+
+        # The drip is at frame 20; it is heard once the 5 frames queued then have played, at frame 25, which is a
+        # loop boundary
+        self.assertEqual(25 + 2, report.total_frames)
+        self.assertEqual([(1, 10)], report.loop_counts)
+
+    def test_should_leave_loop_at_first_boundary_after_drip_heard(self):
+        cues = [PlayCue(0, 5), LoopUntilHeightCue(5, 12, 0.1)]
+
+        report = self.simulate(cues, 1000, 10.0, RecordedDripSource([0.02]))
+
+        # Heard at frame 25, between the loop boundaries at 19 and 26
+        self.assertEqual(26, report.total_frames)
+        self.assertEqual([(1, 3)], report.loop_counts)
+
+    def test_should_not_loop_when_height_already_reached(self):
+        cues = [PlayCue(0, 500), LoopUntilHeightCue(500, 700, 0.1), PlayCue(700, 900)]
+
+        report = self.simulate(cues, 1000, 10.0, RecordedDripSource([0.1]))
+
+        self.assertEqual(900, report.total_frames)
+        self.assertEqual([(1, 1)], report.loop_counts)
+        self.assertEqual(0, report.too_fast_cues)
+
+    def test_should_report_time_spent_too_fast(self):
+        # Drips at 0.1s, 0.2s, ...; the second drip passes 0.1mm at frame 200, 500 frames before the layer ends
+        cues = [PlayCue(0, 500), LoopUntilHeightCue(500, 700, 0.1)]
+
+        report = self.simulate(cues, 1000, 10.0, VirtualDripSource(10.0))
+
+        self.assertEqual(1, report.too_fast_cues)
+        self.assertAlmostEqual(0.5, report.too_fast_time)
+
+    def test_should_simulate_drip_rate_over_many_layers(self):
+        layer_height = 0.1
+        cues = []
+        for layer in range(1, 101):
+            cues.append(PlayCue(0, 480))
+            cues.append(LoopUntilHeightCue(480, 528, layer * layer_height))
+
+        report = self.simulate(cues, 48000, 100.0, VirtualDripSource(10.0))
+
+        # Each layer needs 10 drips, i.e. one second
+        self.assertAlmostEqual(100.0, report.total_time, places=2)
+        self.assertAlmostEqual(10.0, report.final_height, places=2)
+
+    def test_should_simulate_hour_long_print_in_seconds(self):
+        # A 10 hour print must simulate in under a minute; this is the same rate, for an hour of one second layers
+        layer_height = 0.1
+        cues = []
+        for layer in range(1, 3601):
+            cues.append(PlayCue(0, 24000))
+            cues.append(LoopUntilHeightCue(24000, 24480, layer * layer_height))
+
+        start_time = time.time()
+        report = self.simulate(cues, 48000, 100.0, VirtualDripSource(10.0))
+        elapsed_time = time.time() - start_time
+
+        self.assertAlmostEqual(3600.0, report.total_time, places=0)
+        self.assertTrue(elapsed_time < 6.0, 'Took %0.1f s' % elapsed_time)
+
+    def test_should_stop_when_recorded_drips_run_out(self):
+        cues = [LoopUntilHeightCue(0, 10, 0.1), LoopUntilHeightCue(0, 10, 0.2)]
+
+        report = self.simulate(cues, 1000, 10.0, RecordedDripSource([0.05]))
+
+        self.assertFalse(report.completed)
+        self.assertEqual(1, len(report.loop_counts))
+
+    def test_should_govern_virtual_drips_with_flow_controller(self):
+        layer_height = 0.1
+        cues = []
+        for layer in range(1, 21):
+            cues.append(PlayCue(0, 1000))
+            cues.append(LoopUntilHeightCue(1000, 1010, layer * layer_height))
+        drip_source = VirtualDripSource(20.0)
+
+        report = self.simulate(cues, 1000, 100.0, drip_source, flow_controller=DripRateController())
+
+        # Each layer takes one second to draw, and needs 10 drips; the flow settles at about half
+        self.assertTrue(report.completed)
+        self.assertTrue(0.3 < drip_source.duty_cycle < 0.7)
+        self.assertTrue(report.total_time < 22.0)
+
+
+class VirtualDripSourceTests(unittest.TestCase):
+    def test_should_drip_at_rate(self):
+        drip_source = VirtualDripSource(4.0)
+
+        self.assertEqual([0.25, 0.5, 0.75], [drip_source.drip_time(drip_num) for drip_num in range(1, 4)])
+
+    def test_should_scale_rate_by_duty_cycle(self):
+        drip_source = VirtualDripSource(4.0)
+
+        drip_source.set_duty_cycle(0.5, 0.6)
+
+        # Two drips and 0.4 of the next by 0.6s; then one every 0.5s
+        self.assertEqual(0.5, drip_source.drip_time(2))
+        self.assertAlmostEqual(0.9, drip_source.drip_time(3))
+        self.assertAlmostEqual(1.4, drip_source.drip_time(4))
+
+    def test_should_not_drip_when_off(self):
+        drip_source = VirtualDripSource(4.0)
+
+        drip_source.set_duty_cycle(0.0, 0.3)
+
+        self.assertEqual(0.25, drip_source.drip_time(1))
+        self.assertEqual(None, drip_source.drip_time(2))
+
+
+class RecordedDripSourceTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='unittest')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_should_find_drips_in_recording(self):
+        filename = os.path.join(self.tmp_dir, 'drips.wav')
+        wave_file = wave.open(filename, 'wb')
+        wave_file.setnchannels(1)
+        wave_file.setsampwidth(2)
+        wave_file.setframerate(1000)
+        values = []
+        for drip in range(3):
+            values.extend([0] * 100 + [int(MAX_S16)] * 50)
+        wave_file.writeframes(b''.join(struct.pack('<h', value) for value in values))
+        wave_file.close()
+
+        drip_source = RecordedDripSource.from_wave_file(filename)
+
+        self.assertEqual(3, len(drip_source.drip_times))
+        self.assertAlmostEqual(0.1, drip_source.drip_time(1))
+        self.assertEqual(None, drip_source.drip_time(4))
+
+
+if __name__ == '__main__':
+    unittest.main()
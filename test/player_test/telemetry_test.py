@@ -0,0 +1,87 @@
+import unittest
+import sys
+import os
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+from player.telemetry import TelemetryWriter, read_telemetry, summarize_layers, format_layer_table
+
+
+class KeepOpenStringIO(StringIO):
+    def close(self):
+        pass
+
+
+def cue_record(time, cue_type, frames, loops=1, until_height=None, height_error=None, underruns=0,
+               loop_exit_delay_ms=None):
+    return {'time': time, 'rate': 1000, 'cue_type': cue_type, 'frames': frames, 'loops': loops,
+            'until_height': until_height, 'height_error': height_error, 'underruns': underruns,
+            'loop_exit_delay_ms': loop_exit_delay_ms}
+
+
+class TelemetryWriterTests(unittest.TestCase):
+    def test_should_write_one_line_per_record(self):
+        outfile = KeepOpenStringIO()
+        telemetry = TelemetryWriter(outfile)
+        telemetry.start()
+        telemetry.record({'cue_index': 0})
+        telemetry.record({'cue_index': 1})
+        telemetry.stop()
+
+        outfile.seek(0)
+        self.assertEqual([{'cue_index': 0}, {'cue_index': 1}], read_telemetry(outfile))
+        self.assertEqual(0, telemetry.dropped)
+
+    def test_should_drop_records_when_queue_full(self):
+        outfile = KeepOpenStringIO()
+        telemetry = TelemetryWriter(outfile, queue_size=2)
+        for cue_index in range(5):
+            telemetry.record({'cue_index': cue_index})
+        self.assertEqual(3, telemetry.dropped)
+
+        telemetry.start()
+        telemetry.stop()
+        outfile.seek(0)
+        self.assertEqual([{'cue_index': 0}, {'cue_index': 1}], read_telemetry(outfile))
+
+
+class SummarizeLayersTests(unittest.TestCase):
+    def test_should_group_cues_into_layers(self):
+        records = [
+            cue_record(1.0, 'play', 1000),
+            cue_record(1.5, 'play', 500),
+            cue_record(4.5, 'loop_until_height', 3000, loops=100, until_height=0.1, height_error=0.0,
+                       underruns=1, loop_exit_delay_ms=12.0),
+            cue_record(6.5, 'play', 2000),
+            cue_record(7.0, 'loop_until_height', 500, until_height=0.2, height_error=0.05, underruns=1),
+        ]
+
+        layers = summarize_layers(records)
+
+        self.assertEqual(2, len(layers))
+        self.assertEqual({'layer': 1, 'height': 0.1, 'start_time': 0.0, 'play_time': 1.5, 'wait_time': 3.0,
+                          'total_time': 4.5, 'loops': 100, 'height_error': 0.0, 'underruns': 1,
+                          'loop_exit_delay_ms': 12.0}, layers[0])
+        self.assertEqual(4.5, layers[1]['start_time'])
+        self.assertEqual(2.5, layers[1]['total_time'])
+        self.assertEqual(0, layers[1]['underruns'])
+
+    def test_should_format_totals(self):
+        records = [
+            cue_record(1.0, 'play', 1000),
+            cue_record(4.0, 'loop_until_height', 3000, until_height=0.1, height_error=0.0, loop_exit_delay_ms=10.0),
+            cue_record(8.0, 'loop_until_height', 4000, until_height=0.2, height_error=0.0, loop_exit_delay_ms=20.0),
+        ]
+
+        table = format_layer_table(summarize_layers(records)).split('\n')
+
+        self.assertEqual(5, len(table))
+        self.assertEqual('Total: 2 layers in 8.0 s, 7.0 s (87.5%) waiting for drips, 0 underruns', table[-2])
+        self.assertEqual('Loop exit delay: mean 15.0 ms, min 10.0 ms, max 20.0 ms, jitter 5.0 ms', table[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import os
+import sys
+import numpy
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+from slicer.stl_slicer import Layer
+from slicer.hatch import hatch, hatch_layers
+
+
+def square(left, bottom, size, clockwise=False):
+    contour = [(left, bottom), (left + size, bottom), (left + size, bottom + size), (left, bottom + size),
+               (left, bottom)]
+    return contour[::-1] if clockwise else contour
+
+# A U shape, open at the top
+U_SHAPE = [(0.0, 0.0), (9.0, 0.0), (9.0, 9.0), (6.0, 9.0), (6.0, 3.0), (3.0, 3.0), (3.0, 9.0), (0.0, 9.0), (0.0, 0.0)]
+
+
+def inside(point, contours):
+    """Even-odd test, counting points on an edge as inside."""
+    crossings = 0
+    for contour in contours:
+        for (x0, y0), (x1, y1) in zip(contour[:-1], contour[1:]):
+            if min(x0, x1) - 1e-9 <= point[0] <= max(x0, x1) + 1e-9 and \
+                    min(y0, y1) - 1e-9 <= point[1] <= max(y0, y1) + 1e-9 and \
+                    abs((x1 - x0) * (point[1] - y0) - (y1 - y0) * (point[0] - x0)) < 1e-9:
+                return True
+            if (y0 > point[1]) != (y1 > point[1]) and point[0] < x0 + (point[1] - y0) * (x1 - x0) / (y1 - y0):
+                crossings += 1
+    return crossings % 2 == 1
+
+
+class HatchTests(unittest.TestCase):
+    def assert_paths_inside(self, paths, contours):
+        for path in paths:
+            for start, end in zip(path[:-1], path[1:]):
+                for fraction in (0.25, 0.5, 0.75):
+                    point = (start[0] + fraction * (end[0] - start[0]), start[1] + fraction * (end[1] - start[1]))
+                    self.assertTrue(inside(point, contours), '%s -> %s leaves the contours' % (start, end))
+
+    def test_should_fill_square_in_one_serpentine(self):
+        paths = hatch([square(0.0, 0.0, 10.0)], 1.0)
+
+        self.assertEqual(1, len(paths))
+        self.assertEqual([(0.0, 0.5), (10.0, 0.5), (10.0, 1.5), (0.0, 1.5)], [
+            (round(x, 9), round(y, 9)) for x, y in paths[0][:4]])
+        self.assertEqual(20, len(paths[0]))
+
+    def test_should_hatch_at_angle(self):
+        paths = hatch([square(0.0, 0.0, 10.0)], 1.0, 45.0)
+
+        self.assertEqual(1, len(paths))
+        start, end = numpy.array(paths[0][0]), numpy.array(paths[0][1])
+        self.assertAlmostEqual(end[0] - start[0], end[1] - start[1])
+        self.assert_paths_inside(paths, [square(0.0, 0.0, 10.0)])
+
+    def test_should_not_fill_holes(self):
+        contours = [square(0.0, 0.0, 10.0), square(3.0, 3.0, 4.0, clockwise=True)]
+
+        paths = hatch(contours, 0.5, 30.0)
+
+        self.assert_paths_inside(paths, contours)
+        self.assertTrue(any(point[1] > 7.0 for path in paths for point in path))
+
+    def test_should_not_join_lines_across_inward_corners(self):
+        paths = hatch([U_SHAPE], 1.0)
+
+        self.assert_paths_inside(paths, [U_SHAPE])
+        self.assertEqual(2, len(paths))
+        self.assertEqual(30, sum(len(path) for path in paths))
+
+    def test_should_start_nearest_given_point(self):
+        paths = hatch([square(0.0, 0.0, 10.0)], 1.0, start=(10.0, 10.0))
+
+        self.assertEqual((10.0, 9.5), paths[0][0])
+
+    def test_layers_should_alternate_angles(self):
+        layers = [Layer(0.1 * (index + 1), [square(0.0, 0.0, 10.0)]) for index in range(3)]
+
+        hatched = list(hatch_layers(layers, 1.0, angles=(0.0, 90.0)))
+
+        self.assertEqual([0.1, 0.2, 0.30000000000000004], [layer.height for layer in hatched])
+        self.assertEqual(square(0.0, 0.0, 10.0), hatched[1].contours[0])
+        first_lines = [numpy.subtract(layer.contours[1][1], layer.contours[1][0]) for layer in hatched]
+        self.assertEqual(0.0, first_lines[0][1])
+        self.assertAlmostEqual(0.0, first_lines[1][0])
+        self.assertEqual(0.0, first_lines[2][1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+import tempfile
+import shutil
+import os
+import sys
+import numpy
+
+sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..', '..', 'src', ))
+from slicer.stl_slicer import Slicer, load_stl
+
+models_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'models')
+def modelFile(filename):
+    return os.path.join(models_path, filename)
+
+
+def signed_area(contour):
+    points = numpy.array(contour)
+    return 0.5 * numpy.sum(points[:-1, 0] * points[1:, 1] - points[1:, 0] * points[:-1, 1])
+
+
+class LoadStlTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='unittest')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_should_load_binary_and_ascii_alike(self):
+        triangles = load_stl(modelFile('cube.stl'))
+        ascii_filename = os.path.join(self.tmp_dir, 'cube.stl')
+        with open(ascii_filename, 'w') as ascii_file:
+            ascii_file.write('solid cube\n')
+            for triangle in triangles:
+                ascii_file.write('facet normal 0 0 0\nouter loop\n')
+                for vertex in triangle.tolist():
+                    ascii_file.write('vertex %r %r %r\n' % tuple(vertex))
+                ascii_file.write('endloop\nendfacet\n')
+            ascii_file.write('endsolid cube\n')
+
+        self.assertEqual((12, 3, 3), triangles.shape)
+        self.assertTrue(numpy.array_equal(triangles, load_stl(ascii_filename)))
+
+    def test_should_reject_other_files(self):
+        with self.assertRaises(ValueError):
+            load_stl(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test_data', 'simple.obj'))
+
+
+class SlicerTests(unittest.TestCase):
+    def test_should_slice_cube_into_closed_anticlockwise_squares(self):
+        slicer = Slicer(load_stl(modelFile('cube.stl')))
+
+        layers = list(slicer.layers(3.0))
+
+        self.assertEqual([3.0, 6.0, 9.0, 12.0], [layer.height for layer in layers])
+        for layer in layers:
+            self.assertEqual(1, len(layer.contours))
+            contour = layer.contours[0]
+            self.assertEqual(contour[0], contour[-1])
+            self.assertAlmostEqual(144.0, signed_area(contour), places=4)
+
+    def test_holes_should_run_clockwise(self):
+        outer = load_stl(modelFile('cube.stl'))
+        inner = (outer[:, ::-1] - 6.0) * 0.5 + 6.0
+
+        contours = Slicer(numpy.concatenate((outer, inner))).contours_at(6.0)
+
+        self.assertEqual([-36.0, 144.0], sorted(round(signed_area(contour), 4) for contour in contours))
+
+    def test_should_leave_contour_open_where_mesh_has_hole(self):
+        triangles = load_stl(modelFile('cube.stl'))
+        side = [index for index, triangle in enumerate(triangles) if numpy.ptp(triangle[:, 2]) > 0][0]
+
+        contours = Slicer(numpy.delete(triangles, side, axis=0)).contours_at(6.0)
+
+        self.assertEqual(1, len(contours))
+        self.assertNotEqual(contours[0][0], contours[0][-1])
+
+    def test_every_contour_of_monkey_should_close(self):
+        layers = list(Slicer(load_stl(modelFile('monkey.stl'))).layers(0.5))
+
+        self.assertEqual(176, len(layers))
+        self.assertTrue(all(contour[0] == contour[-1] for layer in layers for contour in layer.contours))
+
+    def test_batches_should_slice_same_as_one_pass(self):
+        slicer = Slicer(load_stl(modelFile('sphere.stl')))
+        whole = list(slicer.layers(0.1))
+
+        slicer.MAX_INTERSECTIONS_PER_BATCH = 10
+        self.assertEqual(whole, list(slicer.layers(0.1)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,11 +2,13 @@ import unittest
 import sys
 import os
 import time
+import select
+import tty
 from mock import patch
 
 sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..','..', 'src', ))
 
-from util.drip_governor import DripGovernor
+from util.drip_governor import DripGovernor, AsyncDripGovernor, DripRateController
 
 class DripGovernorTests(unittest.TestCase):
 
@@ -133,5 +135,116 @@ class DripGovernorTests(unittest.TestCase):
         self.assertEqual(2, my_mock_serial.write.call_count)
 
 
+@unittest.skipIf(not hasattr(os, 'openpty'), 'Needs a pty for the fake serial device')
+class AsyncDripGovernorTests(unittest.TestCase):
+    def setUp(self):
+        # The governor talks to one end of a pty; the test reads what it wrote from the other
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        self.drip_governor = None
+
+    def tearDown(self):
+        if self.drip_governor:
+            self.drip_governor.close()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def read_serial(self, timeout):
+        data = b''
+        end_time = time.time() + timeout
+        while True:
+            remaining = end_time - time.time()
+            if remaining <= 0:
+                return data
+            readable, _, _ = select.select([self.master], [], [], remaining)
+            if readable:
+                data += os.read(self.master, 100)
+
+    def test_should_write_1_when_on(self):
+        self.drip_governor = AsyncDripGovernor(os.ttyname(self.slave))
+
+        self.drip_governor.start_dripping()
+
+        self.assertEqual(b'1', self.read_serial(0.2))
+
+    def test_should_coalesce_commands(self):
+        self.drip_governor = AsyncDripGovernor(os.ttyname(self.slave))
+
+        for i in range(100):
+            self.drip_governor.start_dripping()
+        self.drip_governor.stop_dripping()
+        self.drip_governor.start_dripping()
+
+        self.assertEqual(b'1', self.read_serial(0.2))
+
+    def test_should_not_return_to_same_state_when_already_there(self):
+        self.drip_governor = AsyncDripGovernor(os.ttyname(self.slave))
+
+        self.drip_governor.stop_dripping()
+
+        self.assertEqual(b'', self.read_serial(0.2))
+
+    def test_should_repeat_state_periodically(self):
+        self.drip_governor = AsyncDripGovernor(os.ttyname(self.slave), repeat_delay_ms=100)
+
+        self.drip_governor.start_dripping()
+
+        self.assertTrue(self.read_serial(0.35).startswith(b'111'))
+
+    def test_should_switch_on_and_off_for_duty_cycle(self):
+        self.drip_governor = AsyncDripGovernor(os.ttyname(self.slave), period=0.1)
+
+        self.drip_governor.set_duty_cycle(0.5)
+
+        self.assertTrue(self.read_serial(0.35).startswith(b'1010'))
+
+
+class DripRateControllerTests(unittest.TestCase):
+    def test_should_hold_duty_cycle_at_target(self):
+        controller = DripRateController(target_drips_ahead=1.0, initial_duty_cycle=0.5)
+
+        self.assertAlmostEqual(0.5, controller.update(-1.0))
+        self.assertAlmostEqual(0.5, controller.update(-1.0))
+
+    def test_should_drip_faster_when_behind(self):
+        controller = DripRateController(initial_duty_cycle=0.5)
+
+        first = controller.update(5.0)
+        second = controller.update(5.0)
+
+        self.assertTrue(0.5 < first < second)
+
+    def test_should_drip_slower_when_ahead(self):
+        controller = DripRateController(initial_duty_cycle=0.5)
+
+        self.assertTrue(controller.update(-5.0) < 0.5)
+
+    def test_should_limit_duty_cycle(self):
+        controller = DripRateController()
+
+        for i in range(100):
+            duty_cycle = controller.update(100.0)
+
+        self.assertEqual(1.0, duty_cycle)
+
+    def test_should_not_wind_up_while_limited(self):
+        controller = DripRateController(kp=0.0, ki=0.1)
+        for i in range(100):
+            controller.update(100.0)
+
+        self.assertTrue(controller.update(-2.0) < 1.0)
+
+    def test_should_settle_when_drip_rate_depends_on_duty_cycle(self):
+        # Each layer takes 10 drips at full flow; the liquid should end up just ahead of every layer
+        controller = DripRateController()
+        drips_ahead = 0.0
+        for layer in range(50):
+            drips_ahead += 10.0 * controller.duty_cycle - 6.0
+            controller.update(-drips_ahead)
+
+        self.assertAlmostEqual(0.6, controller.duty_cycle, places=2)
+        self.assertAlmostEqual(1.0, drips_ahead, places=1)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -2,11 +2,15 @@
 import unittest
 import os
 import sys
-import StringIO
+import random
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
 
 sys.path.insert(0,os.path.join(os.path.dirname(__file__), '..','..', 'src', ))
 
-from util.gcode_layer_mixer import GCodeLayerMixer
+from util.gcode_layer_mixer import GCodeLayerMixer, rotate_layers, scramble_layer_seams
 
 
 
@@ -17,6 +21,8 @@ class GCodeLayerMixerTests(unittest.TestCase):
         test_file = open(os.path.join(self.test_file_path, 'gcode.out'))
         
         mixer = GCodeLayerMixer(test_file)
+        self.assertTrue(len(list(mixer)) > 0)
+        test_file.close()
 
     def test_should_not_move_Z_changes(self):
         test_data = "G1 Z1.0 F900.0\nG1 X0.00 Y0.00 F900.00\nM101\nG1 X1.00 Y1.00 F300.00 E1\nG1 Z2.0 F900.00\nG1 X0.01 Y0.01 F900.00\nM101\nG1 X1.01 Y1.01 F900.00 E1\n"
@@ -24,7 +30,7 @@ class GCodeLayerMixerTests(unittest.TestCase):
         expected1 = test_data.split('\n')[0]
         expected2 = test_data.split('\n')[4]
         
-        actual = GCodeLayerMixer(StringIO.StringIO(test_data))
+        actual = GCodeLayerMixer(StringIO(test_data))
         actual_lines = list(actual)
         
         self.assertEqual(actual_lines[0],expected1)
@@ -35,7 +41,7 @@ class GCodeLayerMixerTests(unittest.TestCase):
 
         expected = "G1 Z1.0 F900.0\nM101\nG1 X1.00 Y1.00 F300.00 E1\nG1 X0.00 Y0.00 F900.00".split('\n')
         
-        actual = GCodeLayerMixer(StringIO.StringIO(test_data))
+        actual = GCodeLayerMixer(StringIO(test_data))
         actual_lines = list(actual)
         
         self.assertEqual(actual_lines,expected, "\n%s\n%s" % (actual_lines,expected))
@@ -43,7 +49,7 @@ class GCodeLayerMixerTests(unittest.TestCase):
     def test_should_cycle_between_Z_changes_diffrently_for_each_layer(self):
         test_data= "G1 Z1.0 F900.0\nG1 X0.00 Y0.00 F900.00\nM101\nG1 X1.00 Y1.00 F300.00 E1\nG1 Z2.0 F900.00\nG1 X0.01 Y0.01 F900.00\nM101\nG1 X1.01 Y1.01 F900.00 E1\n"
         expected = "G1 Z1.0 F900.0\nM101\nG1 X1.00 Y1.00 F300.00 E1\nG1 X0.00 Y0.00 F900.00\nG1 Z2.0 F900.00\nG1 X1.01 Y1.01 F900.00 E1\nG1 X0.01 Y0.01 F900.00\nM101".split('\n')
-        actual = GCodeLayerMixer(StringIO.StringIO(test_data))
+        actual = GCodeLayerMixer(StringIO(test_data))
         actual_lines = list(actual)
         
         self.assertEqual(actual_lines,expected,"\n%s\n%s" % (actual_lines,expected))
@@ -52,13 +58,65 @@ class GCodeLayerMixerTests(unittest.TestCase):
         test_data= "G1 Z1.0 F900.0\nG1 X0.00 Y0.00 F900.00"
         expected = "G1 Z1.0 F900.0\nG1 X0.00 Y0.00 F900.00".split('\n')
         
-        actual = GCodeLayerMixer(StringIO.StringIO(test_data))
+        actual = GCodeLayerMixer(StringIO(test_data))
         actual_lines = list(actual)
         
         self.assertEqual(actual_lines,expected, "\n%s\n%s" % (actual_lines,expected))
         
         
 
+class RotateLayersTests(unittest.TestCase):
+    def test_should_rotate_each_layer_and_leave_breaks_in_place(self):
+        lines = ['a1', 'a2', '|', 'b1', 'b2', 'b3', '|', 'c1']
+
+        actual = list(rotate_layers(lines, lambda line: line == '|', lambda num_lines: num_lines - 1, seam_marker='^'))
+
+        self.assertEqual(['a2', '^', 'a1', '|', 'b3', '^', 'b1', 'b2', '|', 'c1'], actual)
+
+    def test_should_only_read_one_layer_ahead(self):
+        lines_read = []
+        def lines():
+            for line in ['a1', 'a2', '|', 'b1', 'b2', '|', 'c1']:
+                lines_read.append(line)
+                yield line
+
+        rotated = rotate_layers(lines(), lambda line: line == '|', lambda num_lines: 0)
+        first = [next(rotated) for i in range(3)]
+
+        self.assertEqual(['a1', 'a2', '|'], first)
+        self.assertEqual(['a1', 'a2', '|'], lines_read)
+
+
+class ScrambleLayerSeamsTests(unittest.TestCase):
+    test_data = (";generated\nG1 X9 Y9\n;LAYER:0\nG0 X0 Y0 Z0.3\nG1 X1 Y1 E1\nG1 X2 Y2 E2\nG1 X3 Y3 E3\n"
+                 ";LAYER:1\nG0 X0 Y0 Z0.6\nG1 X4 Y4 E4\nG1 X5 Y5 E5\nG1 X6 Y6 E6\n")
+
+    def test_should_start_layers_at_random_move_without_extruding(self):
+        actual = list(scramble_layer_seams(StringIO(self.test_data), random.Random(3)))
+
+        self.assertEqual([';LAYER:1', ';LAYER:2'], [line for line in actual if line.startswith(';LAYER')])
+        first_layer = actual[1:actual.index(';LAYER:2')]
+        moves = [line for line in first_layer if line.startswith('G1')]
+        self.assertEqual(3, len(moves))
+        self.assertFalse('E' in moves[0])
+        self.assertEqual(1, len([line for line in actual if 'Z0.3' in line]))
+        self.assertEqual(1, len([line for line in actual if 'Z0.6' in line]))
+        self.assertFalse('G1 X9 Y9' in actual)
+
+    def test_should_leave_comments_and_spacing_of_first_move(self):
+        test_data = ";LAYER:0\nG1 X1  Y2 E0.3 ; External perimeter\n"
+
+        actual = list(scramble_layer_seams(StringIO(test_data), random.Random(3)))
+
+        self.assertEqual([';LAYER:1', 'G1 X1  Y2 ; External perimeter'], actual)
+
+    def test_should_be_repeatable_with_same_seed(self):
+        first = list(scramble_layer_seams(StringIO(self.test_data), random.Random(5)))
+        second = list(scramble_layer_seams(StringIO(self.test_data), random.Random(5)))
+
+        self.assertEqual(first, second)
+
+
 # Laser on/off
 # Looks for rapid 
 # One Item Lists